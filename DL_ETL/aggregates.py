@@ -0,0 +1,135 @@
+import argparse
+import logging
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import text
+
+# Misma definición que mysql-init/init.sql, para bases creadas antes de estas tablas
+AGG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS agg_homicidios_mes (
+      periodo DATE NOT NULL,
+      cod_depto VARCHAR(6) NOT NULL,
+      cod_muni VARCHAR(8) NOT NULL,
+      sexo VARCHAR(20) NOT NULL DEFAULT '',
+      zona VARCHAR(20) NOT NULL DEFAULT '',
+      departamento VARCHAR(200),
+      municipio VARCHAR(200),
+      total INT NOT NULL,
+      PRIMARY KEY (periodo, cod_depto, cod_muni, sexo, zona)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_homicidios_anio (
+      anio SMALLINT NOT NULL,
+      cod_depto VARCHAR(6) NOT NULL,
+      cod_muni VARCHAR(8) NOT NULL,
+      sexo VARCHAR(20) NOT NULL DEFAULT '',
+      zona VARCHAR(20) NOT NULL DEFAULT '',
+      departamento VARCHAR(200),
+      municipio VARCHAR(200),
+      total INT NOT NULL,
+      PRIMARY KEY (anio, cod_depto, cod_muni, sexo, zona)
+    ) ENGINE=InnoDB
+    """,
+]
+
+REFRESH_MES_SQL = """
+INSERT INTO agg_homicidios_mes
+(periodo, cod_depto, cod_muni, sexo, zona, departamento, municipio, total)
+SELECT
+  DATE_SUB(fecha_hecho, INTERVAL DAYOFMONTH(fecha_hecho) - 1 DAY) AS periodo,
+  cod_depto, cod_muni, COALESCE(sexo, '') AS sexo, COALESCE(zona, '') AS zona,
+  MAX(departamento), MAX(municipio), SUM(cantidad)
+FROM raw_homicidios
+WHERE fecha_hecho >= :ini AND fecha_hecho < :fin
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+REFRESH_ANIO_SQL = """
+INSERT INTO agg_homicidios_anio
+(anio, cod_depto, cod_muni, sexo, zona, departamento, municipio, total)
+SELECT YEAR(periodo) AS anio, cod_depto, cod_muni, sexo, zona,
+  MAX(departamento), MAX(municipio), SUM(total)
+FROM agg_homicidios_mes
+WHERE periodo >= :ini AND periodo < :fin
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def ensure_aggregate_tables(conn):
+    for ddl in AGG_DDL:
+        conn.execute(text(ddl))
+
+
+def _month_ranges(fechas):
+    """Agrupa las fechas tocadas en rangos contiguos de meses [ini, fin)."""
+    meses = sorted(pd.to_datetime(pd.Series(fechas)).dropna().dt.to_period("M").unique())
+    ranges = []
+    for mes in meses:
+        if ranges and ranges[-1][1] == mes:
+            ranges[-1][1] = mes + 1
+        else:
+            ranges.append([mes, mes + 1])
+    return [(ini.start_time.date(), fin.start_time.date()) for ini, fin in ranges]
+
+
+def refresh_aggregates(conn, fechas):
+    """Recalcula los agregados solo para los meses y años que contienen `fechas`.
+
+    Los meses tocados se recalculan desde raw_homicidios y los años afectados
+    desde agg_homicidios_mes; el resto de las tablas no se toca.
+    """
+    ranges = _month_ranges(fechas)
+    if not ranges:
+        return
+    ensure_aggregate_tables(conn)
+
+    for ini, fin in ranges:
+        params = {"ini": ini, "fin": fin}
+        conn.execute(text("DELETE FROM agg_homicidios_mes WHERE periodo >= :ini AND periodo < :fin"), params)
+        conn.execute(text(REFRESH_MES_SQL), params)
+
+    years = sorted({y for ini, fin in ranges for y in range(ini.year, fin.year + 1)
+                    if date(y, 1, 1) < fin})
+    for year in years:
+        conn.execute(text("DELETE FROM agg_homicidios_anio WHERE anio = :anio"), {"anio": year})
+        conn.execute(text(REFRESH_ANIO_SQL), {"ini": date(year, 1, 1), "fin": date(year + 1, 1, 1)})
+
+    conn.commit()
+    logging.info(
+        f"Agregados actualizados: {len(ranges)} rango(s) de meses "
+        f"({ranges[0][0]} a {ranges[-1][1]}), años {years}"
+    )
+
+
+def rebuild_aggregates(conn):
+    """Reconstruye por completo los agregados (para backfills)."""
+    ensure_aggregate_tables(conn)
+    fecha_min, fecha_max = conn.execute(
+        text("SELECT MIN(fecha_hecho), MAX(fecha_hecho) FROM raw_homicidios")
+    ).fetchone()
+    conn.execute(text("DELETE FROM agg_homicidios_mes"))
+    conn.execute(text("DELETE FROM agg_homicidios_anio"))
+    conn.commit()
+    if fecha_min is None:
+        logging.info("raw_homicidios está vacía; no hay agregados que reconstruir.")
+        return
+    inicio = pd.Timestamp(fecha_min).to_period("M").start_time
+    refresh_aggregates(conn, pd.date_range(inicio, fecha_max, freq="MS"))
+    logging.info("Reconstrucción completa de agregados terminada.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de las tablas agregadas de homicidios")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruye los agregados desde cero.")
+    args = parser.parse_args()
+
+    from DL_ETL.config import get_engine
+    with get_engine().connect() as conn:
+        if args.rebuild:
+            rebuild_aggregates(conn)
+        else:
+            ensure_aggregate_tables(conn)
+            conn.commit()
@@ -0,0 +1,305 @@
+"""Suite de benchmarks de escalamiento del ETL con datos sintéticos.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.bench_etl                              # 340k, todas las etapas
+    python -m DL_ETL.benchmarks.bench_etl --tamanos 340k 3M 10M --docker
+    python -m DL_ETL.benchmarks.bench_etl --sin-db --comparar resultados/base.json
+
+Mide fetch_api_json contra un servidor Socrata local (socrata_stub), val con
+cada backend (pandas y polars), upsert_raw por modo de carga en un esquema
+MySQL desechable (disposable_db), el modo streaming (DL_ETL.stream, de la API
+a MySQL por bloques) y corridas completas de run_all, con y sin --stream
+(subproceso con el .env apuntando al servidor local y al esquema desechable;
+el desglose por etapa se lee de etl_runs).
+Cada medición corre en un proceso nuevo para que el pico de RSS sea el de esa
+etapa. El resultado se guarda como JSON con el commit y la rama, y
+--comparar marca las regresiones frente a otro JSON (código de salida 1).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from DL_ETL.benchmarks.disposable_db import base_desechable
+from DL_ETL.benchmarks.socrata_stub import servidor_socrata
+from DL_ETL.benchmarks.synthetic import SEMILLA, TAMANOS, dataset, leer_dataset
+from DL_ETL.extract import HOMICIDIOS_DATASET
+from DL_ETL.load import LOAD_MODES
+from DL_ETL.transform import TRANSFORM_BACKENDS
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+UMBRAL_REGRESION = 0.10 # 10% más lento que la base se reporta como regresión
+MODOS_DEFECTO = ("executemany", "multirow", "staging")
+
+
+# =========================
+# MEDICIONES (cada una en un proceso nuevo)
+# =========================
+def _medir_fetch(dominio, limite, workers):
+    from DL_ETL.extract import download_stats, fetch_api_json
+    from DL_ETL.metrics import peak_rss_mb
+    t0 = time.perf_counter()
+    df = fetch_api_json(f"{dominio}/resource/{HOMICIDIOS_DATASET}.json", limit=limite, max_workers=workers)
+    segundos = time.perf_counter() - t0
+    stats = download_stats()
+    return {
+        "filas": len(df), "segundos": segundos, "rss_pico_mb": peak_rss_mb(),
+        "detalle": {"bytes": stats["bytes"], "peticiones": stats["requests"], "limite": limite, "workers": workers},
+    }
+
+
+def _medir_val(ruta, backend):
+    from DL_ETL.divipola import indice_local
+    from DL_ETL.metrics import peak_rss_mb
+    from DL_ETL.transform import transform
+    df = leer_dataset(ruta)
+    indice = indice_local()
+    rss_base = peak_rss_mb()
+    t0 = time.perf_counter()
+    df = transform(df, indice, backend=backend)
+    segundos = time.perf_counter() - t0
+    return {"filas": len(df), "segundos": segundos, "rss_pico_mb": peak_rss_mb(), "detalle": {"rss_entrada_mb": rss_base}}
+
+
+def _medir_upsert(ruta, url_db, modo, lote):
+    from DL_ETL.load import upsert_raw
+    from DL_ETL.metrics import peak_rss_mb
+    from DL_ETL.transform import val
+    df = val(leer_dataset(ruta))
+    engine = create_engine(url_db, connect_args={"allow_local_infile": True})
+    with engine.connect() as conn:
+        conn.execute(text("TRUNCATE TABLE raw_homicidios"))
+        conn.commit()
+        lotes = []
+        t0 = time.perf_counter()
+        filas = upsert_raw(conn, df, chunk_size=lote, mode=modo, on_chunk=lambda n, s: lotes.append(s))
+        segundos = time.perf_counter() - t0
+        en_tabla = conn.execute(text("SELECT COUNT(*) FROM raw_homicidios")).scalar()
+    engine.dispose()
+    return {
+        "filas": filas, "segundos": segundos, "rss_pico_mb": peak_rss_mb(),
+        "detalle": {"lote": lote, "lotes": len(lotes), "lote_max_s": max(lotes, default=None), "filas_en_tabla": en_tabla},
+    }
+
+
+def _medir_stream(dominio, url_db, modo, lote, bloque):
+    from DL_ETL.divipola import indice_local
+    from DL_ETL.metrics import peak_rss_mb
+    from DL_ETL.stream import iter_homicidios_chunks, iter_transformed, load_stream
+    engine = create_engine(url_db, connect_args={"allow_local_infile": True})
+    with engine.connect() as conn:
+        conn.execute(text("TRUNCATE TABLE raw_homicidios"))
+        conn.commit()
+        t0 = time.perf_counter()
+        resumen = load_stream(
+            conn, iter_transformed(iter_homicidios_chunks(
+                chunk_rows=bloque, url=f"{dominio}/resource/{HOMICIDIOS_DATASET}.json"
+            ), indice_local()),
+            chunk_size=lote, mode=modo
+        )
+        segundos = time.perf_counter() - t0
+        en_tabla = conn.execute(text("SELECT COUNT(*) FROM raw_homicidios")).scalar()
+    engine.dispose()
+    return {
+        "filas": resumen.filas, "segundos": segundos, "rss_pico_mb": peak_rss_mb(),
+        "detalle": {"bloque": bloque, "bloques": resumen.bloques, "lote": lote, "filas_en_tabla": en_tabla},
+    }
+
+
+def _en_proceso_nuevo(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def medir(fn, *args, repeticiones=1):
+    """Repite la medición y se queda con el menor tiempo y el mayor pico de RSS."""
+    corridas = [_en_proceso_nuevo(fn, *args) for _ in range(repeticiones)]
+    mejor = min(corridas, key=lambda r: r["segundos"])
+    mejor["rss_pico_mb"] = max(r["rss_pico_mb"] for r in corridas)
+    mejor["repeticiones"] = repeticiones
+    return mejor
+
+
+def medir_run_all(dominio, params_db, engine, modo, stream=False):
+    """Corrida completa de run_all --full-refresh en un subproceso; etapas desde etl_runs."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ, **params_db,
+            "ETL_SOCRATA_DOMAIN": dominio, "ETL_DIM_SOURCE": "local", "ETL_LOAD_MODE": modo,
+            "ETL_CACHE_DIR": os.path.join(tmp, "cache"),
+            "ETL_SNAPSHOT_PATH": os.path.join(tmp, "homicidios.parquet"),
+        }
+        t0 = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-m", "DL_ETL.run_all", "--full-refresh", *(["--stream"] if stream else [])],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+        segundos = time.perf_counter() - t0
+    if proceso.returncode != 0:
+        logging.error(proceso.stderr[-2000:])
+
+    with engine.connect() as conn:
+        etapas = pd.read_sql(text("""
+            SELECT etapa, estado, segundos, filas_entrada, filas_salida, rss_pico_mb
+            FROM etl_runs
+            WHERE run_id = (SELECT run_id FROM etl_runs ORDER BY id DESC LIMIT 1)
+            ORDER BY id
+        """), conn)
+        conn.execute(text("DELETE FROM etl_runs"))
+        conn.commit()
+    filas = etapas.loc[etapas["etapa"] == ("stream_homicidios" if stream else "upsert_raw"), "filas_salida"]
+    return {
+        "filas": int(filas.iloc[0]) if len(filas) else None, "segundos": segundos,
+        "rss_pico_mb": float(etapas["rss_pico_mb"].max()) if len(etapas) else None,
+        "estado": "ok" if proceso.returncode == 0 else "error",
+        "detalle": {"modo": modo, "stream": stream, "etapas": etapas.to_dict(orient="records")},
+    }
+
+
+# =========================
+# SUITE
+# =========================
+def metadatos():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": git("rev-parse", "HEAD"),
+        "rama": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _registrar(resultados, benchmark, tamano, variante, fn):
+    logging.info(f"--- {benchmark} [{variante}] {tamano} ---")
+    try:
+        r = fn()
+    except Exception as e:
+        logging.exception(f"{benchmark} [{variante}] {tamano} falló")
+        r = {"estado": "error", "error": f"{type(e).__name__}: {e}"}
+    r = {"benchmark": benchmark, "tamano": tamano, "variante": variante, "estado": "ok", **r}
+    if r.get("filas") and r.get("segundos"):
+        r["filas_por_seg"] = r["filas"] / r["segundos"]
+        logging.info(f"{r['filas']} filas en {r['segundos']:.2f}s ({r['filas_por_seg']:,.0f} filas/s)")
+    resultados.append(r)
+
+
+def ejecutar_suite(tamanos, modos, repeticiones=1, con_db=True, con_run_all=True, docker=False,
+                   lote=5000, limite_api=50000, workers_api=4, semilla=SEMILLA, bloque=50000):
+    resultados = []
+    for tamano in tamanos:
+        ruta = dataset(tamano, semilla)
+        with servidor_socrata(ruta) as dominio:
+            _registrar(resultados, "fetch_api_json", tamano, f"workers={workers_api}",
+                       lambda: medir(_medir_fetch, dominio, limite_api, workers_api, repeticiones=repeticiones))
+            for backend in TRANSFORM_BACKENDS:
+                _registrar(resultados, "val", tamano, backend,
+                           lambda: medir(_medir_val, str(ruta), backend, repeticiones=repeticiones))
+            if not con_db:
+                continue
+            with base_desechable(docker=docker) as (engine, params_db):
+                url_db = engine.url.render_as_string(hide_password=False)
+                for modo in modos:
+                    _registrar(resultados, "upsert_raw", tamano, modo,
+                               lambda: medir(_medir_upsert, str(ruta), url_db, modo, lote, repeticiones=repeticiones))
+                _registrar(resultados, "stream", tamano, f"{modos[0]} bloque={bloque}",
+                           lambda: medir(_medir_stream, dominio, url_db, modos[0], lote, bloque, repeticiones=repeticiones))
+                if con_run_all:
+                    for stream in (False, True):
+                        with engine.connect() as conn:
+                            conn.execute(text("TRUNCATE TABLE raw_homicidios"))
+                            conn.commit()
+                        _registrar(resultados, "run_all_etl", tamano, f"{modos[0]}{' stream' if stream else ''}",
+                                   lambda: medir_run_all(dominio, params_db, engine, modos[0], stream))
+    return resultados
+
+
+def guardar(resultados, salida=None):
+    meta = metadatos()
+    if salida is None:
+        RESULTADOS_DIR.mkdir(parents=True, exist_ok=True)
+        salida = RESULTADOS_DIR / f"etl_{datetime.now():%Y%m%d_%H%M%S}_{(meta['commit'] or 'sin-git')[:8]}.json"
+    Path(salida).write_text(
+        json.dumps({"metadatos": meta, "resultados": resultados}, indent=2, ensure_ascii=False, default=str),
+        encoding="utf-8"
+    )
+    logging.info(f"Resultados guardados en {salida}")
+    return salida
+
+
+def comparar(base, actual, umbral=UMBRAL_REGRESION):
+    """Tabla base vs. actual por (benchmark, tamaño, variante) y lista de regresiones."""
+    def indexar(r):
+        return {(x["benchmark"], x["tamano"], x["variante"]): x for x in r["resultados"] if x.get("estado") == "ok"}
+    previos, nuevos = indexar(base), indexar(actual)
+    filas, regresiones = [], []
+    for clave in sorted(previos.keys() & nuevos.keys()):
+        antes, ahora = previos[clave]["segundos"], nuevos[clave]["segundos"]
+        cambio = ahora / antes - 1 if antes else 0.0
+        filas.append((*clave, antes, ahora, cambio))
+        if cambio > umbral:
+            regresiones.append(clave)
+    tabla = pd.DataFrame(filas, columns=["benchmark", "tamano", "variante", "base_s", "actual_s", "cambio"])
+    return tabla, regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanos", nargs="+", default=["340k"], help=f"{', '.join(TAMANOS)} o un número de filas")
+    parser.add_argument("--modos", nargs="+", default=list(MODOS_DEFECTO), choices=LOAD_MODES,
+                        help="Modos de upsert_raw a medir (el primero se usa en run_all)")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--lote", type=int, default=5000, help="chunk_size de upsert_raw")
+    parser.add_argument("--bloque", type=int, default=50000, help="Filas por bloque del modo streaming")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--sin-db", action="store_true", help="Solo fetch_api_json y val (sin MySQL)")
+    parser.add_argument("--sin-run-all", action="store_true", help="Omite la corrida completa de run_all")
+    parser.add_argument("--docker", action="store_true", help="Levanta un MySQL efímero en Docker en vez de usar BENCH_DB_URL")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior (otra rama) contra el que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION, help="Aumento relativo de tiempo que cuenta como regresión")
+    args = parser.parse_args()
+
+    resultados = ejecutar_suite(
+        args.tamanos, args.modos, args.repeticiones, con_db=not args.sin_db,
+        con_run_all=not args.sin_run_all, docker=args.docker, lote=args.lote, semilla=args.semilla,
+        bloque=args.bloque
+    )
+    salida = guardar(resultados, args.salida)
+    actual = json.loads(Path(salida).read_text(encoding="utf-8"))
+
+    print(pd.DataFrame(resultados)[["benchmark", "tamano", "variante", "estado", "filas", "segundos", "rss_pico_mb"]].to_string(index=False))
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        tabla, regresiones = comparar(base, actual, args.umbral)
+        print(f"\nComparación contra {args.comparar} (commit {base['metadatos'].get('commit')}):")
+        print(tabla.to_string(index=False, formatters={"cambio": "{:+.1%}".format}))
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones por encima de {args.umbral:.0%}: {regresiones}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
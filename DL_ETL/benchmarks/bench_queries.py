@@ -0,0 +1,164 @@
+"""Benchmark de consultas sobre raw_homicidios antes y después de las migraciones de esquema.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.bench_queries                    # 340k sintéticas, BENCH_DB_URL
+    python -m DL_ETL.benchmarks.bench_queries --tamano 3M --docker
+
+Carga el dataset sintético en un esquema desechable (disposable_db), lo
+baja al esquema anterior con DL_ETL.migrations (sin particiones ni índices
+cubrientes), mide consultas representativas del dashboard y de los
+agregados, aplica las migraciones en sitio sobre la tabla ya cargada
+(registrando cuánto tardan) y vuelve a medir. De cada consulta se guarda la
+mediana de tiempo y el plan de EXPLAIN (índice usado y particiones leídas).
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from DL_ETL.aggregates import REFRESH_MES_SQL
+from DL_ETL.benchmarks.bench_etl import RESULTADOS_DIR, metadatos
+from DL_ETL.benchmarks.disposable_db import base_desechable
+from DL_ETL.benchmarks.synthetic import SEMILLA, dataset, leer_dataset
+from DL_ETL.divipola import indice_local
+from DL_ETL.load import upsert_raw
+from DL_ETL.migrations import migrate
+from DL_ETL.transform import val
+
+CONSULTAS = {
+    # Serie anual de un departamento en un rango de años (filtro de la barra lateral)
+    "depto_rango_anios": """
+        SELECT YEAR(fecha_hecho) AS anio, SUM(cantidad) AS total
+        FROM raw_homicidios
+        WHERE cod_depto = :depto AND fecha_hecho >= :ini AND fecha_hecho < :fin
+        GROUP BY anio
+    """,
+    # Serie mensual completa de un municipio (panel municipio × mes)
+    "muni_serie_mensual": """
+        SELECT DATE_SUB(fecha_hecho, INTERVAL DAYOFMONTH(fecha_hecho) - 1 DAY) AS periodo,
+               SUM(cantidad) AS total
+        FROM raw_homicidios
+        WHERE cod_muni = :muni
+        GROUP BY periodo
+    """,
+    "muni_rango_anios": """
+        SELECT YEAR(fecha_hecho) AS anio, SUM(cantidad) AS total
+        FROM raw_homicidios
+        WHERE cod_muni = :muni AND fecha_hecho >= :ini AND fecha_hecho < :fin
+        GROUP BY anio
+    """,
+    # Total por departamento en un rango de años (mapa)
+    "deptos_rango_anios": """
+        SELECT cod_depto, SUM(cantidad) AS total
+        FROM raw_homicidios
+        WHERE fecha_hecho >= :ini AND fecha_hecho < :fin
+        GROUP BY cod_depto
+    """,
+    # La consulta de refresh_aggregates para un mes, sin el INSERT
+    "refresh_agregado_mes": "SELECT" + REFRESH_MES_SQL.split("SELECT", 1)[1],
+}
+
+
+def cargar_datos(engine, tamano, semilla, lote):
+    df = val(leer_dataset(dataset(tamano, semilla)), indice_local())
+    with engine.connect() as conn:
+        upsert_raw(conn, df, chunk_size=lote, mode="multirow")
+        depto, muni = conn.execute(text("""
+            SELECT cod_depto, cod_muni FROM raw_homicidios
+            GROUP BY cod_depto, cod_muni ORDER BY COUNT(*) DESC LIMIT 1
+        """)).fetchone()
+    return len(df), {"depto": depto, "muni": muni}
+
+
+def _parametros(nombre, codigos):
+    if nombre == "refresh_agregado_mes":
+        return {"ini": date(2020, 6, 1), "fin": date(2020, 7, 1)}
+    return {**codigos, "ini": date(2019, 1, 1), "fin": date(2022, 1, 1)}
+
+
+def medir_consulta(conn, sql, params, repeticiones):
+    """Mediana de `repeticiones` ejecuciones (tras una de calentamiento) y el plan de EXPLAIN."""
+    conn.execute(text(sql), params).fetchall()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        tiempos.append(time.perf_counter() - t0)
+    plan = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+    return {
+        "segundos": statistics.median(tiempos),
+        "plan": [{k: p.get(k) for k in ("table", "partitions", "type", "key", "rows", "Extra")} for p in plan],
+    }
+
+
+def medir_todas(engine, codigos, repeticiones):
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE TABLE raw_homicidios")).fetchall()
+        return {
+            nombre: medir_consulta(conn, sql, _parametros(nombre, codigos), repeticiones)
+            for nombre, sql in CONSULTAS.items()
+        }
+
+
+def ejecutar(tamano="340k", semilla=SEMILLA, repeticiones=5, lote=5000, docker=False):
+    with base_desechable(docker=docker) as (engine, _):
+        with engine.connect() as conn:
+            migrate(conn, hasta=0)
+        filas, codigos = cargar_datos(engine, tamano, semilla, lote)
+        antes = medir_todas(engine, codigos, repeticiones)
+        with engine.connect() as conn:
+            migraciones = migrate(conn)
+        despues = medir_todas(engine, codigos, repeticiones)
+    return {
+        "tamano": tamano, "filas": filas, "codigos": codigos,
+        "migraciones": [
+            {"version": v, "nombre": n, "accion": a, "segundos": s} for v, n, a, s in migraciones
+        ],
+        "consultas": [
+            {"consulta": nombre, "antes_s": antes[nombre]["segundos"], "despues_s": despues[nombre]["segundos"],
+             "plan_antes": antes[nombre]["plan"], "plan_despues": despues[nombre]["plan"]}
+            for nombre in CONSULTAS
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamano", default="340k", help="340k, 3M, 10M o un número de filas")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--lote", type=int, default=5000, help="chunk_size de upsert_raw al cargar")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--docker", action="store_true", help="Levanta un MySQL efímero en Docker en vez de usar BENCH_DB_URL")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto en benchmarks/resultados/)")
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.tamano, args.semilla, args.repeticiones, args.lote, args.docker)
+    meta = metadatos()
+    salida = args.salida
+    if salida is None:
+        RESULTADOS_DIR.mkdir(parents=True, exist_ok=True)
+        salida = RESULTADOS_DIR / f"consultas_{datetime.now():%Y%m%d_%H%M%S}_{(meta['commit'] or 'sin-git')[:8]}.json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump({"metadatos": meta, **resultado}, f, indent=2, ensure_ascii=False, default=str)
+
+    for m in resultado["migraciones"]:
+        duracion = f"{m['segundos']:.1f}s" if m["segundos"] is not None else "-"
+        print(f"Migración {m['version']} ({m['nombre']}): {m['accion']} {duracion}")
+    tabla = pd.DataFrame(resultado["consultas"])[["consulta", "antes_s", "despues_s"]]
+    tabla["mejora"] = tabla["antes_s"] / tabla["despues_s"]
+    print(f"\n{resultado['filas']} filas ({args.tamano}); mediana de {args.repeticiones} ejecuciones:")
+    print(tabla.to_string(index=False, formatters={
+        "antes_s": "{:.4f}".format, "despues_s": "{:.4f}".format, "mejora": "{:.1f}x".format
+    }))
+    print(f"\nResultados y planes de EXPLAIN en {salida}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
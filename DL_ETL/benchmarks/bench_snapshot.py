@@ -0,0 +1,96 @@
+"""Benchmark de arranque en frío del dashboard: CSV + limpieza vs. snapshot Parquet.
+
+Cada variante se mide en un proceso nuevo para que el tiempo y la memoria
+residente (RSS) correspondan a un arranque en frío.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.snapshot                       # genera el snapshot desde MySQL
+    python -m DL_ETL.benchmarks.bench_snapshot      # compara ambos caminos
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from DL_ETL.snapshot import DEFAULT_SNAPSHOT_PATH
+
+# Se ejecuta en un proceso aparte; imprime un JSON con tiempo y memoria residente.
+# pyarrow se importa antes de medir para que ambas variantes partan de la misma base.
+CHILD_CODE = """
+import json, os, resource, sys, time
+import pandas as pd
+import pyarrow.parquet
+
+def rss_mb():
+    # RSS actual (Linux); en otros sistemas se usa el pico como aproximación
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+modo, path = sys.argv[1], sys.argv[2]
+rss_base = rss_mb()
+t0 = time.perf_counter()
+if modo == "csv":
+    # Mismo camino que usaba home.load_and_clean_data
+    df = pd.read_csv(path)
+    df['FECHA HECHO'] = pd.to_datetime(df['FECHA HECHO'], dayfirst=True, errors='coerce')
+    df['CANTIDAD'] = pd.to_numeric(df['CANTIDAD'], errors='coerce').fillna(0).astype(int)
+    df.dropna(subset=['FECHA HECHO', 'DEPARTAMENTO'], inplace=True)
+    df['ANIO'] = df['FECHA HECHO'].dt.year
+    df['DEPARTAMENTO'] = df['DEPARTAMENTO'].str.upper().str.strip()
+    df['MUNICIPIO'] = df['MUNICIPIO'].str.title().str.strip()
+else:
+    df = pd.read_parquet(path, memory_map=True)
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "filas": len(df),
+    "segundos": elapsed,
+    "rss_mb": rss_mb(),
+    "rss_carga_mb": rss_mb() - rss_base,
+    "memoria_df_mb": df.memory_usage(deep=True).sum() / 1024 ** 2,
+}))
+"""
+
+
+def medir(modo, path):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, modo, str(path)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot", default=str(DEFAULT_SNAPSHOT_PATH))
+    parser.add_argument("--csv", help="CSV en el formato anterior; si se omite se genera desde el snapshot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if not csv_path:
+            # CSV equivalente al que leía home.py (fechas dd/mm/aaaa, texto plano)
+            df = pd.read_parquet(args.snapshot)
+            df["FECHA HECHO"] = df["FECHA HECHO"].dt.strftime("%d/%m/%Y")
+            csv_path = Path(tmp) / "homicidios.csv"
+            df.drop(columns=["ANIO"]).to_csv(csv_path, index=False)
+
+        resultados = {"csv": medir("csv", csv_path), "parquet": medir("parquet", args.snapshot)}
+
+    for modo, r in resultados.items():
+        print(
+            f"{modo:8s} filas={r['filas']:>8}  tiempo={r['segundos']:6.2f}s  "
+            f"rss={r['rss_mb']:8.1f} MB (carga +{r['rss_carga_mb']:.1f} MB)  "
+            f"dataframe={r['memoria_df_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark de DL_ETL.transform.val: tiempo y memoria pico antes/después.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.bench_val                  # descarga el dataset completo
+    python -m DL_ETL.benchmarks.bench_val --csv datos.csv  # usa una extracción local
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+import unicodedata
+
+import pandas as pd
+
+from DL_ETL.transform import val, rename_columns, TEXT_COLS
+
+
+def val_legacy(df_hom):
+    """Versión anterior de val: normalización fila por fila con una lambda."""
+    df_hom = rename_columns(df_hom)
+    df_hom["fecha_hecho"] = pd.to_datetime(df_hom["fecha_hecho"], errors="coerce").dt.date
+    df_hom["cantidad"] = pd.to_numeric(df_hom["cantidad"], errors="coerce").fillna(0).astype(int)
+    for col in TEXT_COLS:
+        if col in df_hom.columns:
+            df_hom[col] = (
+                df_hom[col]
+                .astype(str)
+                .apply(lambda x: ''.join(
+                    c for c in unicodedata.normalize('NFKD', x)
+                    if not unicodedata.combining(c)
+                ))
+                .str.strip()
+                .str.lower()
+                .str.title()
+            )
+    return df_hom
+
+
+def medir(fn, df):
+    """Ejecuta fn sobre una copia de df y devuelve (segundos, MB pico)."""
+    df = df.copy()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(df)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", help="CSV con la extracción cruda de m8fd-ahd9")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.csv:
+        df = pd.read_csv(args.csv, dtype=str)
+    else:
+        from DL_ETL.extract import fetch_homicidios_data
+        df = fetch_homicidios_data()
+    logging.info(f"Benchmark de val sobre {len(df)} filas")
+
+    for nombre, fn in (("antes (lambda por fila)", val_legacy), ("después (por valor único)", val)):
+        tiempos, picos = zip(*(medir(fn, df) for _ in range(args.repeticiones)))
+        print(f"{nombre:28s} tiempo={min(tiempos):7.2f}s  memoria_pico={max(picos):8.1f} MB")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
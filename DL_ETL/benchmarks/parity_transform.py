@@ -0,0 +1,104 @@
+"""Verificación de paridad entre los backends pandas y polars de DL_ETL.transform.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.parity_transform                 # casos borde + 340k sintéticas
+    python -m DL_ETL.benchmarks.parity_transform --tamano 3M
+
+Compara columna por columna (nombres, orden, nulos y valores) la salida de
+`val` con la de `val_polars` y mide ambos tiempos. Termina con código 1 si
+algún caso difiere, para poder correrlo antes de cambiar el backend por
+defecto o de tocar cualquiera de las dos implementaciones. Los casos borde
+también corren con pytest en tests/test_transform_parity.py.
+"""
+import argparse
+import logging
+import sys
+import time
+
+import pandas as pd
+
+from DL_ETL.benchmarks.synthetic import dataset, leer_dataset
+from DL_ETL.divipola import indice_local
+from DL_ETL.transform import val
+from DL_ETL.transform_polars import val_polars
+
+
+def casos_borde():
+    """Entradas pequeñas con lo que la API entrega a veces mal formado."""
+    base = {
+        "fecha_hecho": [
+            "2020-01-31T00:00:00.000", "2020-02-29T00:00:00.000", "2020-13-01T00:00:00.000",
+            "31/01/2020", None, "2020-03-05", "2021-07-04T10:30:00.000",
+        ],
+        "cod_depto": ["05", "5", None, "11", "76", "99", "05"],
+        "departamento": ["ANTIOQUIA", "Antioquia", "BOGOTÁ, D.C.", None, "VALLE", "  Nariño ", "antioquia"],
+        "cod_muni": ["05001000", "5001", None, "11001", None, "99999", "05045000"],
+        "municipio": ["MEDELLÍN", "Medellín", "BOGOTÁ, D.C.", None, "Cali", "Pasto", "APARTADÓ"],
+        "zona": ["URBANA", "RURAL", None, "urbana", "Urbana ", "SIN DATO", "RURAL"],
+        "sexo": ["MASCULINO", "FEMENINO", "NO REPORTA", None, "masculino", "Femenino", "MASCULINO"],
+        "cantidad": ["1", " 3 ", "x", None, "2.7", "-1", "1e2"],
+    }
+    renombrado = pd.DataFrame(base).rename(columns={
+        "fecha_hecho": "Fecha Hecho", "cod_muni": "Codigo_Municipio", "cantidad": "TOTAL"
+    })
+    return {
+        "valores_borde": pd.DataFrame(base),
+        "columnas_renombradas": renombrado,
+        "con_campos_sistema": pd.DataFrame(base).assign(**{":id": [f"row-{i}" for i in range(7)]}),
+        "vacio": pd.DataFrame({c: pd.Series([], dtype=object) for c in base}),
+    }
+
+
+def _valores(serie):
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def diferencias(esperado, obtenido):
+    """Lista de diferencias entre la salida de pandas y la de polars (vacía si coinciden)."""
+    difs = []
+    if list(esperado.columns) != list(obtenido.columns):
+        return [f"columnas: {list(esperado.columns)} != {list(obtenido.columns)}"]
+    for col in esperado.columns:
+        a, b = esperado[col], obtenido[col]
+        if isinstance(a.dtype, pd.CategoricalDtype) != isinstance(b.dtype, pd.CategoricalDtype):
+            difs.append(f"{col}: tipo {a.dtype} != {b.dtype}")
+            continue
+        va, vb = _valores(a), _valores(b)
+        if va != vb:
+            filas = [i for i, (x, y) in enumerate(zip(va, vb)) if x != y][:5]
+            difs.append(f"{col}: {len(filas)}+ filas distintas, p. ej. {[(va[i], vb[i]) for i in filas]}")
+    return difs
+
+
+def comparar(nombre, df, indice):
+    t0 = time.perf_counter()
+    esperado = val(df.copy(), indice)
+    t_pandas = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    obtenido = val_polars(df, indice).to_pandas()
+    t_polars = time.perf_counter() - t0
+    difs = diferencias(esperado, obtenido)
+    estado = "OK" if not difs else "DIFIERE"
+    print(f"{nombre:22s} filas={len(df):>9}  pandas={t_pandas:7.2f}s  polars={t_polars:7.2f}s  {estado}")
+    for d in difs:
+        print(f"    - {d}")
+    return not difs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamano", default="340k", help="Dataset sintético a comparar (340k, 3M, 10M o un número)")
+    args = parser.parse_args()
+
+    indice = indice_local()
+    casos = casos_borde()
+    casos[f"sintetico_{args.tamano}"] = leer_dataset(dataset(args.tamano))
+    resultados = [comparar(nombre, df, indice) for nombre, df in casos.items()]
+    if not all(resultados):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
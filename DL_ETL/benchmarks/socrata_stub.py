@@ -0,0 +1,89 @@
+"""Servidor HTTP local que imita la paginación de Socrata (SODA 2.x).
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.socrata_stub datos/sintetico_340k_s42.parquet --puerto 8765
+
+Sirve un Parquet como /resource/<dataset>.json y entiende lo que usa el ETL:
+$select=count(*), $select=":*, *" (campos de sistema), $limit, $offset y
+$order=:id (el Parquet ya viene ordenado por :id). $where se ignora, así que
+las corridas de punta a punta contra este servidor deben usar --full-refresh.
+Corre en un proceso aparte para no competir por el GIL con el cliente medido.
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from DL_ETL.benchmarks.synthetic import leer_dataset
+
+
+def _crear_handler(df):
+    campos_sistema = [c for c in df.columns if c.startswith(":")]
+    datos = df.drop(columns=campos_sistema)
+
+    class SocrataHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.startswith("/resource/"):
+                self.send_error(404)
+                return
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            select = params.get("$select", "*").replace(" ", "")
+
+            if select.startswith("count("):
+                cuerpo = json.dumps([{"count": str(len(df))}]).encode("utf-8")
+            else:
+                offset = int(params.get("$offset", 0))
+                limite = int(params.get("$limit", 1000))
+                fuente = df if ":*" in select else datos
+                cuerpo = fuente.iloc[offset:offset + limite].to_json(orient="records", force_ascii=False).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    return SocrataHandler
+
+
+def _servir(ruta, puerto, listo):
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), _crear_handler(leer_dataset(ruta)))
+    listo.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+
+@contextmanager
+def servidor_socrata(ruta, puerto=0):
+    """Levanta el servidor en otro proceso y entrega su dominio ("http://127.0.0.1:<puerto>")."""
+    listo = mp.Queue()
+    proceso = mp.Process(target=_servir, args=(str(ruta), puerto, listo), daemon=True)
+    proceso.start()
+    try:
+        puerto = listo.get(timeout=300)
+        logging.info(f"Servidor Socrata local en http://127.0.0.1:{puerto} ({ruta})")
+        yield f"http://127.0.0.1:{puerto}"
+    finally:
+        proceso.terminate()
+        proceso.join()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("parquet", help="Dataset a servir (ver DL_ETL.benchmarks.synthetic)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+    with servidor_socrata(args.parquet, args.puerto) as dominio:
+        print(f"ETL_SOCRATA_DOMAIN={dominio}  (Ctrl+C para terminar)")
+        try:
+            mp.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,154 @@
+"""Generador de registros sintéticos de homicidios con el formato de m8fd-ahd9.
+
+Uso (desde la raíz del proyecto):
+
+    python -m DL_ETL.benchmarks.synthetic --tamano 3M        # escribe datos/sintetico_3M_s42.parquet
+
+Las filas usan códigos DIVIPOLA reales (CSV del repositorio), nombres con y
+sin tildes en distintas capitalizaciones, códigos de municipio de 8 dígitos
+como los publica la Policía y una fracción sin código, para que `val` recorra
+los mismos caminos que con la API. Todas las columnas son texto, igual que en
+el JSON de Socrata. La generación es vectorizada y por bloques, así que los
+10M de filas se escriben a Parquet sin tenerlas todas en memoria.
+"""
+import argparse
+import logging
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from DL_ETL.extract import read_divipola_deptos, read_divipola_mpios
+
+DATOS_DIR = Path(__file__).resolve().parent / "datos"
+
+TAMANOS = {"340k": 340_000, "3M": 3_000_000, "10M": 10_000_000}
+SEMILLA = 42
+DESDE, HASTA = "2010-01-01", "2024-12-31"
+TAMANO_BLOQUE = 1_000_000
+
+ZONAS = (["URBANA", "RURAL", "SIN DATO"], [0.62, 0.36, 0.02])
+SEXOS = (["MASCULINO", "FEMENINO", "NO REPORTA"], [0.90, 0.09, 0.01])
+CANTIDADES = (["1", "2", "3", "4"], [0.93, 0.05, 0.015, 0.005])
+FRACCION_SIN_CODIGO = 0.02 # Filas con cod_muni vacío: se resuelven por nombre
+
+
+def _sin_tildes(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def _variantes(nombres):
+    """Variantes de escritura (filas) de cada nombre: oficial, título con tildes y mayúsculas sin tildes."""
+    return np.array([
+        list(nombres),
+        [n.title() for n in nombres],
+        [_sin_tildes(n) for n in nombres],
+    ], dtype=object)
+
+
+class GeneradorSintetico:
+    """Genera bloques reproducibles (misma semilla, mismas filas) de registros crudos."""
+
+    def __init__(self, semilla=SEMILLA, desde=DESDE, hasta=HASTA):
+        self.semilla = semilla
+        depto = read_divipola_deptos()
+        mpio = read_divipola_mpios()
+        rng = np.random.default_rng(semilla)
+
+        self.cod_muni = mpio["cod_muni"].to_numpy(dtype=object)
+        self.depto_de_muni = np.searchsorted(depto["cod_depto"].to_numpy(dtype=object), mpio["cod_depto"].to_numpy(dtype=object))
+        self.cod_depto = depto["cod_depto"].to_numpy(dtype=object)
+        self.nombres_muni = _variantes(mpio["nombre_muni"].tolist())
+        self.nombres_depto = _variantes(depto["nombre_depto"].tolist())
+
+        # Concentración parecida a la real: pocas ciudades con muchos casos, capitales con más peso
+        peso = rng.lognormal(0.0, 1.5, len(mpio)) * np.where(mpio["cod_muni"].str.endswith("001"), 20.0, 1.0)
+        self.prob_muni = peso / peso.sum()
+
+        self.fechas = pd.date_range(desde, hasta, freq="D").strftime("%Y-%m-%dT00:00:00.000").to_numpy(dtype=object)
+
+    def bloques(self, n_filas, tamano_bloque=TAMANO_BLOQUE):
+        """Genera DataFrames de hasta `tamano_bloque` filas hasta completar `n_filas`."""
+        inicio = 0
+        for i, desde in enumerate(range(0, n_filas, tamano_bloque)):
+            n = min(tamano_bloque, n_filas - desde)
+            yield self._bloque(np.random.default_rng([self.semilla, i]), inicio, n)
+            inicio += n
+
+    def _bloque(self, rng, inicio, n):
+        muni = rng.choice(len(self.cod_muni), size=n, p=self.prob_muni)
+        depto = self.depto_de_muni[muni]
+        variante = rng.choice(3, size=n, p=[0.6, 0.25, 0.15])
+        muni_nombre = self.nombres_muni[variante, muni]
+        depto_nombre = self.nombres_depto[variante, depto]
+
+        cod_muni = (self.cod_muni[muni] + "000").astype(object)
+        cod_muni[rng.random(n) < FRACCION_SIN_CODIGO] = None
+
+        id_fila = np.arange(inicio, inicio + n)
+        actualizado = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 300 * 86400, n), unit="s")
+        return pd.DataFrame({
+            ":id": [f"row-{i:010x}" for i in id_fila],
+            ":updated_at": actualizado.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "fecha_hecho": self.fechas[rng.integers(0, len(self.fechas), n)],
+            "cod_depto": self.cod_depto[depto],
+            "departamento": depto_nombre,
+            "cod_muni": cod_muni,
+            "municipio": muni_nombre,
+            "zona": rng.choice(ZONAS[0], size=n, p=ZONAS[1]).astype(object),
+            "sexo": rng.choice(SEXOS[0], size=n, p=SEXOS[1]).astype(object),
+            "cantidad": rng.choice(CANTIDADES[0], size=n, p=CANTIDADES[1]).astype(object),
+        })
+
+
+def ruta_dataset(tamano, semilla=SEMILLA):
+    return DATOS_DIR / f"sintetico_{tamano}_s{semilla}.parquet"
+
+
+def escribir_parquet(ruta, n_filas, semilla=SEMILLA):
+    """Escribe el dataset bloque a bloque (memoria acotada al tamaño del bloque)."""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(".parquet.tmp")
+    t0 = time.perf_counter()
+    escritor = None
+    try:
+        for bloque in GeneradorSintetico(semilla).bloques(n_filas):
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(tmp, tabla.schema)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    tmp.replace(ruta)
+    logging.info(f"{n_filas} filas sintéticas en {time.perf_counter() - t0:.1f}s -> {ruta}")
+    return ruta
+
+
+def dataset(tamano, semilla=SEMILLA):
+    """Ruta del dataset de `tamano` filas ("340k", "3M", "10M" o un número); lo genera si no existe."""
+    ruta = ruta_dataset(tamano, semilla)
+    if not ruta.exists():
+        escribir_parquet(ruta, TAMANOS.get(tamano) or int(tamano), semilla)
+    return ruta
+
+
+def leer_dataset(ruta):
+    """Lee el dataset con columnas de texto, como las entrega pd.DataFrame(registros JSON)."""
+    df = pd.read_parquet(ruta)
+    return df.astype({c: str for c in df.columns if c != "cod_muni"})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamano", nargs="+", default=list(TAMANOS), help="340k, 3M, 10M o un número de filas")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    args = parser.parse_args()
+    for tamano in args.tamano:
+        dataset(tamano, args.semilla)
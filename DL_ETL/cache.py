@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".etl_cache"
+
+
+def cache_key(dataset_id, query=None, watermark=None):
+    """Clave de contenido (sha256) para una extracción: dataset + consulta + marca de agua."""
+    payload = json.dumps(
+        {"dataset": dataset_id, "query": query, "watermark": watermark},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _paths(cache_dir, key):
+    cache_dir = Path(cache_dir)
+    return cache_dir / f"{key}.parquet", cache_dir / f"{key}.json"
+
+
+def _latest_path(cache_dir, dataset_id):
+    """Puntero a la última extracción guardada de un dataset (para el modo offline)."""
+    return Path(cache_dir) / f"latest_{dataset_id}.json"
+
+
+def _parquet_safe(df):
+    """Serializa a JSON los valores anidados (dict/list) que Socrata a veces devuelve."""
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        nested = df[col].map(lambda v: isinstance(v, (dict, list)))
+        if nested.any():
+            df.loc[nested, col] = df.loc[nested, col].map(json.dumps)
+    return df
+
+
+def read_cache(dataset_id, query=None, watermark=None, ttl=None, cache_dir=DEFAULT_CACHE_DIR, key=None):
+    """Devuelve la extracción guardada o None si no existe o venció su TTL (segundos)."""
+    key = key or cache_key(dataset_id, query, watermark)
+    data_path, meta_path = _paths(cache_dir, key)
+    if not data_path.exists() or not meta_path.exists():
+        return None
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    age = time.time() - meta["created_at"]
+    if ttl is not None and age > ttl:
+        logging.info(f"Caché vencida para {dataset_id} ({age:.0f}s > {ttl}s)")
+        return None
+
+    df = pd.read_parquet(data_path)
+    # Se marca el acceso para la expulsión LRU
+    os.utime(data_path)
+    logging.info(f"Usando caché local de {dataset_id}: {len(df)} filas ({age:.0f}s de antigüedad)")
+    return df
+
+
+def write_cache(df, dataset_id, query=None, watermark=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Guarda una extracción cruda como Parquet junto a sus metadatos."""
+    key = cache_key(dataset_id, query, watermark)
+    data_path, meta_path = _paths(cache_dir, key)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = data_path.with_suffix(".parquet.tmp")
+    _parquet_safe(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, data_path)
+    meta_path.write_text(json.dumps({
+        "dataset": dataset_id,
+        "query": query,
+        "watermark": watermark,
+        "rows": len(df),
+        "created_at": time.time(),
+    }, default=str), encoding="utf-8")
+    _latest_path(cache_dir, dataset_id).write_text(json.dumps({"key": key}), encoding="utf-8")
+    logging.info(f"Extracción de {dataset_id} guardada en caché ({len(df)} filas)")
+    return data_path
+
+
+def read_latest_cache(dataset_id, cache_dir=DEFAULT_CACHE_DIR):
+    """Última extracción guardada de `dataset_id`, sea cual sea su consulta (o None)."""
+    pointer = _latest_path(cache_dir, dataset_id)
+    if not pointer.exists():
+        return None
+    key = json.loads(pointer.read_text(encoding="utf-8"))["key"]
+    return read_cache(dataset_id, cache_dir=cache_dir, key=key)
+
+
+def evict_cache(max_bytes, cache_dir=DEFAULT_CACHE_DIR):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo max_bytes."""
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return
+    entries = sorted(cache_dir.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for data_path in entries:
+        if total <= max_bytes:
+            break
+        total -= data_path.stat().st_size
+        data_path.unlink()
+        data_path.with_suffix(".json").unlink(missing_ok=True)
+        logging.info(f"Entrada de caché expulsada: {data_path.name}")
+
+
+def cached_extract(fetch_fn, dataset_id, query=None, watermark=None, ttl=None,
+                   offline=False, max_bytes=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Ejecuta fetch_fn solo si no hay una extracción vigente en caché.
+
+    En modo offline nunca se consulta la red ni se mira el TTL: se usa la
+    entrada de esta consulta y marca de agua si existe y, si no (la marca de
+    agua avanzó desde que se guardó), la última extracción guardada del
+    dataset. Las extracciones vacías también se guardan, para poder repetir
+    sin red una corrida que no trajo filas nuevas.
+    """
+    df = read_cache(dataset_id, query, watermark, None if offline else ttl, cache_dir)
+    if df is not None:
+        return df
+    if offline:
+        df = read_latest_cache(dataset_id, cache_dir)
+        if df is None:
+            raise RuntimeError(f"Modo offline: no hay ninguna extracción en caché para {dataset_id}")
+        logging.warning(
+            f"Modo offline: sin entrada para la consulta actual de {dataset_id} "
+            f"(consulta={query!r}, marca={watermark!r}); se reutiliza la última extracción guardada"
+        )
+        return df
+
+    df = fetch_fn()
+    write_cache(df, dataset_id, query, watermark, cache_dir)
+    if max_bytes:
+        evict_cache(max_bytes, cache_dir)
+    return df
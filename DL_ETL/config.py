@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 
@@ -17,14 +18,59 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME")
 
-# Crear engine de conexión
-try:
-    engine = create_engine(
-        f"mysql+mysqlconnector://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
-        pool_recycle=3600
-    )
-    with engine.connect() as conn:
-        logging.info("Conexión establecida con éxito a la base de datos.")
-except Exception as e:
-    logging.error(f"Error al conectar con la base de datos: {e}")
-    engine = None
+# Parámetros de carga a raw_homicidios
+LOAD_CHUNK_SIZE = int(os.getenv("ETL_LOAD_CHUNK_SIZE", "5000"))
+LOAD_MODE = os.getenv("ETL_LOAD_MODE", "executemany")
+
+# Backend de la etapa de transformación: "pandas" o "polars" (plan lazy que entrega Arrow al cargador)
+TRANSFORM_BACKEND = os.getenv("ETL_TRANSFORM_BACKEND", "pandas")
+
+# Modo streaming (DL_ETL.stream): bloques de la API validados y cargados uno a la vez.
+# La memoria pico queda acotada por STREAM_CHUNK_ROWS × (STREAM_PREFETCH + 2) filas.
+STREAM = os.getenv("ETL_STREAM", "0").lower() in ("1", "true", "si", "sí", "yes")
+STREAM_CHUNK_ROWS = int(os.getenv("ETL_STREAM_CHUNK_ROWS", "50000"))
+STREAM_PREFETCH = int(os.getenv("ETL_STREAM_PREFETCH", "2"))
+
+# Origen de las dimensiones DIVIPOLA: "local" (CSV del repositorio) o "api"
+DIM_SOURCE = os.getenv("ETL_DIM_SOURCE", "local")
+
+# Snapshot Parquet que consume el dashboard (vacío = ruta por defecto en ProyectoStreamlit)
+SNAPSHOT_PATH = os.getenv("ETL_SNAPSHOT_PATH") or None
+
+# Caché local de extracciones crudas (Parquet)
+CACHE_DIR = os.getenv("ETL_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".etl_cache"))
+CACHE_TTL = int(os.getenv("ETL_CACHE_TTL", "21600"))  # segundos
+CACHE_MAX_BYTES = int(os.getenv("ETL_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# Carpeta de los perfiles cProfile de run_all --profile
+PROFILE_DIR = os.getenv("ETL_PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".etl_profiles"))
+
+# Puntos de control de las etapas de run_all (salidas intermedias en Parquet)
+CHECKPOINT_DIR = os.getenv("ETL_CHECKPOINT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".etl_checkpoints"))
+
+# Etapas de run_all que corren a la vez y conexiones del pool que comparten
+WORKERS = int(os.getenv("ETL_WORKERS", "3"))
+DB_POOL_SIZE = int(os.getenv("ETL_DB_POOL_SIZE", "5"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Engine con pool de conexiones, creado en el primer uso y compartido entre hilos.
+
+    Crearlo no abre conexiones: importar este módulo ya no exige que MySQL
+    esté disponible, y el primer error de conexión aparece donde se usa.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(
+                f"mysql+mysqlconnector://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_POOL_SIZE,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+                # LOAD DATA LOCAL INFILE solo se habilita cuando se usa ese modo de carga
+                connect_args={"allow_local_infile": True} if LOAD_MODE == "infile" else {}
+            )
+        return _engine
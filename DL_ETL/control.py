@@ -1,5 +1,12 @@
+import json
+
 from sqlalchemy import text
 
+# Prefijo de las filas de etl_control con los puntos de control por etapa (DL_ETL/dag.py)
+CHECKPOINT_PREFIX = "checkpoint:"
+# Sufijo del avance parcial de una etapa que se reanuda a mitad (p. ej. stream_homicidios)
+PROGRESS_SUFFIX = ":avance"
+
 def get_last_loaded_date(conn):
     result = conn.execute(
         text("SELECT last_loaded_date FROM etl_control WHERE proceso='homicidios_api'")
@@ -15,3 +22,74 @@ def update_last_loaded_date(conn, date_val):
         """),
         {"d": date_val},
     )
+
+def get_notes(conn, proceso):
+    """Devuelve el campo notas de etl_control para un proceso (o None)."""
+    result = conn.execute(
+        text("SELECT notas FROM etl_control WHERE proceso = :p"), {"p": proceso}
+    ).fetchone()
+    return result[0] if result and result[0] else None
+
+def update_notes(conn, proceso, notas):
+    conn.execute(
+        text("""
+        INSERT INTO etl_control (proceso, notas)
+        VALUES (:p, :n)
+        ON DUPLICATE KEY UPDATE notas = :n
+        """),
+        {"p": proceso, "n": notas},
+    )
+
+def get_last_updated_at(conn):
+    """Devuelve la marca :updated_at de Socrata de homicidios_api (o None)."""
+    result = conn.execute(
+        text("SELECT last_updated_at FROM etl_control WHERE proceso='homicidios_api'")
+    ).fetchone()
+    return result[0] if result and result[0] else None
+
+def update_last_updated_at(conn, updated_at):
+    conn.execute(
+        text("""
+        INSERT INTO etl_control (proceso, last_updated_at)
+        VALUES ('homicidios_api', :u)
+        ON DUPLICATE KEY UPDATE last_updated_at = :u
+        """),
+        {"u": updated_at},
+    )
+
+def get_data_version(conn):
+    """Versión de los datos cargados: marca de agua de homicidios_api en etl_control."""
+    row = conn.execute(
+        text("SELECT last_loaded_date, last_loaded_ts FROM etl_control WHERE proceso='homicidios_api'")
+    ).fetchone()
+    return f"{row[0]}|{row[1]}" if row else "sin-datos"
+
+def get_checkpoints(conn):
+    """Puntos de control guardados, por nombre de etapa."""
+    rows = conn.execute(
+        text("SELECT proceso, notas FROM etl_control WHERE proceso LIKE :p"),
+        {"p": CHECKPOINT_PREFIX + "%"},
+    ).fetchall()
+    return {proceso[len(CHECKPOINT_PREFIX):]: json.loads(notas) for proceso, notas in rows if notas}
+
+def save_checkpoint(conn, etapa, checkpoint):
+    update_notes(conn, CHECKPOINT_PREFIX + etapa, json.dumps(checkpoint, default=str))
+
+def clear_checkpoints(conn):
+    conn.execute(
+        text("DELETE FROM etl_control WHERE proceso LIKE :p"), {"p": CHECKPOINT_PREFIX + "%"}
+    )
+
+def get_stage_progress(conn, etapa):
+    """Avance parcial guardado por una etapa que no terminó (o None)."""
+    notas = get_notes(conn, CHECKPOINT_PREFIX + etapa + PROGRESS_SUFFIX)
+    return json.loads(notas) if notas else None
+
+def save_stage_progress(conn, etapa, progreso):
+    # Lleva el prefijo de los puntos de control: Pipeline.reset también lo borra
+    update_notes(conn, CHECKPOINT_PREFIX + etapa + PROGRESS_SUFFIX, json.dumps(progreso, default=str))
+
+def clear_stage_progress(conn, etapa):
+    conn.execute(
+        text("DELETE FROM etl_control WHERE proceso = :p"), {"p": CHECKPOINT_PREFIX + etapa + PROGRESS_SUFFIX}
+    )
@@ -0,0 +1,151 @@
+"""Planificador de las etapas del ETL como un DAG pequeño, con puntos de control.
+
+Cada etapa declara de cuáles depende; las que no dependen entre sí corren a la
+vez en un pool de hilos (las descargas pasan casi todo el tiempo esperando la
+red y las cargas esperando a MySQL). Al terminar, la salida de la etapa se
+guarda en disco (Parquet, sea un DataFrame o una tabla Arrow) y se registra un
+punto de control en etl_control, así que al relanzar una corrida fallida se
+omiten las etapas que ya habían terminado. Cuando terminan todas, los puntos de control se borran
+y la corrida siguiente empieza de cero.
+"""
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from DL_ETL.cache import _parquet_safe
+from DL_ETL.control import clear_checkpoints, get_checkpoints, save_checkpoint
+
+# fn(pipeline, stage) recibe el registro de métricas de la etapa y devuelve su salida
+# (DataFrame de pandas, tabla Arrow o None)
+Stage = namedtuple("Stage", ["name", "fn", "deps"])
+
+
+class Pipeline:
+    """Ejecuta un conjunto de etapas respetando sus dependencias.
+
+    `params` identifica la corrida (p. ej. full_refresh): un punto de control
+    guardado con otros parámetros no se reutiliza.
+    """
+
+    def __init__(self, stages, engine, checkpoint_dir, params, metrics):
+        self.stages = {s.name: s for s in stages}
+        self.engine = engine
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.params = params
+        self.metrics = metrics
+        self._outputs = {}
+        self._details = {}
+        self._lock = threading.Lock()
+        with engine.connect() as conn:
+            self._checkpoints = {
+                name: cp for name, cp in get_checkpoints(conn).items()
+                if name in self.stages and cp.get("params") == params
+            }
+
+    # --- salidas de las etapas (en memoria o desde el punto de control) ---
+
+    def output(self, name):
+        with self._lock:
+            if name not in self._outputs:
+                checkpoint = self._checkpoints[name]
+                artefacto = checkpoint.get("artefacto")
+                if not artefacto:
+                    self._outputs[name] = None
+                elif checkpoint.get("formato") == "arrow":
+                    self._outputs[name] = pq.read_table(artefacto)
+                else:
+                    self._outputs[name] = pd.read_parquet(artefacto)
+            return self._outputs[name]
+
+    def detail(self, name):
+        """`detalle` que dejó la etapa en sus métricas (p. ej. la marca de agua leída)."""
+        if name in self._details:
+            return self._details[name]
+        return self._checkpoints[name].get("detalle") or {}
+
+    def _finish(self, name, salida, detalle):
+        artefacto, formato = None, None
+        if isinstance(salida, (pd.DataFrame, pa.Table)):
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            artefacto = self.checkpoint_dir / f"{name}.parquet"
+            tmp = artefacto.with_suffix(".parquet.tmp")
+            if isinstance(salida, pa.Table):
+                formato = "arrow"
+                pq.write_table(salida, tmp)
+            else:
+                formato = "pandas"
+                _parquet_safe(salida).to_parquet(tmp, index=False)
+            tmp.replace(artefacto)
+        checkpoint = {
+            "params": self.params, "run_id": self.metrics.run_id, "fin": datetime.now(),
+            "artefacto": str(artefacto) if artefacto else None, "formato": formato, "detalle": detalle,
+        }
+        with self.engine.connect() as conn:
+            save_checkpoint(conn, name, checkpoint)
+            conn.commit()
+        with self._lock:
+            self._outputs[name] = salida
+            self._details[name] = detalle
+            self._checkpoints[name] = checkpoint
+
+    def _run_stage(self, name):
+        with self.metrics.stage(name) as record:
+            salida = self.stages[name].fn(self, record)
+        self._finish(name, salida, record["detalle"])
+
+    def reset(self):
+        """Descarta los puntos de control y las salidas guardadas."""
+        with self.engine.connect() as conn:
+            clear_checkpoints(conn)
+            conn.commit()
+        for artefacto in self.checkpoint_dir.glob("*.parquet"):
+            artefacto.unlink()
+        self._checkpoints = {}
+
+    def run(self, selected=None, workers=3):
+        """Corre las etapas seleccionadas (todas por defecto) que no tengan punto de control.
+
+        Devuelve True si todas terminaron. Ante el primer error no se lanzan
+        etapas nuevas, se espera a las que están en curso y se devuelve False.
+        """
+        selected = set(selected or self.stages)
+        desconocidas = sorted(selected - set(self.stages))
+        if desconocidas:
+            raise ValueError(f"Etapas que no existen en este flujo: {desconocidas}")
+        pendientes = {n for n in selected if n not in self._checkpoints}
+        for name in sorted(selected - pendientes):
+            logging.info(f"[{name}] omitida: terminada en la corrida {self._checkpoints[name]['run_id']}")
+        for name in pendientes:
+            faltan = [d for d in self.stages[name].deps if d not in pendientes and d not in self._checkpoints]
+            if faltan:
+                raise ValueError(f"La etapa '{name}' necesita {faltan}: inclúyalas o termínelas antes")
+
+        ok = True
+        en_curso = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl") as pool:
+            while pendientes or en_curso:
+                if ok:
+                    for name in sorted(pendientes):
+                        if all(d in self._checkpoints for d in self.stages[name].deps):
+                            pendientes.discard(name)
+                            en_curso[pool.submit(self._run_stage, name)] = name
+                if not en_curso:
+                    break
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    name = en_curso.pop(futuro)
+                    if futuro.exception() is not None:
+                        ok = False
+                        logging.error(f"[{name}] falló: {futuro.exception()!r}", exc_info=futuro.exception())
+
+        if ok and len(self._checkpoints) == len(self.stages):
+            # Corrida completa: la próxima empieza de cero
+            self.reset()
+        return ok
@@ -0,0 +1,186 @@
+"""Índice de códigos DIVIPOLA compartido por el ETL y el dashboard.
+
+Resuelve nombres de departamento/municipio a código (sin importar tildes,
+mayúsculas ni puntuación), normaliza los códigos que llegan de la API y
+asigna ids enteros densos, para que los cruces y agrupaciones se hagan sobre
+enteros pequeños en vez de texto libre. Se carga desde los CSV DIVIPOLA del
+repositorio o desde las tablas dim_departamentos / dim_municipios.
+"""
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+_NO_ALFANUM = re.compile(r"[^a-z0-9]+")
+# Variantes frecuentes en los datos de la Policía frente al nombre oficial
+_ALIAS = {
+    "bogotadc": "bogota",
+    "bogotadistritocapital": "bogota",
+    "sanandresyprovidencia": "archipielagodesanandresprovidenciaysantacatalina",
+    "sanandresislas": "archipielagodesanandresprovidenciaysantacatalina",
+    "guajira": "laguajira",
+    "valle": "valledelcauca",
+}
+
+
+@lru_cache(maxsize=None)
+def clave_nombre(nombre):
+    """Clave de comparación: sin tildes, en minúsculas y sin espacios ni puntuación."""
+    texto = ''.join(
+        c for c in unicodedata.normalize('NFKD', str(nombre))
+        if not unicodedata.combining(c)
+    ).lower()
+    clave = _NO_ALFANUM.sub("", texto)
+    return _ALIAS.get(clave, clave)
+
+
+def normalizar_codigo(serie, digitos):
+    """Normaliza códigos DANE a `digitos` caracteres (None si no es un código válido).
+
+    Acepta enteros o texto, con o sin ceros a la izquierda, y códigos de 8
+    dígitos con el centro poblado al final ("05001000" -> "05001").
+    """
+    limpio = serie.astype("string").str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+    limpio = limpio.where(limpio.str.len() > 0)
+    if digitos == 5:
+        # Más de 5 dígitos: código de centro poblado, se toman los 5 del municipio
+        largo = (limpio.str.len() > 5).fillna(False)
+        limpio = limpio.where(~largo, limpio.str.zfill(8).str[:5])
+    return limpio.str.zfill(digitos)
+
+
+class IndiceDivipola:
+    """Códigos, nombres e ids densos de departamentos y municipios.
+
+    Los ids densos son la posición del código en los arreglos ordenados
+    (`cod_depto`, `cod_muni`); -1 indica un código o nombre desconocido.
+    """
+
+    def __init__(self, df_depto, df_mpio):
+        df_depto = df_depto.drop_duplicates("cod_depto").sort_values("cod_depto")
+        df_mpio = df_mpio.drop_duplicates("cod_muni").sort_values("cod_muni")
+        self.cod_depto = df_depto["cod_depto"].to_numpy(dtype=object)
+        self.nombre_depto = df_depto["nombre_depto"].to_numpy(dtype=object)
+        self.cod_muni = df_mpio["cod_muni"].to_numpy(dtype=object)
+        self.nombre_muni = df_mpio["nombre_muni"].to_numpy(dtype=object)
+        self.depto_de_muni = np.searchsorted(self.cod_depto, df_mpio["cod_depto"].to_numpy(dtype=object)).astype(np.int16)
+
+        self._depto_por_nombre = {clave_nombre(n): i for i, n in enumerate(self.nombre_depto)}
+        self._muni_por_nombre = {
+            (int(d), clave_nombre(n)): i for i, (d, n) in enumerate(zip(self.depto_de_muni, self.nombre_muni))
+        }
+
+    @staticmethod
+    def _ids(codigos_ordenados, codigos):
+        codigos = np.asarray(codigos, dtype=object)
+        validos = pd.notna(codigos)
+        pos = np.searchsorted(codigos_ordenados, np.where(validos, codigos, ""))
+        pos = np.minimum(pos, len(codigos_ordenados) - 1)
+        return np.where(validos & (codigos_ordenados[pos] == np.where(validos, codigos, "")), pos, -1).astype(np.int32)
+
+    # --- código -> id denso ---
+
+    def ids_depto(self, codigos):
+        return self._ids(self.cod_depto, codigos).astype(np.int16)
+
+    def ids_muni(self, codigos):
+        return self._ids(self.cod_muni, codigos)
+
+    # --- nombre -> id denso (una búsqueda por valor distinto) ---
+
+    def resolver_depto(self, nombres):
+        """Ids de departamento a partir de nombres en cualquier formato."""
+        codigos, unicos = pd.factorize(pd.Series(nombres))
+        ids = np.array([self._depto_por_nombre.get(clave_nombre(u), -1) for u in unicos] + [-1], dtype=np.int16)
+        return ids[codigos]
+
+    def resolver_muni(self, deptos, municipios):
+        """Ids de municipio a partir de (departamento, municipio): desambigua nombres repetidos."""
+        id_depto = self.resolver_depto(deptos).astype(np.int64)
+        cod_nombre, nombres = pd.factorize(pd.Series(municipios))
+        # Par (departamento, municipio) como un solo entero; se resuelve cada par distinto
+        pares, inversa = np.unique((id_depto + 1) * (len(nombres) + 1) + cod_nombre + 1, return_inverse=True)
+        d, m = np.divmod(pares, len(nombres) + 1)
+        ids = np.array([
+            self._muni_por_nombre.get((int(di) - 1, clave_nombre(nombres[mi - 1])), -1) if mi else -1
+            for di, mi in zip(d, m)
+        ], dtype=np.int32)
+        return ids[inversa]
+
+    # --- id denso -> código / nombre (el id -1 da None) ---
+
+    def codigos_depto(self, ids):
+        return np.append(self.cod_depto, None)[ids]
+
+    def codigos_muni(self, ids):
+        return np.append(self.cod_muni, None)[ids]
+
+    def nombres_depto(self, ids):
+        return np.append(self.nombre_depto, None)[ids]
+
+    def nombres_muni(self, ids):
+        return np.append(self.nombre_muni, None)[ids]
+
+
+@lru_cache(maxsize=1)
+def indice_local():
+    """Índice construido con los CSV DIVIPOLA versionados en el repositorio."""
+    # Import diferido: la app usa el índice sin necesitar el cliente de la API
+    from DL_ETL.extract import read_divipola_deptos, read_divipola_mpios
+    return IndiceDivipola(read_divipola_deptos(), read_divipola_mpios())
+
+
+def indice_desde_db(conn):
+    """Índice construido con las dimensiones cargadas en MySQL."""
+    df_depto = pd.read_sql(text("SELECT cod_depto, nombre_depto FROM dim_departamentos"), conn)
+    df_mpio = pd.read_sql(text("SELECT cod_muni, cod_depto, nombre_muni FROM dim_municipios"), conn)
+    if df_depto.empty or df_mpio.empty:
+        logging.warning("Dimensiones DIVIPOLA vacías en la base; se usan los CSV locales")
+        return indice_local()
+    return IndiceDivipola(df_depto, df_mpio)
+
+
+def _codigos(valores, digitos):
+    return normalizar_codigo(pd.Series(valores), digitos).to_numpy(dtype=object, na_value=None)
+
+
+def _ids_por_valor(serie, resolver):
+    """Aplica `resolver` una sola vez por valor distinto y reexpande a las filas (-1 si falta)."""
+    codigos, unicos = pd.factorize(serie)
+    return np.append(resolver(unicos), -1)[codigos]
+
+
+def completar_codigos(df, indice=None):
+    """Normaliza cod_depto/cod_muni y completa los faltantes a partir de los nombres.
+
+    Trabaja sobre las columnas del ETL (cod_depto, departamento, cod_muni,
+    municipio). Los códigos que no existen en DIVIPOLA se intentan resolver
+    por nombre; si tampoco se resuelven quedan como vienen de la fuente.
+    """
+    if df.empty:
+        # Nada que resolver (y el porcentaje de resueltos no está definido); mismo
+        # tipo de texto que tienen las columnas de códigos cuando hay filas
+        return df.astype({"cod_depto": "str", "cod_muni": "str"})
+    indice = indice or indice_local()
+    ids_muni = _ids_por_valor(df["cod_muni"], lambda u: indice.ids_muni(_codigos(u, 5)))
+
+    faltan = ids_muni < 0
+    if faltan.any():
+        ids_muni[faltan] = indice.resolver_muni(df["departamento"].to_numpy()[faltan], df["municipio"].to_numpy()[faltan])
+
+    ids_depto = np.where(ids_muni >= 0, indice.depto_de_muni[np.maximum(ids_muni, 0)], -1)
+    sin_depto = ids_depto < 0
+    if sin_depto.any():
+        por_codigo = _ids_por_valor(df["cod_depto"], lambda u: indice.ids_depto(_codigos(u, 2)))
+        por_nombre = indice.resolver_depto(df["departamento"].to_numpy())
+        ids_depto[sin_depto] = np.where(por_codigo >= 0, por_codigo, por_nombre)[sin_depto]
+
+    resueltos = ids_muni >= 0
+    logging.info(f"DIVIPOLA: {resueltos.mean():.1%} de las filas con municipio resuelto")
+    df["cod_muni"] = np.where(resueltos, indice.codigos_muni(ids_muni), df["cod_muni"])
+    df["cod_depto"] = np.where(ids_depto >= 0, indice.codigos_depto(ids_depto), df["cod_depto"])
+    return df
@@ -1,32 +1,236 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
 import pandas as pd
 import requests as re
 import logging
-from sodapy import Socrata
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def fetch_api_json(url, limit=50000):
-    """Descarga datos JSON desde una API pública con paginación."""
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DIVIPOLA_DEPTOS_CSV = REPO_ROOT / "DIVIPOLA-_Códigos_departamentos_geolocalizado_20251014.csv"
+DIVIPOLA_MPIOS_CSV = REPO_ROOT / "DIVIPOLA-_Códigos_municipios_20251014.csv"
+
+# Dominio Socrata de origen; "http://host:puerto" apunta a un servidor local (p. ej. el de los benchmarks)
+SOCRATA_DOMAIN = os.getenv("ETL_SOCRATA_DOMAIN", "www.datos.gov.co")
+
+# Bytes y peticiones descargados en el proceso (los usan los benchmarks).
+# El hook corre en los hilos de iter_api_pages: se actualiza y se lee con el lock.
+DOWNLOAD_STATS = {"bytes": 0, "requests": 0}
+_DOWNLOAD_LOCK = threading.Lock()
+
+# Contador de la etapa en curso (ver count_downloads). Cada etapa del DAG corre
+# en su propio hilo, así que descargas simultáneas de etapas distintas no se mezclan
+_STAGE_DOWNLOADS = contextvars.ContextVar("stage_downloads", default=None)
+
+def _count_download(response, *args, **kwargs):
+    """Hook de requests: acumula el tamaño de cada respuesta descargada."""
+    size = len(response.content)
+    with _DOWNLOAD_LOCK:
+        DOWNLOAD_STATS["bytes"] += size
+        DOWNLOAD_STATS["requests"] += 1
+        stage = _STAGE_DOWNLOADS.get()
+        if stage is not None:
+            stage["bytes"] += size
+            stage["requests"] += 1
+    return response
+
+def download_stats():
+    """Copia consistente de DOWNLOAD_STATS."""
+    with _DOWNLOAD_LOCK:
+        return dict(DOWNLOAD_STATS)
+
+@contextmanager
+def count_downloads():
+    """Cuenta aparte las descargas hechas dentro del bloque desde este hilo.
+
+    Entrega un dict {"bytes", "requests"} que se completa a medida que llegan
+    las respuestas, incluidas las de los hilos de iter_api_pages (que heredan
+    el contexto de quien los lanza).
+    """
+    contador = {"bytes": 0, "requests": 0}
+    token = _STAGE_DOWNLOADS.set(contador)
+    try:
+        yield contador
+    finally:
+        _STAGE_DOWNLOADS.reset(token)
+
+def build_session(pool_size=4, retries=5, backoff=0.5):
+    """Crea una sesión HTTP keep-alive con reintentos y backoff exponencial."""
+    session = re.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_count_download)
+    return session
+
+def socrata_resource_url(dataset_id, domain=SOCRATA_DOMAIN):
+    """URL SODA de un dataset ("https://" salvo que el dominio traiga el esquema)."""
+    base = domain if domain.startswith(("http://", "https://")) else f"https://{domain}"
+    return f"{base}/resource/{dataset_id}.json"
+
+def fetch_api_count(session, url, where=None, timeout=60):
+    """Consulta el número total de filas de un recurso Socrata."""
+    params = {"$select": "count(*)"}
+    if where:
+        params["$where"] = where
+    response = session.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    return int(next(iter(data[0].values()))) if data else 0
+
+def _fetch_page(session, url, offset, limit, where=None, timeout=60, select=None):
+    """Descarga una página; devuelve (registros, bytes, segundos)."""
+    t0 = time.perf_counter()
+    params = {"$limit": limit, "$offset": offset, "$order": ":id"}
+    if where:
+        params["$where"] = where
+    if select:
+        params["$select"] = select
+    response = session.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json(), len(response.content), time.perf_counter() - t0
+
+def iter_api_pages(url, limit=50000, where=None, start_offset=0, max_workers=4,
+                   session=None, timeout=60, select=None, on_page=None):
+    """Genera las páginas de un recurso Socrata como tuplas (offset, registros).
+
+    Primero consulta el conteo de filas y luego descarga las páginas en paralelo
+    sobre un pool acotado de hilos que comparten una sola sesión keep-alive.
+    Las páginas se entregan en orden y nunca hay más de `max_workers` en vuelo,
+    así que un consumidor lento frena la descarga. Para reanudar una descarga
+    interrumpida basta con pasar el último offset completado + limit como
+    `start_offset`. `select` se envía como $select (p. ej. ":*, *" para
+    incluir :updated_at). Un error HTTP tras agotar los reintentos se propaga.
+    Si se pasa `on_page`, se llama con (filas, bytes, segundos) por cada página
+    descargada, en orden; los segundos son los de su petición en el hilo del pool.
+    """
+    own_session = session is None
+    if own_session:
+        session = build_session(pool_size=max_workers)
+    try:
+        total = fetch_api_count(session, url, where, timeout)
+        logging.info(f"Descargando {total} filas desde {url} (desde offset {start_offset})")
+        offsets = iter(range(start_offset, total, limit))
+        last_len = 0
+        offset = start_offset - limit
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Cada página corre en una copia del contexto: su descarga se cuenta en la etapa que la pidió
+            pending = deque(
+                (off, pool.submit(
+                    contextvars.copy_context().run, _fetch_page, session, url, off, limit, where, timeout, select
+                ))
+                for off in islice(offsets, max_workers)
+            )
+            while pending:
+                offset, future = pending.popleft()
+                page, size, elapsed = future.result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append((next_offset, pool.submit(
+                        contextvars.copy_context().run,
+                        _fetch_page, session, url, next_offset, limit, where, timeout, select
+                    )))
+                last_len = len(page)
+                logging.info(f"Página offset={offset}: {last_len} filas en {elapsed:.2f}s")
+                if on_page:
+                    on_page(last_len, size, elapsed)
+                yield offset, page
+
+        # Si el recurso creció después del conteo, se sigue de forma secuencial
+        while last_len == limit:
+            offset += limit
+            page, size, elapsed = _fetch_page(session, url, offset, limit, where, timeout, select)
+            last_len = len(page)
+            if on_page:
+                on_page(last_len, size, elapsed)
+            if page:
+                yield offset, page
+    finally:
+        if own_session:
+            session.close()
+
+def fetch_api_json(url, limit=50000, where=None, start_offset=0, max_workers=4, select=None, on_page=None):
+    """Descarga datos JSON desde una API pública con paginación concurrente."""
     logging.info(f"Descargando datos desde {url}")
-    offset = 0
-    all_data = []
-    while True:
-        params = {"$limit": limit, "$offset": offset}
-        response = re.get(url, params=params)
-        if response.status_code != 200:
-            logging.error(f"Error {response.status_code} al consultar API: {url}")
-            break
-        data = response.json()
-        if not data:
-            break
-        all_data.extend(data)
-        offset += limit
-        logging.info(f"Descargadas {len(all_data)} filas hasta ahora")
-    return pd.DataFrame(all_data)
-
-def fetch_homicidios_data(limit=340000):
-    """Descarga los registros de Homicidios desde datos.gov.co"""
+    frames = [
+        pd.DataFrame(page)
+        for _, page in iter_api_pages(
+            url, limit, where, start_offset, max_workers, select=select, on_page=on_page
+        )
+        if page
+    ]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    logging.info(f"Descargadas {len(df)} filas")
+    return df
+
+HOMICIDIOS_DATASET = "m8fd-ahd9"
+HOMICIDIOS_DATE_FIELD = "fecha_hecho"
+
+def build_incremental_where(last_date=None, last_updated_at=None):
+    """Arma el filtro $where de SoQL a partir de la marca de agua de etl_control.
+
+    Trae los hechos desde la última fecha cargada y, además, cualquier fila
+    corregida en origen después del último :updated_at visto.
+    """
+    clauses = []
+    if last_date:
+        clauses.append(f"{HOMICIDIOS_DATE_FIELD} >= '{last_date:%Y-%m-%d}T00:00:00.000'")
+    if last_updated_at:
+        clauses.append(f":updated_at > '{str(last_updated_at).rstrip('Z')}'")
+    return " OR ".join(clauses) if clauses else None
+
+def fetch_homicidios_data(where=None, limit=50000, max_workers=4, on_page=None):
+    """Descarga los registros de Homicidios desde datos.gov.co.
+
+    Si se entrega `where`, el filtro se aplica del lado del servidor y solo se
+    transfieren las filas nuevas o modificadas. Se piden también los campos de
+    sistema (:updated_at) para poder avanzar la marca de agua. Las páginas de
+    `limit` filas se descargan como en el modo streaming (iter_api_pages).
+    """
     logging.info("Descargando datos de homicidios desde Socrata...")
-    client = Socrata("www.datos.gov.co", None)
-    result = client.get("m8fd-ahd9", limit=limit)
-    df_hom = pd.DataFrame.from_records(result)
+    if where:
+        logging.info(f"Filtro incremental: {where}")
+    df_hom = fetch_api_json(
+        socrata_resource_url(HOMICIDIOS_DATASET), limit=limit, where=where,
+        max_workers=max_workers, select=":*, *", on_page=on_page
+    )
     logging.info(f"Cantidad de registros descargados: {len(df_hom)}")
     return df_hom
+
+def read_divipola_deptos(path=DIVIPOLA_DEPTOS_CSV):
+    """Lee el CSV DIVIPOLA de departamentos versionado en el repositorio."""
+    df = pd.read_csv(path, dtype=str)
+    df_depto = pd.DataFrame({
+        "cod_depto": df["COD_DPTO"].str.strip().str.zfill(2),
+        "nombre_depto": df["NOM_DPTO"].str.strip(),
+        "lat": pd.to_numeric(df["LATITUD"], errors="coerce"),
+        "lon": pd.to_numeric(df["LONGITUD"], errors="coerce"),
+    })
+    return df_depto.drop_duplicates("cod_depto").sort_values("cod_depto").reset_index(drop=True)
+
+def read_divipola_mpios(path=DIVIPOLA_MPIOS_CSV):
+    """Lee el CSV DIVIPOLA de municipios (coordenadas con coma decimal)."""
+    df = pd.read_csv(path, dtype=str)
+    df_mpio = pd.DataFrame({
+        "cod_muni": df["Código Municipio"].str.strip().str.zfill(5),
+        "cod_depto": df["Código Departamento"].str.strip().str.zfill(2),
+        "nombre_muni": df["Nombre Municipio"].str.strip(),
+        "lat": pd.to_numeric(df["Latitud"].str.replace(",", "."), errors="coerce"),
+        "lon": pd.to_numeric(df["longitud"].str.replace(",", "."), errors="coerce"),
+    })
+    return df_mpio.drop_duplicates("cod_muni").sort_values("cod_muni").reset_index(drop=True)
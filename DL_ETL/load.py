@@ -1,16 +1,251 @@
+import csv
 import logging
+import os
+import tempfile
+import time
+import hashlib
+import pandas as pd
+import pyarrow as pa
 from sqlalchemy import text
 
-def upsert_raw(conn, df_hom):
-    """Inserta datos en la tabla raw_homicidios."""
-    logging.info("Insertando datos en la tabla raw_homicidios...")
-    insert_sql = """
+RAW_COLS = [
+    "fecha_hecho", "cod_depto", "departamento",
+    "cod_muni", "municipio", "zona", "sexo", "cantidad"
+]
+
+FUENTE_API = "API_HOMICIDIOS"
+
+LOAD_MODES = ("executemany", "multirow", "staging", "infile")
+
+STAGING_TABLE = "stg_raw_homicidios"
+
+# Las filas viajan como tuplas en el orden de RAW_COLS, con marcadores posicionales del driver
+_PLACEHOLDERS = ", ".join(["%s"] * len(RAW_COLS))
+
+INSERT_SQL = f"""
+INSERT INTO raw_homicidios
+({", ".join(RAW_COLS)}, fuente)
+VALUES ({_PLACEHOLDERS}, '{FUENTE_API}')
+ON DUPLICATE KEY UPDATE cantidad = VALUES(cantidad), fecha_ingreso = CURRENT_TIMESTAMP
+"""
+
+STAGING_INSERT_SQL = f"""
+INSERT INTO {STAGING_TABLE} ({", ".join(RAW_COLS)}, fuente)
+VALUES ({_PLACEHOLDERS}, '{FUENTE_API}')
+"""
+
+MERGE_SQL = f"""
+INSERT INTO raw_homicidios
+({", ".join(RAW_COLS)}, fuente)
+SELECT {", ".join("s." + c for c in RAW_COLS)}, s.fuente
+FROM {STAGING_TABLE} AS s
+ON DUPLICATE KEY UPDATE cantidad = s.cantidad, fecha_ingreso = CURRENT_TIMESTAMP
+"""
+
+
+def _multirow_sql(n_rows):
+    """Construye un INSERT multi-fila con marcadores posicionales."""
+    values = ",\n".join(f"({_PLACEHOLDERS}, '{FUENTE_API}')" for _ in range(n_rows))
+    return f"""
     INSERT INTO raw_homicidios
-    (fecha_hecho, cod_depto, departamento, cod_muni, municipio, zona, sexo, cantidad, fuente)
-    VALUES (:fecha_hecho, :cod_depto, :departamento, :cod_muni, :municipio, :zona, :sexo, :cantidad, 'API_HOMICIDIOS')
+    ({", ".join(RAW_COLS)}, fuente)
+    VALUES {values}
     ON DUPLICATE KEY UPDATE cantidad = VALUES(cantidad), fecha_ingreso = CURRENT_TIMESTAMP
     """
-    rows = df_hom.to_dict(orient="records")
-    for r in rows:
-        conn.execute(text(insert_sql), r)
-    logging.info(f"{len(df_hom)} registros procesados correctamente.")
+
+
+def _multirow_params(rows):
+    return tuple(v for r in rows for v in r)
+
+
+def _arrow_values(col):
+    """Valores Python de una columna Arrow (NULL como None), convertidos en bloque vía NumPy."""
+    if col.null_count and (pa.types.is_integer(col.type) or pa.types.is_floating(col.type)):
+        # NumPy convertiría los nulos en NaN
+        return col.to_pylist()
+    arr = col.to_numpy(zero_copy_only=False)
+    if arr.dtype.kind == "M":
+        # datetime64[D] -> datetime.date (NaT -> None)
+        arr = arr.astype(object)
+    return arr.tolist()
+
+
+def _row_chunks(data, chunk_size):
+    """Lotes (inicio, filas) con cada fila como tupla en el orden de RAW_COLS y NULL como None.
+
+    Acepta un DataFrame de pandas o una tabla Arrow (backend polars de
+    DL_ETL.transform); con Arrow cada columna del lote se convierte de una
+    vez, sin pasar por pandas ni por diccionarios.
+    """
+    if isinstance(data, pa.Table):
+        data = data.select(RAW_COLS)
+        # Las columnas de diccionario (categóricas) se decodifican una sola vez
+        data = data.cast(pa.schema([
+            pa.field(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+            for f in data.schema
+        ]))
+        for start in range(0, data.num_rows, chunk_size):
+            chunk = data.slice(start, chunk_size)
+            yield start, list(zip(*(_arrow_values(chunk.column(c)) for c in RAW_COLS)))
+    else:
+        data = data[RAW_COLS]
+        for start in range(0, len(data), chunk_size):
+            chunk = data.iloc[start:start + chunk_size]
+            # Nulos (NaN/NaT, incluidos los de columnas categóricas) viajan como NULL
+            yield start, list(chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+
+
+def _create_staging(conn):
+    """Crea la tabla temporal de staging (sin índices) para la sesión actual."""
+    conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}"))
+    conn.execute(text(f"""
+        CREATE TEMPORARY TABLE {STAGING_TABLE}
+        SELECT {", ".join(RAW_COLS)}, fuente FROM raw_homicidios LIMIT 0
+    """))
+
+
+def _load_infile(conn, rows):
+    """Escribe el lote a un CSV temporal y lo carga con LOAD DATA LOCAL INFILE."""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for r in rows:
+                # \N es la representación de NULL para LOAD DATA
+                writer.writerow(["\\N" if v is None else v for v in r] + [FUENTE_API])
+        conn.execute(text(f"""
+            LOAD DATA LOCAL INFILE '{path.replace(os.sep, "/")}'
+            INTO TABLE {STAGING_TABLE}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            ({", ".join(RAW_COLS)}, fuente)
+        """))
+    finally:
+        os.remove(path)
+
+
+def upsert_raw(conn, df_hom, chunk_size=5000, mode="executemany", on_chunk=None):
+    """Inserta datos en la tabla raw_homicidios por lotes.
+
+    Modos disponibles:
+    - executemany: un INSERT ... ON DUPLICATE KEY UPDATE por lote vía executemany.
+    - multirow: un único INSERT multi-fila por lote.
+    - staging: los lotes se cargan a una tabla temporal y se fusionan con un
+      solo INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+    - infile: igual que staging, pero cada lote entra con LOAD DATA LOCAL INFILE
+      (requiere allow_local_infile en el servidor y en el conector).
+
+    `df_hom` puede ser un DataFrame de pandas o una tabla Arrow. Las filas se
+    envían como tuplas posicionales, sin armar un diccionario por fila.
+    Cada lote se confirma en su propia transacción y se reporta su velocidad
+    (filas/seg) para poder ajustar chunk_size frente a uq_raw_uniq. Si se pasa
+    `on_chunk`, se llama con (filas, segundos) al terminar cada lote.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Modo de carga no soportado: {mode}. Opciones: {LOAD_MODES}")
+
+    total = len(df_hom)
+    logging.info(f"Insertando {total} registros en raw_homicidios (modo={mode}, lote={chunk_size})...")
+
+    staged = mode in ("staging", "infile")
+    if staged:
+        _create_staging(conn)
+        conn.commit()
+
+    t_total = time.perf_counter()
+    for start, rows in _row_chunks(df_hom, chunk_size):
+        t0 = time.perf_counter()
+        if mode == "executemany":
+            conn.exec_driver_sql(INSERT_SQL, rows)
+        elif mode == "multirow":
+            conn.exec_driver_sql(_multirow_sql(len(rows)), _multirow_params(rows))
+        elif mode == "staging":
+            conn.exec_driver_sql(STAGING_INSERT_SQL, rows)
+        else:
+            _load_infile(conn, rows)
+        conn.commit()
+
+        elapsed = time.perf_counter() - t0
+        rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+        logging.info(
+            f"Lote {start // chunk_size + 1}: {len(rows)} filas en {elapsed:.2f}s "
+            f"({rate:,.0f} filas/seg) - {min(start + chunk_size, total)}/{total}"
+        )
+        if on_chunk:
+            on_chunk(len(rows), elapsed)
+
+    if staged and total:
+        t0 = time.perf_counter()
+        conn.execute(text(MERGE_SQL))
+        conn.commit()
+        logging.info(f"Fusión desde {STAGING_TABLE} completada en {time.perf_counter() - t0:.2f}s")
+    if staged:
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}"))
+
+    elapsed = time.perf_counter() - t_total
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    logging.info(f"{total} registros procesados correctamente en {elapsed:.2f}s ({rate:,.0f} filas/seg).")
+    return total
+
+
+# =========================
+# DIMENSIONES
+# =========================
+def frame_hash(df):
+    """Huella sha256 del contenido de un DataFrame (independiente del orden de filas)."""
+    data = df.sort_values(list(df.columns)).to_csv(index=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def changed_rows(df_new, df_db, key):
+    """Filas de df_new que no existen en df_db o cuyos valores cambiaron."""
+    value_cols = [c for c in df_new.columns if c != key]
+    merged = df_new.merge(
+        df_db, on=key, how="left", suffixes=("", "_db"), indicator=True
+    )
+    changed = merged["_merge"] == "left_only"
+    for c in value_cols:
+        a, b = merged[c], merged[f"{c}_db"]
+        same = (a == b) | (a.isna() & b.isna())
+        if pd.api.types.is_float_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            same |= (a - b).abs() < 1e-9
+        changed |= ~same
+    return df_new[changed.to_numpy()]
+
+
+def upsert_dim(conn, table, df, key):
+    """Inserta o actualiza en una tabla dimensional solo las filas que cambiaron.
+
+    A diferencia de to_sql(if_exists="replace"), respeta la tabla existente con
+    sus llaves primarias, foráneas y columnas adicionales definidas en init.sql.
+    Si la tabla no tiene esas columnas (p. ej. la creó to_sql en una versión
+    anterior del ETL) se detiene con un error que indica la migración pendiente.
+    """
+    cols = list(df.columns)
+    existentes = {c for (c,) in conn.execute(text("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t
+    """), {"t": table}).fetchall()}
+    faltan = [c for c in cols if c not in existentes]
+    if faltan:
+        raise RuntimeError(
+            f"{table} no tiene las columnas {faltan} de mysql-init/init.sql; "
+            "aplique las migraciones con: python -m DL_ETL.migrations"
+        )
+    df_db = pd.read_sql(text(f"SELECT {', '.join(cols)} FROM {table}"), conn)
+    df_db[key] = df_db[key].astype(str)
+    df_changed = changed_rows(df, df_db, key)
+    if df_changed.empty:
+        logging.info(f"{table}: sin cambios respecto a la base de datos.")
+        return 0
+
+    upsert_sql = f"""
+    INSERT INTO {table} ({", ".join(cols)})
+    VALUES ({", ".join(":" + c for c in cols)})
+    ON DUPLICATE KEY UPDATE {", ".join(f"{c} = VALUES({c})" for c in cols if c != key)}
+    """
+    rows = df_changed.astype(object).where(df_changed.notna(), None).to_dict(orient="records")
+    conn.execute(text(upsert_sql), rows)
+    logging.info(f"{len(rows)} registros insertados/actualizados en {table}.")
+    return len(rows)
@@ -0,0 +1,194 @@
+import cProfile
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+from DL_ETL.extract import count_downloads
+
+# Misma definición que mysql-init/init.sql, para bases creadas antes de esta tabla
+ETL_RUNS_DDL = """
+CREATE TABLE IF NOT EXISTS etl_runs (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  run_id CHAR(32) NOT NULL,
+  etapa VARCHAR(100) NOT NULL,
+  estado VARCHAR(20) NOT NULL,
+  inicio DATETIME(3) NOT NULL,
+  fin DATETIME(3) NOT NULL,
+  segundos DOUBLE NOT NULL,
+  filas_entrada BIGINT NULL,
+  filas_salida BIGINT NULL,
+  filas_por_seg DOUBLE NULL,
+  bytes_descargados BIGINT NULL,
+  rss_pico_mb DOUBLE NULL,
+  detalle TEXT NULL,
+  error TEXT NULL,
+  INDEX idx_etl_runs_run (run_id),
+  INDEX idx_etl_runs_inicio (inicio)
+) ENGINE=InnoDB
+"""
+
+INSERT_RUN_SQL = """
+INSERT INTO etl_runs
+(run_id, etapa, estado, inicio, fin, segundos, filas_entrada, filas_salida,
+ filas_por_seg, bytes_descargados, rss_pico_mb, detalle, error)
+VALUES (:run_id, :etapa, :estado, :inicio, :fin, :segundos, :filas_entrada, :filas_salida,
+        :filas_por_seg, :bytes_descargados, :rss_pico_mb, :detalle, :error)
+"""
+
+
+def peak_rss_mb():
+    """Memoria residente máxima del proceso hasta ahora (MB)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux la reporta en KB y macOS en bytes
+    return pico / 1024 ** 2 if os.uname().sysname == "Darwin" else pico / 1024
+
+
+def current_rss_mb():
+    """Memoria residente actual del proceso (MB), o None si el sistema no la expone."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+class RssSampler:
+    """Muestrea la RSS del proceso en un hilo mientras dura un bloque `with`.
+
+    `pico` es el máximo observado en ese intervalo. Sin /proc (p. ej. macOS)
+    se usa el pico de toda la vida del proceso, que es solo una cota superior.
+    """
+
+    def __init__(self, intervalo=0.1):
+        self.intervalo = intervalo
+        self.pico = None
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _muestrear(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.pico = rss if self.pico is None else max(self.pico, rss)
+        return rss is not None
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            self._muestrear()
+
+    def start(self):
+        if self._muestrear():
+            self._hilo = threading.Thread(target=self._bucle, name="rss-sampler", daemon=True)
+            self._hilo.start()
+        return self
+
+    def stop(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+            self._muestrear()
+        else:
+            self.pico = peak_rss_mb()
+        return self.pico
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+class RunMetrics:
+    """Métricas por etapa de una corrida del ETL.
+
+    Cada etapa se envuelve con `stage()`, que mide tiempo de pared, bytes
+    descargados, filas por segundo y el pico de RSS del proceso muestreado
+    mientras corre la etapa (ver RssSampler).
+    Dentro del bloque se completan `filas_salida` (y opcionalmente `detalle`).
+    Con profile=True cada etapa se perfila con cProfile y se conserva el
+    perfil de la más lenta. Las etapas pueden correr en hilos distintos
+    (DL_ETL.dag): los bytes se cuentan por etapa (ver
+    DL_ETL.extract.count_downloads), pero la RSS muestreada es la del
+    proceso, con la memoria de todas las etapas en curso.
+    """
+
+    def __init__(self, profile=False):
+        self.run_id = uuid.uuid4().hex
+        self.profile = profile
+        self.stages = []
+        self._slowest = None  # (segundos, etapa, perfil)
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {"etapa": name, "filas_entrada": rows_in, "filas_salida": None, "detalle": {}, "error": None}
+        with count_downloads() as descargas:
+            profiler = cProfile.Profile() if self.profile else None
+            rss = RssSampler().start()
+            record["inicio"] = datetime.now()
+            t0 = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                yield record
+                record["estado"] = "ok"
+            except Exception as e:
+                record["estado"] = "error"
+                record["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                if profiler:
+                    profiler.disable()
+                elapsed = time.perf_counter() - t0
+                record["fin"] = datetime.now()
+                record["segundos"] = elapsed
+                record["bytes_descargados"] = descargas["bytes"]
+                record["rss_pico_mb"] = rss.stop()
+                rows = record["filas_salida"] if record["filas_salida"] is not None else record["filas_entrada"]
+                record["filas_por_seg"] = rows / elapsed if rows and elapsed > 0 else None
+                self.stages.append(record)
+                if profiler and (self._slowest is None or elapsed > self._slowest[0]):
+                    self._slowest = (elapsed, name, profiler)
+                logging.info(
+                    f"[{name}] {record['estado']} en {elapsed:.2f}s - filas {record['filas_entrada']} -> "
+                    f"{record['filas_salida']}, {record['bytes_descargados'] / 1024 ** 2:.1f} MB descargados, "
+                    f"RSS pico {record['rss_pico_mb']:.0f} MB"
+                )
+
+    def dump_profile(self, directory):
+        """Guarda el perfil cProfile de la etapa más lenta (.prof, para snakeviz o flameprof)."""
+        if self._slowest is None:
+            return None
+        _, name, profiler = self._slowest
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"etl_{self.run_id[:12]}_{name}.prof")
+        profiler.dump_stats(path)
+        logging.info(f"Perfil de la etapa más lenta ({name}) guardado en {path}")
+        return path
+
+    def persist(self, conn):
+        """Inserta una fila por etapa en etl_runs."""
+        if not self.stages:
+            return
+        conn.execute(text(ETL_RUNS_DDL))
+        conn.execute(text(INSERT_RUN_SQL), [
+            {
+                **{k: s[k] for k in (
+                    "etapa", "estado", "inicio", "fin", "segundos", "filas_entrada",
+                    "filas_salida", "filas_por_seg", "bytes_descargados", "rss_pico_mb", "error"
+                )},
+                "run_id": self.run_id,
+                "detalle": json.dumps(s["detalle"], default=str) if s["detalle"] else None,
+            }
+            for s in self.stages
+        ])
+        conn.commit()
+        logging.info(f"Métricas de la corrida {self.run_id} guardadas en etl_runs ({len(self.stages)} etapas)")
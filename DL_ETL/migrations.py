@@ -0,0 +1,485 @@
+"""Migraciones de esquema de homicidios_db, aplicadas en sitio sobre bases existentes.
+
+mysql-init/init.sql crea las bases nuevas ya con el esquema final y marca
+estas migraciones como aplicadas en schema_migrations; las bases creadas
+antes se ponen al día con
+
+    python -m DL_ETL.migrations               # aplica las pendientes
+    python -m DL_ETL.migrations --estado      # solo lista el estado
+    python -m DL_ETL.migrations --hasta 0     # revierte (p. ej. para medir el antes)
+
+Cada migración sabe comprobar si su cambio ya está presente, así que una
+base que ya lo tiene solo se registra. Las que reescriben valores de
+uq_raw_uniq en raw_homicidios reconstruyen los agregados y borran la marca
+de agua de etl_control: la corrida siguiente del ETL es una recarga completa.
+Cuando raw_homicidios está
+particionada, cada corrida agrega además las particiones de los años que
+falten hasta el siguiente al actual.
+"""
+import argparse
+import logging
+import time
+from collections import namedtuple
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import text
+
+from DL_ETL.aggregates import rebuild_aggregates
+from DL_ETL.divipola import completar_codigos, indice_desde_db
+from DL_ETL.transform import KEY_TEXT_COLS, SIN_DATO
+
+MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INT NOT NULL PRIMARY KEY,
+  nombre VARCHAR(100) NOT NULL,
+  aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  segundos DOUBLE NULL
+) ENGINE=InnoDB
+"""
+
+# Primer año con partición propia; lo anterior cae en `pantes` y lo posterior al
+# último año creado en `pfuturo` (ver add_year_partitions)
+PRIMER_ANIO = 2010
+
+# Tablas DIVIPOLA como las crea mysql-init/init.sql, con las columnas que espera
+# DL_ETL.load.upsert_dim y el ancho de su código (en orden: municipios referencia a departamentos)
+DIM_TABLES = {
+    "dim_departamentos": ("""
+        CREATE TABLE dim_departamentos (
+          cod_depto VARCHAR(6) PRIMARY KEY,
+          nombre_depto VARCHAR(200),
+          geom POINT NULL,
+          lat DOUBLE NULL,
+          lon DOUBLE NULL
+        ) ENGINE=InnoDB
+    """, {"cod_depto": 2, "nombre_depto": None}),
+    "dim_municipios": ("""
+        CREATE TABLE dim_municipios (
+          cod_muni VARCHAR(8) PRIMARY KEY,
+          cod_depto VARCHAR(6),
+          nombre_muni VARCHAR(200),
+          lat DOUBLE NULL,
+          lon DOUBLE NULL,
+          zona_urbana_rural ENUM('URBANA','RURAL','MIXTA') DEFAULT 'MIXTA',
+          FOREIGN KEY (cod_depto) REFERENCES dim_departamentos(cod_depto)
+        ) ENGINE=InnoDB
+    """, {"cod_muni": 5, "cod_depto": 2, "nombre_muni": None}),
+}
+
+# Nombres de columna de las dimensiones creadas por to_sql(if_exists="replace")
+# en las versiones del ETL anteriores a init.sql
+DIM_LEGACY_COLS = {"nombre_depto": "nom_depto", "nombre_muni": "nom_mpio"}
+
+# Columnas de uq_raw_uniq
+RAW_UNIQUE_COLS = ["fecha_hecho", "cod_depto", "cod_muni", "zona", "sexo", "fuente"]
+
+# up/down: lista de sentencias o función (conn); aplicada(conn) -> bool
+Migration = namedtuple("Migration", ["version", "nombre", "up", "down", "aplicada"])
+
+
+def _index_exists(conn, table, index):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND INDEX_NAME = :i
+    """), {"t": table, "i": index}).scalar() > 0
+
+
+def _partitions(conn, table):
+    """Particiones de la tabla como (nombre, límite superior en años o None para MAXVALUE)."""
+    rows = conn.execute(text("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """), {"t": table}).fetchall()
+    return [(nombre, None if limite == "MAXVALUE" else int(limite)) for nombre, limite in rows]
+
+
+def _year_partitions(desde, hasta):
+    """Definiciones p<año> para los años [desde, hasta], más pfuturo."""
+    return [f"PARTITION p{y} VALUES LESS THAN ({y + 1})" for y in range(desde, hasta + 1)] + [
+        "PARTITION pfuturo VALUES LESS THAN MAXVALUE"
+    ]
+
+
+def _ultimo_anio(conn):
+    """Último año que debe tener partición propia: el siguiente al actual o el mayor con datos."""
+    max_fecha = conn.execute(text("SELECT MAX(fecha_hecho) FROM raw_homicidios")).scalar()
+    return max(date.today().year + 1, max_fecha.year if max_fecha else 0)
+
+
+def _partition_raw(conn):
+    # MySQL exige que toda llave única incluya la columna de partición:
+    # uq_raw_uniq ya tiene fecha_hecho y la llave primaria pasa a (id_hecho, fecha_hecho).
+    # La tabla se reconstruye una sola vez (llave y particiones en la misma sentencia).
+    particiones = [f"PARTITION pantes VALUES LESS THAN ({PRIMER_ANIO})"]
+    particiones += _year_partitions(PRIMER_ANIO, _ultimo_anio(conn))
+    conn.execute(text(f"""
+        ALTER TABLE raw_homicidios
+          DROP PRIMARY KEY, ADD PRIMARY KEY (id_hecho, fecha_hecho)
+        PARTITION BY RANGE (YEAR(fecha_hecho)) (
+          {", ".join(particiones)}
+        )
+    """))
+
+
+def _rewrite_raw_keys(conn, nuevos, join="", where="1 = 1"):
+    """Reescribe columnas de uq_raw_uniq en raw_homicidios sin chocar con la llave.
+
+    `nuevos` es {columna: expresión SQL con el valor nuevo} (alias `r` para
+    raw_homicidios, más las tablas de `join`); solo se actualizan las filas
+    que cumplen `where`. Si dos filas quedan con la misma llave son el mismo
+    hecho cargado con formatos distintos: se conserva la cargada más
+    recientemente (su cantidad es la vigente) y se borran las demás.
+    """
+    clave = [nuevos.get(c, f"r.{c}") for c in RAW_UNIQUE_COLS]
+    borradas = conn.execute(text(f"""
+        DELETE raw_homicidios FROM raw_homicidios
+        JOIN (
+          SELECT r.id_hecho, ROW_NUMBER() OVER (
+            PARTITION BY {", ".join(clave)} ORDER BY r.fecha_ingreso DESC, r.id_hecho DESC
+          ) AS n
+          FROM raw_homicidios r {join}
+        ) AS d ON d.id_hecho = raw_homicidios.id_hecho
+        WHERE d.n > 1
+    """)).rowcount
+    actualizadas = conn.execute(text(f"""
+        UPDATE raw_homicidios r {join}
+        SET {", ".join(f"r.{c} = {e}" for c, e in nuevos.items())}
+        WHERE {where}
+    """)).rowcount
+    logging.info(f"raw_homicidios: {actualizadas} filas reescritas, {borradas} duplicadas eliminadas")
+
+
+def _force_full_refresh(conn):
+    """Reconstruye los agregados y borra la marca de agua: la próxima corrida recarga todo."""
+    rebuild_aggregates(conn)
+    conn.execute(text("DELETE FROM etl_control WHERE proceso = 'homicidios_api'"))
+    conn.commit()
+    logging.warning(
+        "Marca de agua de homicidios_api borrada: la próxima corrida del ETL descarga el dataset completo"
+    )
+
+
+def _table_columns(conn, table):
+    return {c for (c,) in conn.execute(text("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t
+    """), {"t": table}).fetchall()}
+
+
+def _legacy_dims(conn):
+    """Tablas dimensionales que existen pero sin las columnas de init.sql."""
+    legado = []
+    for table, (_, columnas) in DIM_TABLES.items():
+        existentes = _table_columns(conn, table)
+        if existentes and not set(columnas) <= existentes:
+            legado.append(table)
+    return legado
+
+
+def _recreate_dims(conn):
+    # La tabla vieja (sin llave primaria, columnas TEXT) se renombra, se crea la de
+    # init.sql y se copian sus filas con los códigos rellenados a 2 y 5 dígitos;
+    # INSERT IGNORE descarta códigos repetidos y municipios de departamentos inexistentes
+    for table in _legacy_dims(conn):
+        ddl, columnas = DIM_TABLES[table]
+        existentes = _table_columns(conn, table)
+        origen = [c if c in existentes else DIM_LEGACY_COLS.get(c, c) for c in columnas]
+        faltan = [o for o in origen if o not in existentes]
+        if faltan:
+            raise RuntimeError(f"{table}: columnas {faltan} no reconocidas; recree la tabla con mysql-init/init.sql")
+        valores = [
+            f"LPAD(TRIM({o}), {ancho}, '0')" if ancho else o
+            for o, ancho in zip(origen, columnas.values())
+        ]
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}_legado"))
+        conn.execute(text(f"RENAME TABLE {table} TO {table}_legado"))
+        conn.execute(text(ddl))
+        copiadas = conn.execute(text(f"""
+            INSERT IGNORE INTO {table} ({", ".join(columnas)})
+            SELECT {", ".join(valores)} FROM {table}_legado
+        """)).rowcount
+        conn.execute(text(f"DROP TABLE {table}_legado"))
+        # Sin el hash guardado, la próxima corrida vuelve a cargar la dimensión completa
+        conn.execute(text("DELETE FROM etl_control WHERE proceso = :p"), {"p": table})
+        conn.commit()
+        logging.info(f"{table}: recreada con el esquema de init.sql ({copiadas} filas copiadas)")
+
+
+def _codes_pending(conn):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM raw_homicidios
+        WHERE CHAR_LENGTH(cod_muni) <> 5 OR CHAR_LENGTH(cod_depto) <> 2
+    """)).scalar()
+
+
+def _normalize_raw_codes(conn):
+    # El índice sale de las dimensiones: si aún tienen el formato viejo se adelanta la migración 5
+    _recreate_dims(conn)
+    # Los códigos se pasan por completar_codigos, igual que en DL_ETL.transform.val:
+    # una vez por combinación distinta, y el resultado se aplica con un UPDATE ... JOIN
+    combos = pd.read_sql(text("""
+        SELECT DISTINCT cod_depto, departamento, cod_muni, municipio FROM raw_homicidios
+        WHERE CHAR_LENGTH(cod_muni) <> 5 OR CHAR_LENGTH(cod_depto) <> 2
+    """), conn)
+    nuevos = completar_codigos(combos.copy(), indice_desde_db(conn))
+    combos["cod_depto_nuevo"] = nuevos["cod_depto"]
+    combos["cod_muni_nuevo"] = nuevos["cod_muni"]
+    conn.execute(text("DROP TEMPORARY TABLE IF EXISTS mig_codigos"))
+    conn.execute(text("""
+        CREATE TEMPORARY TABLE mig_codigos (
+          cod_depto VARCHAR(6) NOT NULL, departamento VARCHAR(200), cod_muni VARCHAR(8) NOT NULL,
+          municipio VARCHAR(200), cod_depto_nuevo VARCHAR(6) NOT NULL, cod_muni_nuevo VARCHAR(8) NOT NULL,
+          INDEX (cod_muni, cod_depto)
+        )
+    """))
+    if len(combos):
+        conn.execute(
+            text("""
+                INSERT INTO mig_codigos VALUES
+                (:cod_depto, :departamento, :cod_muni, :municipio, :cod_depto_nuevo, :cod_muni_nuevo)
+            """),
+            combos.astype(object).where(combos.notna(), None).to_dict(orient="records"),
+        )
+    _rewrite_raw_keys(
+        conn,
+        {"cod_depto": "COALESCE(m.cod_depto_nuevo, r.cod_depto)", "cod_muni": "COALESCE(m.cod_muni_nuevo, r.cod_muni)"},
+        join="""
+            LEFT JOIN mig_codigos m
+              ON m.cod_muni = r.cod_muni AND m.cod_depto = r.cod_depto
+             AND m.departamento <=> r.departamento AND m.municipio <=> r.municipio
+        """,
+        where="m.cod_muni IS NOT NULL",
+    )
+    conn.execute(text("DROP TEMPORARY TABLE IF EXISTS mig_codigos"))
+    conn.commit()
+    _force_full_refresh(conn)
+
+
+def _key_text_nullable(conn):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'raw_homicidios'
+          AND COLUMN_NAME IN ('zona', 'sexo') AND IS_NULLABLE = 'YES'
+    """)).scalar() > 0
+
+
+def _fill_sin_dato(conn):
+    # Faltantes de zona/sexo según la versión del ETL que los cargó: NULL o los textos
+    # "None"/"Nan" que dejaba astype(str); todos pasan al valor fijo de DL_ETL.transform
+    faltante = "r.{0} IS NULL OR r.{0} IN ('None', 'Nan', '')"
+    _rewrite_raw_keys(
+        conn,
+        {c: f"CASE WHEN {faltante.format(c)} THEN '{SIN_DATO}' ELSE r.{c} END" for c in KEY_TEXT_COLS},
+        where=" OR ".join(faltante.format(c) for c in KEY_TEXT_COLS),
+    )
+    conn.execute(text(f"""
+        ALTER TABLE raw_homicidios
+          {", ".join(f"MODIFY {c} VARCHAR(20) NOT NULL DEFAULT '{SIN_DATO}'" for c in KEY_TEXT_COLS)}
+    """))
+    rebuild_aggregates(conn)
+
+
+def _updated_at_in_notes(conn):
+    """La marca :updated_at sigue en notas: falta la columna o quedó sin copiar."""
+    if "last_updated_at" not in _table_columns(conn, "etl_control"):
+        return True
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM etl_control
+        WHERE proceso = 'homicidios_api' AND notas IS NOT NULL AND last_updated_at IS NULL
+    """)).scalar() > 0
+
+
+def _move_updated_at(conn):
+    # El ALTER TABLE se confirma solo: si la copia falla, al relanzar solo se repite la copia
+    if "last_updated_at" not in _table_columns(conn, "etl_control"):
+        conn.execute(text(
+            "ALTER TABLE etl_control ADD COLUMN last_updated_at VARCHAR(32) NULL AFTER last_loaded_ts"
+        ))
+    conn.execute(text("""
+        UPDATE etl_control SET last_updated_at = LEFT(notas, 32), notas = NULL
+        WHERE proceso = 'homicidios_api' AND notas IS NOT NULL AND last_updated_at IS NULL
+    """))
+
+
+MIGRATIONS = [
+    Migration(
+        1, "indices_cubrientes_raw",
+        # Consultas por departamento o municipio en un rango de fechas resueltas solo con el índice
+        up=["""
+            ALTER TABLE raw_homicidios
+              ADD INDEX idx_raw_depto_fecha (cod_depto, fecha_hecho, cantidad),
+              ADD INDEX idx_raw_muni_fecha (cod_muni, fecha_hecho, cantidad),
+              ALGORITHM=INPLACE, LOCK=NONE
+        """],
+        down=["""
+            ALTER TABLE raw_homicidios
+              DROP INDEX idx_raw_depto_fecha, DROP INDEX idx_raw_muni_fecha
+        """],
+        aplicada=lambda conn: _index_exists(conn, "raw_homicidios", "idx_raw_muni_fecha"),
+    ),
+    Migration(
+        2, "particion_anual_raw",
+        up=_partition_raw,
+        down=[
+            "ALTER TABLE raw_homicidios REMOVE PARTITIONING",
+            "ALTER TABLE raw_homicidios DROP PRIMARY KEY, ADD PRIMARY KEY (id_hecho)",
+        ],
+        aplicada=lambda conn: bool(_partitions(conn, "raw_homicidios")),
+    ),
+    Migration(
+        3, "codigos_divipola_raw",
+        # Filas cargadas antes de DL_ETL.divipola, con los códigos de la API (municipio de
+        # 8 dígitos con centro poblado): se llevan a 2 y 5 dígitos como los carga hoy el ETL.
+        # No se revierte: los códigos originales no se conservan.
+        up=_normalize_raw_codes,
+        down=[],
+        aplicada=lambda conn: _codes_pending(conn) == 0,
+    ),
+    Migration(
+        4, "sin_dato_zona_sexo",
+        # zona y sexo son parte de uq_raw_uniq y dos NULL nunca chocan: sin este
+        # cambio cada recarga de una ventana solapada vuelve a insertar esas filas
+        up=_fill_sin_dato,
+        down=[f"""
+            ALTER TABLE raw_homicidios
+              {", ".join(f"MODIFY {c} VARCHAR(20) NULL" for c in KEY_TEXT_COLS)}
+        """],
+        aplicada=lambda conn: not _key_text_nullable(conn),
+    ),
+    Migration(
+        5, "dimensiones_init_sql",
+        # dim_departamentos(cod_depto, nom_depto) y dim_municipios(cod_muni, cod_depto, nom_mpio)
+        # creadas por to_sql: upsert_dim espera las columnas y la llave primaria de init.sql.
+        # No se revierte: el formato anterior no tiene llaves.
+        up=_recreate_dims,
+        down=[],
+        aplicada=lambda conn: not _legacy_dims(conn),
+    ),
+    Migration(
+        6, "marca_updated_at_control",
+        # La marca :updated_at de homicidios_api vivía en etl_control.notas: pasa a su columna
+        up=_move_updated_at,
+        down=[
+            """
+            UPDATE etl_control SET notas = last_updated_at
+            WHERE proceso = 'homicidios_api' AND last_updated_at IS NOT NULL
+            """,
+            "ALTER TABLE etl_control DROP COLUMN last_updated_at",
+        ],
+        aplicada=lambda conn: not _updated_at_in_notes(conn),
+    ),
+]
+
+LATEST = MIGRATIONS[-1].version
+
+# Migraciones sin las cuales la carga falla o duplica filas: las que cambian el formato
+# de uq_raw_uniq, la que deja las dimensiones con las columnas de upsert_dim y la
+# columna de la marca :updated_at que leen las cargas incrementales
+REQUIRED_BEFORE_LOAD = {3, 4, 5, 6}
+
+
+def _run(conn, pasos):
+    if callable(pasos):
+        pasos(conn)
+    else:
+        for sentencia in pasos:
+            conn.execute(text(sentencia))
+
+
+def applied_versions(conn):
+    conn.execute(text(MIGRATIONS_DDL))
+    return {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations")).fetchall()}
+
+
+def pending_migrations(conn):
+    """Migraciones sin registrar en schema_migrations (sin aplicar nada)."""
+    aplicadas = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in aplicadas]
+
+
+def add_year_partitions(conn, hasta=None):
+    """Separa de pfuturo las particiones de los años que falten hasta `hasta`.
+
+    No hace nada si raw_homicidios no está particionada. Devuelve los años agregados.
+    """
+    particiones = _partitions(conn, "raw_homicidios")
+    if not particiones:
+        return []
+    hasta = hasta or _ultimo_anio(conn)
+    ultimo = max(limite for _, limite in particiones if limite is not None) - 1
+    if hasta <= ultimo:
+        return []
+    conn.execute(text(f"""
+        ALTER TABLE raw_homicidios REORGANIZE PARTITION pfuturo INTO (
+          {", ".join(_year_partitions(ultimo + 1, hasta))}
+        )
+    """))
+    anios = list(range(ultimo + 1, hasta + 1))
+    logging.info(f"raw_homicidios: particiones agregadas para {anios}")
+    return anios
+
+
+def migrate(conn, hasta=None):
+    """Lleva el esquema a la versión `hasta` (la última por defecto), subiendo o bajando.
+
+    Devuelve una lista de (version, nombre, acción, segundos). En MySQL los
+    ALTER TABLE se confirman solos: si uno falla, las migraciones anteriores
+    quedan aplicadas y registradas, y basta con relanzar.
+    """
+    hasta = LATEST if hasta is None else hasta
+    aplicadas = applied_versions(conn)
+    conn.commit()
+    hechas = []
+
+    for m in MIGRATIONS:
+        if m.version > hasta or m.version in aplicadas:
+            continue
+        if m.aplicada(conn):
+            accion, segundos = "registrada", None
+        else:
+            logging.info(f"Aplicando migración {m.version} ({m.nombre})...")
+            t0 = time.perf_counter()
+            _run(conn, m.up)
+            accion, segundos = "aplicada", time.perf_counter() - t0
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, nombre, segundos) VALUES (:v, :n, :s)"),
+            {"v": m.version, "n": m.nombre, "s": segundos},
+        )
+        conn.commit()
+        hechas.append((m.version, m.nombre, accion, segundos))
+
+    for m in reversed(MIGRATIONS):
+        if m.version <= hasta or m.version not in aplicadas:
+            continue
+        logging.info(f"Revirtiendo migración {m.version} ({m.nombre})...")
+        t0 = time.perf_counter()
+        if m.aplicada(conn):
+            _run(conn, m.down)
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = :v"), {"v": m.version})
+        conn.commit()
+        hechas.append((m.version, m.nombre, "revertida", time.perf_counter() - t0))
+
+    add_year_partitions(conn)
+    conn.commit()
+    for version, nombre, accion, segundos in hechas:
+        duracion = f" en {segundos:.1f}s" if segundos is not None else ""
+        logging.info(f"Migración {version} ({nombre}) {accion}{duracion}")
+    return hechas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de esquema de homicidios_db")
+    parser.add_argument("--estado", action="store_true", help="Lista las migraciones y si están aplicadas.")
+    parser.add_argument("--hasta", type=int, help="Versión destino (0 revierte todas).")
+    args = parser.parse_args()
+
+    from DL_ETL.config import get_engine
+    with get_engine().connect() as conn:
+        if args.estado:
+            aplicadas = applied_versions(conn)
+            for m in MIGRATIONS:
+                print(f"{m.version:>3}  {m.nombre:30s} {'aplicada' if m.version in aplicadas else 'pendiente'}")
+        else:
+            migrate(conn, args.hasta)
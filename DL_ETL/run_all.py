@@ -1,90 +1,433 @@
+import argparse
 import logging
+import sys
 from datetime import datetime
+from functools import partial
 
-from DL_ETL.config import engine
-from DL_ETL.extract import fetch_api_json, fetch_homicidios_data
-from DL_ETL.transform import val
-from DL_ETL.load import upsert_raw
-from DL_ETL.control import get_last_loaded_date, update_last_loaded_date
+import pyarrow as pa
+
+from DL_ETL.config import (
+    get_engine, LOAD_CHUNK_SIZE, LOAD_MODE, CACHE_DIR, CACHE_TTL, CACHE_MAX_BYTES, DIM_SOURCE,
+    SNAPSHOT_PATH, PROFILE_DIR, CHECKPOINT_DIR, WORKERS, TRANSFORM_BACKEND,
+    STREAM, STREAM_CHUNK_ROWS, STREAM_PREFETCH
+)
+from DL_ETL.aggregates import refresh_aggregates
+from DL_ETL.cache import cached_extract
+from DL_ETL.dag import Pipeline, Stage
+from DL_ETL.snapshot import refresh_snapshot, DEFAULT_SNAPSHOT_PATH
+from DL_ETL.extract import (
+    fetch_api_json, fetch_homicidios_data, build_incremental_where, HOMICIDIOS_DATASET,
+    read_divipola_deptos, read_divipola_mpios
+)
+from DL_ETL.transform import transform, TRANSFORM_BACKENDS
+from DL_ETL.divipola import indice_desde_db
+from DL_ETL.load import upsert_raw, upsert_dim, frame_hash
+from DL_ETL.metrics import RunMetrics
+from DL_ETL.migrations import REQUIRED_BEFORE_LOAD, pending_migrations
+from DL_ETL.stream import StreamSummary, iter_homicidios_chunks, iter_transformed, load_stream
+from DL_ETL.control import (
+    get_last_loaded_date, update_last_loaded_date,
+    get_last_updated_at, update_last_updated_at,
+    get_notes, update_notes,
+    get_stage_progress, save_stage_progress, clear_stage_progress
+)
+
+def extract_cached(fetch_fn, dataset_id, query=None, watermark=None, offline=False):
+    """Extracción con caché local en Parquet (ver DL_ETL.cache)."""
+    return cached_extract(
+        fetch_fn, dataset_id, query=query, watermark=watermark, ttl=CACHE_TTL,
+        offline=offline, max_bytes=CACHE_MAX_BYTES, cache_dir=CACHE_DIR
+    )
 
 # =========================
 # CARGAS DIMENSIONALES
 # =========================
-def load_depto(conn):
-    url = "https://www.datos.gov.co/resource/vcjz-niiq.json"
-    from DL_ETL.extract import fetch_api_json
-    df_depto = fetch_api_json(url)
-    if df_depto.empty:
-        logging.warning("No se obtuvieron datos Departamentos.")
-        return
-    df_depto = df_depto.rename(columns={
-        "codigo_departamento": "cod_depto",
-        "nombre_departamento": "nom_depto"
-    })[["cod_depto", "nom_depto"]].drop_duplicates()
-    df_depto.to_sql("dim_departamentos", conn, if_exists="replace", index=False)
-    logging.info(f"{len(df_depto)} registros insertados en dim_departamentos.")
-
-def load_mpio(conn):
-    url = "https://www.datos.gov.co/resource/gdxc-w37w.json"
-    from DL_ETL.extract import fetch_api_json
-    df_mpio = fetch_api_json(url)
-    if df_mpio.empty:
-        logging.warning("No se obtuvieron datos Municipios.")
+def load_dimension(conn, table, key, df):
+    """Carga una dimensión solo si su contenido cambió desde la última carga.
+
+    Devuelve el número de filas enviadas a la base (0 si no hubo cambios).
+    """
+    digest = frame_hash(df)
+    if get_notes(conn, table) == digest:
+        logging.info(f"{table}: contenido sin cambios (hash {digest[:12]}), se omite la carga.")
+        return 0
+    rows = upsert_dim(conn, table, df, key)
+    update_notes(conn, table, digest)
+    conn.commit()
+    return rows
+
+def _detalle_paginas(paginas):
+    """Resumen de las páginas (filas, bytes, segundos) descargadas por una etapa."""
+    segundos = [s for _, _, s in paginas]
+    tamanos = [b for _, b, _ in paginas]
+    return {
+        "paginas": len(paginas),
+        "pagina_min_s": min(segundos, default=None), "pagina_max_s": max(segundos, default=None),
+        "pagina_bytes_min": min(tamanos, default=None), "pagina_bytes_max": max(tamanos, default=None),
+    }
+
+def extract_deptos(pipeline, stage, offline=False, source=DIM_SOURCE):
+    if source == "local":
+        df_depto = read_divipola_deptos()
+    else:
+        url = "https://www.datos.gov.co/resource/vcjz-niiq.json"
+        paginas = []
+        df_depto = extract_cached(
+            lambda: fetch_api_json(url, on_page=lambda *p: paginas.append(p)), "vcjz-niiq", offline=offline
+        )
+        stage["detalle"] = _detalle_paginas(paginas)
+        if df_depto.empty:
+            logging.warning("No se obtuvieron datos Departamentos.")
+            return df_depto
+        df_depto = df_depto.rename(columns={
+            "codigo_departamento": "cod_depto",
+            "nombre_departamento": "nombre_depto"
+        })[["cod_depto", "nombre_depto"]].drop_duplicates("cod_depto")
+        df_depto["cod_depto"] = df_depto["cod_depto"].str.zfill(2)
+    stage["filas_salida"] = len(df_depto)
+    return df_depto
+
+def extract_mpios(pipeline, stage, offline=False, source=DIM_SOURCE):
+    if source == "local":
+        df_mpio = read_divipola_mpios()
+    else:
+        url = "https://www.datos.gov.co/resource/gdxc-w37w.json"
+        paginas = []
+        df_mpio = extract_cached(
+            lambda: fetch_api_json(url, on_page=lambda *p: paginas.append(p)), "gdxc-w37w", offline=offline
+        )
+        stage["detalle"] = _detalle_paginas(paginas)
+        if df_mpio.empty:
+            logging.warning("No se obtuvieron datos Municipios.")
+            return df_mpio
+        df_mpio = df_mpio.rename(columns={
+            "cod_dpto": "cod_depto",
+            "cod_mpio": "cod_muni",
+            "nombre_municipio": "nombre_muni"
+        })[["cod_muni", "cod_depto", "nombre_muni"]].drop_duplicates("cod_muni")
+        df_mpio["cod_muni"] = df_mpio["cod_muni"].str.zfill(5)
+        df_mpio["cod_depto"] = df_mpio["cod_depto"].str.zfill(2)
+    stage["filas_salida"] = len(df_mpio)
+    return df_mpio
+
+def _load_dim_stage(pipeline, stage, origin, table, key):
+    df = pipeline.output(origin)
+    stage["filas_entrada"] = len(df)
+    if df.empty:
         return
-    df_mpio = df_mpio.rename(columns={
-        "cod_dpto": "cod_depto",
-        "dpto": "nom_depto",
-        "cod_mpio": "cod_muni",
-        "nombre_municipio": "nom_mpio"
-    })[["cod_muni", "cod_depto", "nom_mpio"]].drop_duplicates()
-    df_mpio.to_sql("dim_municipios", conn, if_exists="replace", index=False)
-    logging.info(f"{len(df_mpio)} registros insertados en dim_municipios.")
+    with pipeline.engine.connect() as conn:
+        stage["filas_salida"] = load_dimension(conn, table, key, df)
 
 # =========================
 # PROCESO PRINCIPAL HOMICIDIOS
 # =========================
-def main_hom():
-    logging.info("Iniciando ETL de Homicidios API...")
-    df = fetch_homicidios_data()
-    df = val(df)
-
-    with engine.connect() as conn:
+def _incremental_filter(pipeline, full_refresh):
+    """(last_date, last_updated_at, where) a partir de la marca de agua de etl_control."""
+    # Filtro de fechas: la marca de agua se traduce en un $where de SoQL,
+    # así que solo viajan las filas nuevas o modificadas
+    if full_refresh:
+        logging.info("Modo --full-refresh: se descarga el dataset completo.")
+        return None, None, None
+    with pipeline.engine.connect() as conn:
         last_date = get_last_loaded_date(conn)
-        if last_date:
-            if isinstance(last_date, str):
-                last_date = datetime.strptime(last_date, "%Y-%m-%d").date()
-            df_filtrado = df[df["fecha_hecho"] > last_date]
-            logging.info(f"Filtrando registros nuevos posteriores a {last_date}")
+        last_updated_at = get_last_updated_at(conn)
+    if isinstance(last_date, str):
+        last_date = datetime.strptime(last_date, "%Y-%m-%d").date()
+    return last_date, last_updated_at, build_incremental_where(last_date, last_updated_at)
+
+def extract_homicidios(pipeline, stage, full_refresh=False, offline=False):
+    last_date, last_updated_at, where = _incremental_filter(pipeline, full_refresh)
+
+    # Sin páginas si la extracción sale de la caché
+    paginas = []
+    df = extract_cached(
+        lambda: fetch_homicidios_data(where=where, on_page=lambda *p: paginas.append(p)), HOMICIDIOS_DATASET,
+        query=where, watermark=[last_date, last_updated_at], offline=offline
+    )
+    stage["filas_salida"] = len(df)
+    stage["detalle"] = {
+        "where": where,
+        "last_date": str(last_date) if last_date else None,
+        "updated_at_max": df[":updated_at"].max() if ":updated_at" in df.columns and len(df) else None,
+        **_detalle_paginas(paginas),
+    }
+    if df.empty:
+        logging.info("No hay registros nuevos para cargar.")
+    return df
+
+def _fechas(df):
+    """Columna fecha_hecho como Serie de pandas (la salida de val puede ser una tabla Arrow)."""
+    return df["fecha_hecho"].to_pandas() if isinstance(df, pa.Table) else df["fecha_hecho"]
+
+def val_stage(pipeline, stage, backend=TRANSFORM_BACKEND):
+    df = pipeline.output("extract_homicidios")
+    stage["filas_entrada"] = len(df)
+    if df.empty:
+        return df
+    # Las dimensiones ya se cargaron: los códigos se resuelven contra dim_municipios
+    with pipeline.engine.connect() as conn:
+        df = transform(df, indice_desde_db(conn), backend=backend)
+    stage["filas_salida"] = len(df)
+    stage["detalle"] = {"backend": backend}
+    return df
+
+def upsert_raw_stage(pipeline, stage):
+    df = pipeline.output("val")
+    stage["filas_entrada"] = len(df)
+    if len(df) == 0:
+        return
+    lotes = []
+    with pipeline.engine.connect() as conn:
+        stage["filas_salida"] = upsert_raw(
+            conn, df, chunk_size=LOAD_CHUNK_SIZE, mode=LOAD_MODE,
+            on_chunk=lambda filas, segundos: lotes.append(segundos)
+        )
+    stage["detalle"] = {
+        "modo": LOAD_MODE, "lote": LOAD_CHUNK_SIZE, "lotes": len(lotes),
+        "lote_min_s": min(lotes, default=None), "lote_max_s": max(lotes, default=None),
+    }
+
+def stream_stage(pipeline, stage, full_refresh=False, backend=TRANSFORM_BACKEND,
+                 chunk_rows=STREAM_CHUNK_ROWS, prefetch=STREAM_PREFETCH):
+    """extract_homicidios, val y upsert_raw en una sola pasada por bloques (DL_ETL.stream).
+
+    No deja artefacto: lo que necesitan agregados y marca_agua queda en el detalle.
+    Tras cada bloque confirmado el avance queda en etl_control; si la corrida
+    anterior se cortó con los mismos parámetros, $where y tamaño de bloque, se
+    reanuda desde el bloque siguiente al último cargado en vez de empezar de cero.
+    """
+    last_date, _, where = _incremental_filter(pipeline, full_refresh)
+    firma = {"params": pipeline.params, "where": where, "chunk_rows": chunk_rows}
+    lotes, paginas = [], []
+    with pipeline.engine.connect() as conn:
+        avance = get_stage_progress(conn, stage["etapa"])
+        if avance and avance["firma"] == firma:
+            resumen = StreamSummary.from_detail(avance["resumen"])
+            logging.info(
+                f"Reanudando streaming desde offset {resumen.next_offset} "
+                f"({resumen.filas} filas ya cargadas)"
+            )
         else:
-            df_filtrado = df
+            resumen = StreamSummary(chunk_rows)
 
-        if df_filtrado.empty:
-            logging.info("No hay registros nuevos para cargar.")
-            return
+        def guardar_avance(parcial):
+            save_stage_progress(conn, stage["etapa"], {"firma": firma, "resumen": parcial.as_detail()})
+            conn.commit()
 
-        upsert_raw(conn, df_filtrado)
-        new_max_date = df_filtrado["fecha_hecho"].max()
+        indice = indice_desde_db(conn)
+        chunks = iter_transformed(
+            iter_homicidios_chunks(
+                where, chunk_rows=chunk_rows, prefetch=prefetch, start_offset=resumen.next_offset,
+                on_page=lambda *p: paginas.append(p)
+            ),
+            indice, backend=backend
+        )
+        resumen = load_stream(
+            conn, chunks, chunk_size=LOAD_CHUNK_SIZE, mode=LOAD_MODE,
+            on_chunk=lambda filas, segundos: lotes.append(segundos),
+            resumen=resumen, on_commit=guardar_avance
+        )
+        # La etapa terminó: a partir de aquí manda su punto de control
+        clear_stage_progress(conn, stage["etapa"])
+        conn.commit()
+    stage["filas_entrada"] = stage["filas_salida"] = resumen.filas
+    stage["detalle"] = {
+        "where": where, "last_date": str(last_date) if last_date else None,
+        "backend": backend, "modo": LOAD_MODE, "bloque": chunk_rows, "prefetch": prefetch,
+        "bloque_min_s": min(lotes, default=None), "bloque_max_s": max(lotes, default=None),
+        **_detalle_paginas(paginas), **resumen.as_detail(),
+    }
+    if not resumen.filas:
+        logging.info("No hay registros nuevos para cargar.")
+
+def aggregates_stage(pipeline, stage):
+    df = pipeline.output("val")
+    stage["filas_entrada"] = len(df)
+    if len(df) == 0:
+        return
+    with pipeline.engine.connect() as conn:
+        refresh_aggregates(conn, _fechas(df))
+
+def stream_aggregates_stage(pipeline, stage):
+    # En streaming no hay salida de val: basta con los meses tocados
+    meses = pipeline.detail("stream_homicidios").get("meses") or []
+    stage["filas_entrada"] = len(meses)
+    if not meses:
+        return
+    with pipeline.engine.connect() as conn:
+        refresh_aggregates(conn, meses)
+
+def watermark_stage(pipeline, stage, source="val"):
+    """Avanza la marca de agua de etl_control solo cuando los datos ya quedaron cargados."""
+    if source == "stream_homicidios":
+        extraccion = pipeline.detail("stream_homicidios")
+        if not extraccion.get("filas"):
+            return
+        new_max_date = extraccion.get("fecha_max")
+    else:
+        df = pipeline.output("val")
+        if len(df) == 0:
+            return
+        extraccion = pipeline.detail("extract_homicidios")
+        new_max_date = _fechas(df).max()
+    last_date = extraccion.get("last_date")
+    if last_date and str(last_date) > str(new_max_date):
+        new_max_date = last_date
+    with pipeline.engine.connect() as conn:
         update_last_loaded_date(conn, new_max_date)
-        logging.info(f"Carga completada. Última fecha cargada: {new_max_date}")
+        if extraccion.get("updated_at_max"):
+            update_last_updated_at(conn, extraccion["updated_at_max"])
+        conn.commit()
+    stage["detalle"] = {"last_loaded_date": str(new_max_date)}
+    logging.info(f"Carga completada. Última fecha cargada: {new_max_date}")
+
+def snapshot_stage(pipeline, stage):
+    with pipeline.engine.connect() as conn:
+        refresh_snapshot(conn, SNAPSHOT_PATH or DEFAULT_SNAPSHOT_PATH)
+
+def build_stages(full_refresh=False, offline=False, backend=TRANSFORM_BACKEND, stream=False):
+    """DAG del flujo: las tres descargas no dependen entre sí y corren a la vez.
+
+    Con `stream=True` la descarga, validación y carga de homicidios son una sola
+    etapa por bloques (stream_homicidios), que espera a dim_municipios para
+    resolver los códigos DANE de cada bloque.
+    """
+    dims = [
+        Stage("extract_deptos", partial(extract_deptos, offline=offline), []),
+        Stage("extract_mpios", partial(extract_mpios, offline=offline), []),
+        Stage("dim_departamentos", partial(
+            _load_dim_stage, origin="extract_deptos", table="dim_departamentos", key="cod_depto"
+        ), ["extract_deptos"]),
+        # dim_municipios referencia a dim_departamentos (llave foránea)
+        Stage("dim_municipios", partial(
+            _load_dim_stage, origin="extract_mpios", table="dim_municipios", key="cod_muni"
+        ), ["extract_mpios", "dim_departamentos"]),
+    ]
+    if stream:
+        if offline:
+            raise ValueError("El modo streaming lee directo de la API: no se puede combinar con --offline")
+        return dims + [
+            Stage("stream_homicidios", partial(stream_stage, full_refresh=full_refresh, backend=backend),
+                  ["dim_municipios"]),
+            Stage("agregados", stream_aggregates_stage, ["stream_homicidios"]),
+            Stage("marca_agua", partial(watermark_stage, source="stream_homicidios"), ["agregados"]),
+            Stage("snapshot", snapshot_stage, ["marca_agua"]),
+        ]
+    return dims + [
+        Stage("extract_homicidios", partial(extract_homicidios, full_refresh=full_refresh, offline=offline), []),
+        Stage("val", partial(val_stage, backend=backend), ["extract_homicidios", "dim_municipios"]),
+        Stage("upsert_raw", upsert_raw_stage, ["val"]),
+        Stage("agregados", aggregates_stage, ["upsert_raw"]),
+        Stage("marca_agua", watermark_stage, ["agregados"]),
+        Stage("snapshot", snapshot_stage, ["marca_agua"]),
+    ]
+
+STAGE_NAMES = list(dict.fromkeys(
+    s.name for stream in (False, True) for s in build_stages(stream=stream)
+))
 
 # =========================
 # FUNCIÓN ORQUESTADORA FINAL
 # =========================
-def run_all_etl():
-    logging.info("=== Iniciando flujo completo ETL (Data Lake) ===")
-    if not engine:
-        logging.error("Motor de conexión no inicializado. Abortando.")
-        return
+def run_all_etl(full_refresh=False, offline=False, profile=False, stages=None,
+                workers=WORKERS, reset_checkpoints=False, backend=TRANSFORM_BACKEND, stream=STREAM):
+    """Ejecuta el flujo (o las etapas `stages`) y guarda las métricas por etapa en etl_runs.
 
+    Las etapas que ya terminaron en una corrida anterior interrumpida se
+    omiten (ver DL_ETL.dag). Devuelve True si todas las etapas terminaron sin errores.
+    """
+    logging.info("=== Iniciando flujo completo ETL (Data Lake) ===")
+    engine = get_engine()
     try:
         with engine.connect() as conn:
-            load_depto(conn)
-            load_mpio(conn)
-        main_hom()
+            logging.info("Conexión establecida con éxito a la base de datos.")
+            pendientes = pending_migrations(conn)
+            conn.commit()
+        bloqueantes = [m.nombre for m in pendientes if m.version in REQUIRED_BEFORE_LOAD]
+        if bloqueantes:
+            logging.error(
+                f"Migraciones pendientes que cambian la llave de raw_homicidios: {bloqueantes}. "
+                "Aplíquelas antes de cargar con: python -m DL_ETL.migrations. Abortando."
+            )
+            return False
+        if pendientes:
+            logging.warning(
+                f"Migraciones de esquema pendientes: {[m.nombre for m in pendientes]}. "
+                "Aplíquelas con: python -m DL_ETL.migrations"
+            )
+    except Exception as e:
+        logging.error(f"Error al conectar con la base de datos: {e}. Abortando.")
+        return False
+
+    metrics = RunMetrics(profile=profile)
+    ok = False
+    try:
+        pipeline = Pipeline(
+            build_stages(full_refresh, offline, backend, stream), engine, CHECKPOINT_DIR,
+            params={"full_refresh": full_refresh, "stream": stream, "offline": offline, "backend": backend},
+            metrics=metrics
+        )
+        if reset_checkpoints:
+            pipeline.reset()
+        ok = pipeline.run(stages, workers=workers)
     except Exception as e:
-        logging.error(f"Error durante la ejecución del ETL: {e}")
+        logging.exception(f"Error durante la ejecución del ETL: {e}")
+    finally:
+        try:
+            with engine.connect() as conn:
+                metrics.persist(conn)
+        except Exception as e:
+            logging.warning(f"No se pudieron guardar las métricas en etl_runs: {e}")
+        if profile:
+            metrics.dump_profile(PROFILE_DIR)
 
-    logging.info("=== Flujo ETL completado exitosamente ===")
+    if ok:
+        logging.info(f"=== Flujo ETL completado exitosamente (corrida {metrics.run_id}) ===")
+    else:
+        logging.error(
+            f"=== Flujo ETL terminado con errores (corrida {metrics.run_id}); "
+            "al relanzarlo se retoma desde las etapas pendientes ==="
+        )
+    return ok
 
 if __name__ == "__main__":
-    run_all_etl()
+    parser = argparse.ArgumentParser(description="Flujo ETL de homicidios (Data Lake)")
+    parser.add_argument(
+        "--full-refresh", action="store_true",
+        help="Ignora la marca de agua de etl_control y descarga el dataset completo."
+    )
+    parser.add_argument(
+        "--offline", action="store_true",
+        help="No consulta datos.gov.co: reutiliza las extracciones guardadas en la caché local."
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Perfila cada etapa con cProfile y guarda el perfil de la más lenta (ETL_PROFILE_DIR)."
+    )
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGE_NAMES, metavar="ETAPA",
+        help=f"Corre solo estas etapas; sus dependencias deben estar incluidas o ya terminadas. Opciones: {', '.join(STAGE_NAMES)}"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=WORKERS,
+        help="Etapas que pueden correr a la vez (ETL_WORKERS)."
+    )
+    parser.add_argument(
+        "--transform-backend", choices=TRANSFORM_BACKENDS, default=TRANSFORM_BACKEND,
+        help="Motor de la etapa val (ETL_TRANSFORM_BACKEND)."
+    )
+    parser.add_argument(
+        "--stream", action="store_true", default=STREAM,
+        help="Descarga, valida y carga homicidios por bloques de ETL_STREAM_CHUNK_ROWS filas (ETL_STREAM)."
+    )
+    parser.add_argument(
+        "--reset-checkpoints", action="store_true",
+        help="Descarta los puntos de control de una corrida anterior y empieza de cero."
+    )
+    args = parser.parse_args()
+    ok = run_all_etl(
+        full_refresh=args.full_refresh, offline=args.offline, profile=args.profile,
+        stages=args.stages, workers=args.workers, reset_checkpoints=args.reset_checkpoints,
+        backend=args.transform_backend, stream=args.stream
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,112 @@
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from DL_ETL.control import get_data_version
+
+DEFAULT_SNAPSHOT_PATH = Path(__file__).resolve().parent.parent / "ProyectoStreamlit" / "homicidios.parquet"
+
+# Columnas con los nombres que usa el dashboard. Las de baja cardinalidad van
+# codificadas como diccionario para que pandas las lea como categóricas.
+SNAPSHOT_SCHEMA = pa.schema([
+    ("FECHA HECHO", pa.timestamp("ms")),
+    ("ANIO", pa.int16()),
+    ("COD_DEPTO", pa.dictionary(pa.int32(), pa.string())),
+    ("DEPARTAMENTO", pa.dictionary(pa.int32(), pa.string())),
+    ("COD_MUNI", pa.dictionary(pa.int32(), pa.string())),
+    ("MUNICIPIO", pa.dictionary(pa.int32(), pa.string())),
+    ("SEXO", pa.dictionary(pa.int32(), pa.string())),
+    ("ZONA", pa.dictionary(pa.int32(), pa.string())),
+    ("CANTIDAD", pa.int32()),
+])
+
+SNAPSHOT_SQL = """
+SELECT
+    fecha_hecho AS `FECHA HECHO`,
+    YEAR(fecha_hecho) AS ANIO,
+    cod_depto AS COD_DEPTO,
+    UPPER(departamento) AS DEPARTAMENTO,
+    cod_muni AS COD_MUNI,
+    municipio AS MUNICIPIO,
+    sexo AS SEXO,
+    zona AS ZONA,
+    cantidad AS CANTIDAD
+FROM raw_homicidios
+WHERE fecha_hecho IS NOT NULL AND departamento IS NOT NULL
+ORDER BY fecha_hecho
+"""
+
+
+def snapshot_version(path=DEFAULT_SNAPSHOT_PATH):
+    """Versión de datos con la que se generó el snapshot (o None si no existe)."""
+    meta_path = Path(path).with_suffix(".json")
+    if not meta_path.exists():
+        return None
+    return json.loads(meta_path.read_text(encoding="utf-8"))["version"]
+
+
+def _to_arrow(chunk):
+    chunk["FECHA HECHO"] = pd.to_datetime(chunk["FECHA HECHO"])
+    return pa.Table.from_pandas(chunk, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+
+
+def build_snapshot(conn, path=DEFAULT_SNAPSHOT_PATH, chunksize=100_000):
+    """Escribe el dataset limpio de raw_homicidios como Parquet para el dashboard.
+
+    Se lee por bloques para no materializar el dataset completo como objetos
+    Python; cada bloque se convierte a Arrow con tipos compactos (int16/int32,
+    diccionarios) y se agrega al archivo como un row group.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+
+    version = get_data_version(conn)
+
+    t0 = time.perf_counter()
+    rows = 0
+    with pq.ParquetWriter(tmp_path, SNAPSHOT_SCHEMA, compression="zstd") as writer:
+        for chunk in pd.read_sql(text(SNAPSHOT_SQL), conn, chunksize=chunksize):
+            writer.write_table(_to_arrow(chunk))
+            rows += len(chunk)
+    os.replace(tmp_path, path)
+    path.with_suffix(".json").write_text(
+        json.dumps({"version": version, "rows": rows, "created_at": time.time()}),
+        encoding="utf-8"
+    )
+    logging.info(
+        f"Snapshot escrito en {path}: {rows} filas, "
+        f"{path.stat().st_size / 1024 ** 2:.1f} MB en {time.perf_counter() - t0:.1f}s"
+    )
+    return path
+
+
+def refresh_snapshot(conn, path=DEFAULT_SNAPSHOT_PATH):
+    """Regenera el snapshot solo si la versión de datos cambió desde el último."""
+    if Path(path).exists() and snapshot_version(path) == get_data_version(conn):
+        logging.info("Snapshot del dashboard al día; no se regenera.")
+        return Path(path)
+    return build_snapshot(conn, path)
+
+
+def read_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """Lee el snapshot con memory-map; las columnas de diccionario llegan como categóricas."""
+    return pd.read_parquet(path, memory_map=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el snapshot Parquet para el dashboard")
+    parser.add_argument("--path", default=str(DEFAULT_SNAPSHOT_PATH))
+    args = parser.parse_args()
+
+    from DL_ETL.config import get_engine
+    with get_engine().connect() as conn:
+        build_snapshot(conn, args.path)
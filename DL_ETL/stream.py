@@ -0,0 +1,132 @@
+"""Modo streaming del ETL de homicidios: extracción, validación y carga por bloques.
+
+En lugar de descargar el dataset completo, validarlo entero y recién después
+cargarlo, cada página de la API pasa por `transform` y entra a raw_homicidios
+antes de pedir la siguiente. Las etapas son generadores encadenados, así que
+el consumo manda: mientras un bloque se carga en MySQL, iter_api_pages tiene a
+lo sumo `prefetch` páginas descargadas o en vuelo, y la memoria pico queda
+acotada por el tamaño de bloque (≈ (prefetch + 2) × chunk_rows filas) y no
+por el tamaño del dataset.
+
+Lo que las etapas siguientes necesitan del conjunto (fecha máxima, máximo
+:updated_at y meses tocados para los agregados) se acumula en un resumen
+pequeño mientras pasan los bloques. Ese resumen, con el offset del último
+bloque confirmado, es también lo que permite reanudar: `load_stream` lo
+entrega a `on_commit` después de cada bloque y, al relanzar, el resumen
+restaurado con `StreamSummary.from_detail` indica desde qué offset seguir
+(`next_offset`).
+"""
+import logging
+import time
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+
+from DL_ETL.extract import HOMICIDIOS_DATASET, iter_api_pages, socrata_resource_url
+from DL_ETL.load import upsert_raw
+from DL_ETL.transform import transform
+
+
+def iter_homicidios_chunks(where=None, chunk_rows=50000, prefetch=2, start_offset=0, url=None, on_page=None):
+    """Genera (offset, DataFrame crudo) con a lo sumo `chunk_rows` filas cada uno."""
+    url = url or socrata_resource_url(HOMICIDIOS_DATASET)
+    for offset, page in iter_api_pages(
+        url, limit=chunk_rows, where=where, start_offset=start_offset,
+        max_workers=prefetch, select=":*, *", on_page=on_page
+    ):
+        if page:
+            yield offset, pd.DataFrame.from_records(page)
+
+
+def iter_transformed(chunks, indice=None, backend="pandas"):
+    """Aplica `transform` a cada bloque; el siguiente no se pide hasta que se consume este."""
+    for offset, df in chunks:
+        yield offset, transform(df, indice, backend=backend)
+
+
+def _column(df, name):
+    if isinstance(df, pa.Table):
+        return df[name].to_pandas() if name in df.column_names else None
+    return df[name] if name in df.columns else None
+
+
+class StreamSummary:
+    """Lo que queda de los bloques ya cargados: conteos, máximos y meses tocados."""
+
+    def __init__(self, chunk_rows=None):
+        self.chunk_rows = chunk_rows
+        self.bloques = 0
+        self.filas = 0
+        self.fecha_max = None
+        self.updated_at_max = None
+        self.meses = set()
+        self.ultimo_offset = None
+
+    def add(self, offset, df):
+        self.bloques += 1
+        self.filas += len(df)
+        self.ultimo_offset = offset
+        fechas = pd.to_datetime(_column(df, "fecha_hecho")).dropna()
+        if len(fechas):
+            self.meses.update(fechas.dt.to_period("M").dt.start_time.dt.date)
+            fecha_max = fechas.max().date()
+            self.fecha_max = max(filter(None, [self.fecha_max, fecha_max]))
+        updated_at = _column(df, ":updated_at")
+        if updated_at is not None and updated_at.notna().any():
+            self.updated_at_max = max(filter(None, [self.updated_at_max, updated_at.max()]))
+
+    @property
+    def next_offset(self):
+        """Offset desde el que hay que seguir pidiendo páginas (0 si no se cargó nada)."""
+        return 0 if self.ultimo_offset is None else self.ultimo_offset + self.chunk_rows
+
+    def as_detail(self):
+        """Versión serializable (JSON) para el punto de control de la etapa."""
+        return {
+            "chunk_rows": self.chunk_rows,
+            "bloques": self.bloques,
+            "filas": self.filas,
+            "fecha_max": str(self.fecha_max) if self.fecha_max else None,
+            "updated_at_max": self.updated_at_max,
+            "meses": sorted(str(m) for m in self.meses),
+            "ultimo_offset": self.ultimo_offset,
+        }
+
+    @classmethod
+    def from_detail(cls, detalle):
+        """Inversa de `as_detail`: restaura el resumen de una corrida interrumpida."""
+        resumen = cls(detalle["chunk_rows"])
+        resumen.bloques = detalle["bloques"]
+        resumen.filas = detalle["filas"]
+        resumen.fecha_max = date.fromisoformat(detalle["fecha_max"]) if detalle["fecha_max"] else None
+        resumen.updated_at_max = detalle["updated_at_max"]
+        resumen.meses = {date.fromisoformat(m) for m in detalle["meses"]}
+        resumen.ultimo_offset = detalle["ultimo_offset"]
+        return resumen
+
+
+def load_stream(conn, chunks, chunk_size=5000, mode="executemany", on_chunk=None,
+                resumen=None, on_commit=None):
+    """Carga en raw_homicidios cada bloque validado a medida que llega.
+
+    Cada bloque se confirma antes de pedir el siguiente (upsert_raw hace commit
+    por lote), de modo que un corte deja cargado todo lo anterior. Tras cada
+    bloque se llama `on_commit(resumen)` para guardar el avance; para reanudar
+    se pasa ese resumen restaurado como `resumen` y `chunks` arrancando en
+    `resumen.next_offset`. Repetir un bloque es inofensivo (ON DUPLICATE KEY
+    UPDATE). Devuelve el StreamSummary de lo cargado, incluido lo restaurado.
+    """
+    resumen = resumen or StreamSummary()
+    for offset, df in chunks:
+        if len(df) == 0:
+            continue
+        t0 = time.perf_counter()
+        upsert_raw(conn, df, chunk_size=chunk_size, mode=mode)
+        resumen.add(offset, df)
+        if on_chunk:
+            on_chunk(len(df), time.perf_counter() - t0)
+        if on_commit:
+            on_commit(resumen)
+        logging.info(f"Bloque offset={offset} cargado; acumulado {resumen.filas} filas")
+    return resumen
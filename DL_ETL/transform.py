@@ -1,63 +1,124 @@
 import pandas as pd
+import numpy as np
 import logging
 import unicodedata
+from functools import lru_cache
 
-def val(df_hom):
-    """Valida y normaliza los datos de homicidios."""
-    logging.info("Validando y preparando los datos...")
+from DL_ETL.divipola import completar_codigos
+
+TEXT_COLS = ["zona", "sexo", "departamento", "municipio"]
+
+# Columnas de texto que forman parte de uq_raw_uniq: un NULL nunca coincide con
+# otro en una llave única de MySQL, así que los faltantes se cargan con un valor fijo
+KEY_TEXT_COLS = ["zona", "sexo"]
+SIN_DATO = "Sin Dato"
+
+@lru_cache(maxsize=None)
+def fold_text(value):
+    """Quita tildes, espacios sobrantes y deja el texto en formato título."""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', value)
+        if not unicodedata.combining(c)
+    ).strip().lower().title()
+
+def normalize_text_column(serie):
+    """Normaliza una columna de texto y la devuelve como categórica.
 
-    expected_col = [
-        "fecha_hecho", "cod_depto", "departamento",
-        "cod_muni", "municipio", "zona", "sexo", "cantidad"
-    ]
-
-    rename_map = {
-        "fecha": "fecha_hecho",
-        "fechahecho": "fecha_hecho",
-        "depart": "departamento",
-        "depto": "cod_depto",
-        "coddepartamento": "cod_depto",
-        "codigo_departamento": "cod_depto",
-        "codigo_municipio": "cod_muni",
-        "codigomunicipio": "cod_muni",
-        "municipio": "municipio",
-        "zona": "zona",
-        "sexo": "sexo",
-        "cantidad": "cantidad",
-        "total": "cantidad"
-    }
-
-    clean_cols = {col.lower().replace(" ", "").replace("_", ""): col for col in df_hom.columns}
+    La normalización se aplica una sola vez por valor distinto (factorize) y el
+    resultado se reexpande con los códigos, en vez de una llamada por fila. Los
+    valores faltantes se mantienen como nulos.
+    """
+    codes, uniques = pd.factorize(serie)
+    folded = [fold_text(str(u)) for u in uniques]
+    # Valores distintos en origen pueden coincidir tras normalizar ("Bogotá" / "BOGOTA")
+    categories, inverse = np.unique(np.array(folded, dtype=object), return_inverse=True)
+    # Los faltantes (código -1) apuntan al último elemento y se conservan como nulos
+    codes = np.append(inverse, -1)[codes]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=serie.index, name=serie.name
+    )
+
+EXPECTED_COLS = [
+    "fecha_hecho", "cod_depto", "departamento",
+    "cod_muni", "municipio", "zona", "sexo", "cantidad"
+]
+
+RENAME_MAP = {
+    "fecha": "fecha_hecho",
+    "fechahecho": "fecha_hecho",
+    "depart": "departamento",
+    "depto": "cod_depto",
+    "coddepartamento": "cod_depto",
+    "codigo_departamento": "cod_depto",
+    "codigo_municipio": "cod_muni",
+    "codigomunicipio": "cod_muni",
+    "municipio": "municipio",
+    "zona": "zona",
+    "sexo": "sexo",
+    "cantidad": "cantidad",
+    "total": "cantidad"
+}
+
+def column_renames(columns):
+    """Renombres a aplicar sobre `columns`; falla si luego faltan columnas obligatorias."""
+    clean_cols = {col.lower().replace(" ", "").replace("_", ""): col for col in columns}
     cols_to_rename = {}
     for simple_col, original_col in clean_cols.items():
-        if simple_col in rename_map and rename_map[simple_col] not in df_hom.columns:
-            cols_to_rename[original_col] = rename_map[simple_col]
+        if simple_col in RENAME_MAP and RENAME_MAP[simple_col] not in columns:
+            cols_to_rename[original_col] = RENAME_MAP[simple_col]
+
+    final_cols = [cols_to_rename.get(c, c) for c in columns]
+    missing_cols = [c for c in EXPECTED_COLS if c not in final_cols]
+    if missing_cols:
+        raise ValueError(f"Faltan columnas obligatorias: {missing_cols}")
+    return cols_to_rename
 
+def rename_columns(df_hom):
+    """Homologa los nombres de columnas y valida que estén las obligatorias."""
+    cols_to_rename = column_renames(list(df_hom.columns))
     if cols_to_rename:
         logging.info(f"Renombrando columnas detectadas: {cols_to_rename}")
         df_hom = df_hom.rename(columns=cols_to_rename)
+    return df_hom
 
-    missing_cols = [c for c in expected_col if c not in df_hom.columns]
-    if missing_cols:
-        raise ValueError(f"Faltan columnas obligatorias: {missing_cols}")
+def val(df_hom, indice=None):
+    """Valida y normaliza los datos de homicidios.
+
+    `indice` es el índice DIVIPOLA con el que se normalizan y completan los
+    códigos (por defecto, el de los CSV del repositorio).
+    """
+    logging.info("Validando y preparando los datos...")
+    df_hom = rename_columns(df_hom)
 
     # Conversión de tipos
     df_hom["fecha_hecho"] = pd.to_datetime(df_hom["fecha_hecho"], errors="coerce").dt.date
     df_hom["cantidad"] = pd.to_numeric(df_hom["cantidad"], errors="coerce").fillna(0).astype(int)
 
-    # Normalización de texto
-    for col in ["zona", "sexo", "departamento", "municipio"]:
+    # Normalización de texto (una vez por valor distinto)
+    for col in TEXT_COLS:
         if col in df_hom.columns:
-            df_hom[col] = (
-                df_hom[col]
-                .astype(str)
-                .apply(lambda x: ''.join(
-                    c for c in unicodedata.normalize('NFKD', x)
-                    if not unicodedata.combining(c)
-                ))
-                .str.strip()
-                .str.lower()
-                .str.title()
-            )
+            serie = df_hom[col].fillna(SIN_DATO) if col in KEY_TEXT_COLS else df_hom[col]
+            df_hom[col] = normalize_text_column(serie)
+
+    # Códigos DANE normalizados (5 y 2 dígitos) y resueltos por nombre si faltan
+    df_hom = completar_codigos(df_hom, indice)
 
     return df_hom
+
+TRANSFORM_BACKENDS = ("pandas", "polars")
+
+def transform(df_hom, indice=None, backend="pandas"):
+    """Ejecuta `val` con el backend elegido (ETL_TRANSFORM_BACKEND).
+
+    - pandas: devuelve un DataFrame (DL_ETL.transform.val).
+    - polars: devuelve una tabla Arrow (DL_ETL.transform_polars.val_polars),
+      que upsert_raw carga sin pasar por pandas.
+    """
+    if backend not in TRANSFORM_BACKENDS:
+        raise ValueError(f"Backend de transformación no soportado: {backend}. Opciones: {TRANSFORM_BACKENDS}")
+    if backend == "polars":
+        # Import diferido: polars solo se necesita con este backend
+        from DL_ETL.transform_polars import val_polars
+        return val_polars(df_hom, indice)
+    return val(df_hom, indice)
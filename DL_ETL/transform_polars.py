@@ -0,0 +1,113 @@
+"""Backend polars de DL_ETL.transform: la misma validación de `val` como plan lazy.
+
+El renombrado, la conversión de fecha y cantidad y el plegado de texto se
+expresan como un solo plan de polars que se ejecuta al final, sin las copias
+intermedias que hace pandas columna por columna. Las partes que dependen de
+reglas en Python (plegado de tildes con `fold_text` y resolución DIVIPOLA con
+`completar_codigos`) se calculan una vez por valor o combinación distinta y
+entran al plan como reemplazos y un join. El resultado es una tabla Arrow que
+DL_ETL.load.upsert_raw consume directamente; `tabla.to_pandas()` coincide con
+la salida de `val` (ver DL_ETL/benchmarks/parity_transform.py).
+"""
+import logging
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+from DL_ETL.divipola import completar_codigos
+from DL_ETL.transform import KEY_TEXT_COLS, SIN_DATO, TEXT_COLS, column_renames, fold_text
+
+CODE_COLS = ["cod_depto", "departamento", "cod_muni", "municipio"]
+
+
+def _polars_format(first_value):
+    """Formato de fecha que pandas infiere del primer valor, en sintaxis de polars (chrono)."""
+    if first_value is None:
+        return None
+    formato = pd.tseries.api.guess_datetime_format(first_value)
+    # %f de Python exige el punto aparte; en chrono "%.f" incluye el punto y acepta 3, 6 o 9 decimales
+    return formato.replace(".%f", "%.f") if formato else None
+
+
+def _fecha_expr(first_value):
+    # pandas infiere el formato del primer valor y deja como nulo lo que no lo cumple
+    col = pl.col("fecha_hecho").cast(pl.String)
+    formato = _polars_format(first_value)
+    if formato:
+        fecha = col.str.strptime(pl.Datetime("us"), formato, strict=False)
+    else:
+        fecha = col.str.to_datetime(strict=False)
+    return fecha.dt.date().alias("fecha_hecho")
+
+
+def _cantidad_expr():
+    return (
+        pl.col("cantidad").cast(pl.String).str.strip_chars()
+        .cast(pl.Float64, strict=False).fill_null(0).cast(pl.Int64)
+        .alias("cantidad")
+    )
+
+
+def _texto_expr(col, unicos):
+    """Plegado de texto como un reemplazo por valor distinto, con categorías ordenadas como en pandas."""
+    plegados = [fold_text(u) for u in unicos]
+    categorias = pl.Enum(sorted(set(plegados)))
+    return pl.col(col).cast(pl.String).replace_strict(unicos, plegados, return_dtype=categorias).alias(col)
+
+
+def val_polars(df_hom, indice=None):
+    """Equivalente de DL_ETL.transform.val que devuelve una tabla Arrow.
+
+    Acepta un DataFrame de pandas, uno de polars o una tabla Arrow.
+    """
+    logging.info("Validando y preparando los datos (backend polars)...")
+    if isinstance(df_hom, pd.DataFrame):
+        lf = pl.from_pandas(df_hom).lazy()
+    elif isinstance(df_hom, pa.Table):
+        lf = pl.from_arrow(df_hom).lazy()
+    else:
+        lf = df_hom.lazy()
+
+    cols_to_rename = column_renames(lf.collect_schema().names())
+    if cols_to_rename:
+        logging.info(f"Renombrando columnas detectadas: {cols_to_rename}")
+        lf = lf.rename(cols_to_rename)
+    text_cols = [c for c in TEXT_COLS if c in lf.collect_schema().names()]
+    # Faltantes de las columnas de uq_raw_uniq con valor fijo, como en `val`
+    lf = lf.with_columns(*[
+        pl.col(c).cast(pl.String).fill_null(SIN_DATO) for c in KEY_TEXT_COLS if c in text_cols
+    ])
+
+    # Valores pequeños que el plan necesita conocer antes: primer fecha y valores distintos de texto
+    previos = lf.select(
+        pl.col("fecha_hecho").cast(pl.String).drop_nulls().first().alias("primera_fecha"),
+        *[pl.col(c).cast(pl.String).drop_nulls().unique().implode().alias(c) for c in text_cols],
+    ).collect().row(0, named=True)
+
+    lf = lf.with_columns(
+        _fecha_expr(previos["primera_fecha"]),
+        _cantidad_expr(),
+        *[_texto_expr(c, previos[c]) for c in text_cols],
+    )
+
+    # Códigos DANE: completar_codigos se aplica a cada combinación distinta y se une de vuelta
+    claves = lf.select(CODE_COLS).unique(maintain_order=True).collect()
+    resueltos = completar_codigos(claves.to_pandas(), indice)
+    claves = claves.with_columns(*[
+        pl.Series(f"_{c}", resueltos[c].astype(object).where(resueltos[c].notna(), None).tolist(), dtype=pl.String)
+        for c in ("cod_depto", "cod_muni")
+    ])
+    columnas = lf.collect_schema().names()
+    lf = (
+        lf.with_columns(pl.col("cod_depto", "cod_muni").cast(pl.String))
+        .join(
+            claves.lazy().with_columns(pl.col("cod_depto", "cod_muni").cast(pl.String)),
+            on=CODE_COLS, how="left", nulls_equal=True, maintain_order="left",
+        )
+        .with_columns(pl.col("_cod_depto").alias("cod_depto"), pl.col("_cod_muni").alias("cod_muni"))
+        .select(columnas)
+    )
+
+    # Tipos de Arrow clásicos (string/large_string) para Parquet y el conector
+    return lf.collect().to_arrow(compat_level=pl.CompatLevel.oldest())
@@ -0,0 +1,213 @@
+"""Backtesting con origen móvil (rolling origin) de los modelos de pronóstico.
+
+Uso (desde ProyectoStreamlit/):
+
+    python backtest.py --workers 4             # motores vectorizados
+    python backtest.py --workers 4 --prophet   # incluye Prophet (mucho más lento)
+
+Para cada municipio elegible se corta la serie mensual en varios orígenes,
+se pronostican los meses siguientes y se comparan con lo observado. Los lotes
+de municipios se reparten en un pool de procesos y cada lote terminado se
+guarda en disco, así que una corrida interrumpida continúa donde quedó (solo
+con los mismos modelos y parámetros de corte: cada configuración guarda sus
+lotes en una carpeta propia). Al
+final se escriben las tablas de MAE/MAPE/cobertura que lee la página del modelo.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import motores # Motores de pronóstico vectorizados
+from panel import MIN_MESES, PanelMensual # Panel municipio × mes
+
+BASE_DIR = Path(__file__).resolve().parent
+BACKTESTS_DIR = BASE_DIR / "backtests"
+
+ORIGENES = 4 # Número de cortes por serie
+PASO = 6 # Meses entre cortes consecutivos
+HORIZONTE = 12 # Meses pronosticados desde cada corte
+TAMANO_LOTE = 100 # Municipios por tarea del pool
+
+# Columnas de la salida de evaluar_lote (también para armar tablas vacías)
+COLUMNAS_ERRORES = ['modelo', 'COD_MUNI', 'corte', 'h', 'real', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def directorio_version(version):
+    """Carpeta de resultados para una versión de datos (marca de agua del ETL)."""
+    return BACKTESTS_DIR / hashlib.sha1(str(version).encode("utf-8")).hexdigest()[:12]
+
+
+def configuracion(con_prophet=False):
+    """Modelos y parámetros de corte que determinan el contenido de cada lote."""
+    return {
+        "modelos": list(motores.MOTORES) + (['Prophet'] if con_prophet else []),
+        "origenes": ORIGENES, "paso": PASO, "horizonte": HORIZONTE, "tamano_lote": TAMANO_LOTE,
+    }
+
+
+def directorio_lotes(directorio, config):
+    """Carpeta de puntos de control de una configuración, con su manifiesto."""
+    clave = hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    lotes_dir = directorio / "lotes" / clave
+    lotes_dir.mkdir(parents=True, exist_ok=True)
+    manifiesto = lotes_dir / "manifiesto.json"
+    if not manifiesto.exists():
+        manifiesto.write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return lotes_dir
+
+
+def cortes(n_meses, origenes=ORIGENES, paso=PASO, horizonte=HORIZONTE):
+    """Meses de entrenamiento de cada origen; el último deja `horizonte` meses para evaluar."""
+    return [n_meses - horizonte - i * paso for i in reversed(range(origenes))]
+
+
+def _prophet(serie, fechas, corte, horizonte):
+    """Pronóstico de Prophet para una serie cortada (media e intervalo del 80%)."""
+    import modelos
+    model = modelos.entrenar_modelo(pd.DataFrame({'ds': fechas[:corte], 'y': serie[:corte]}))
+    forecast = model.predict(pd.DataFrame({'ds': fechas[corte:corte + horizonte]}))
+    return forecast['yhat'].to_numpy(), forecast['yhat_lower'].to_numpy(), forecast['yhat_upper'].to_numpy()
+
+
+def evaluar_lote(Y, inicio, codigos, fechas, cortes_lote, horizonte, con_prophet=False):
+    """Errores de todos los modelos para un lote de municipios (tarea del pool).
+
+    Devuelve una fila por modelo, municipio, corte y mes pronosticado. En cada
+    corte solo se evalúan las series que ya tenían el mínimo de meses.
+    """
+    Y = Y.astype(np.float64)
+    h = np.arange(1, horizonte + 1)
+    partes = []
+    for corte in cortes_lote:
+        filas = np.flatnonzero(corte - inicio >= MIN_MESES)
+        if not len(filas):
+            continue
+        real = Y[filas, corte:corte + horizonte]
+
+        resultados = {}
+        for nombre, motor in motores.MOTORES.items():
+            media, desvio = motor(Y[filas, :corte], inicio[filas], horizonte)
+            resultados[nombre] = (media, media - motores.Z_80 * desvio, media + motores.Z_80 * desvio)
+        if con_prophet:
+            salidas = [_prophet(Y[i, inicio[i]:], fechas[inicio[i]:], corte - inicio[i], horizonte) for i in filas]
+            resultados['Prophet'] = tuple(np.vstack(x) for x in zip(*salidas))
+
+        for nombre, (media, inferior, superior) in resultados.items():
+            partes.append(pd.DataFrame({
+                'modelo': nombre,
+                'COD_MUNI': np.repeat(codigos[filas], horizonte),
+                'corte': fechas[corte - 1],
+                'h': np.tile(h, len(filas)),
+                'real': real.ravel(),
+                'yhat': np.maximum(media, 0).ravel(),
+                'yhat_lower': np.maximum(inferior, 0).ravel(),
+                'yhat_upper': np.maximum(superior, 0).ravel(),
+            }))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_ERRORES)
+
+
+def _evaluar_y_guardar(ruta, *args):
+    """Tarea del pool: evalúa un lote y lo guarda como punto de control."""
+    t0 = time.perf_counter()
+    errores = evaluar_lote(*args)
+    tmp = ruta.with_suffix(".parquet.tmp")
+    errores.to_parquet(tmp, index=False)
+    tmp.replace(ruta)
+    return ruta.name, len(errores), time.perf_counter() - t0
+
+
+def calcular_metricas(errores, claves):
+    """MAE, MAPE (solo meses con casos) y cobertura del intervalo del 80%."""
+    ae = (errores['real'] - errores['yhat']).abs()
+    tabla = errores[claves].assign(
+        MAE=ae,
+        MAPE=(ae / errores['real'].where(errores['real'] > 0)) * 100,
+        Cobertura=errores['real'].between(errores['yhat_lower'], errores['yhat_upper']) * 100.0,
+        Pronosticos=1,
+    )
+    return tabla.groupby(claves).agg(
+        {'MAE': 'mean', 'MAPE': 'mean', 'Cobertura': 'mean', 'Pronosticos': 'sum'}
+    ).reset_index()
+
+
+def ejecutar_backtest(panel, version, workers=None, con_prophet=False, reiniciar=False):
+    """Corre el backtest por lotes en paralelo y escribe las tablas de métricas."""
+    directorio = directorio_version(version)
+    config = configuracion(con_prophet)
+    lotes_dir = directorio_lotes(directorio, config)
+    if reiniciar:
+        for ruta in lotes_dir.glob("*.parquet"):
+            ruta.unlink()
+
+    cortes_lote = cortes(panel.n_meses)
+    elegibles = np.flatnonzero(panel.elegibles)
+    lotes = [elegibles[i:i + TAMANO_LOTE] for i in range(0, len(elegibles), TAMANO_LOTE)]
+    pendientes = [
+        (lotes_dir / f"lote_{n:05d}.parquet", filas) for n, filas in enumerate(lotes)
+        if not (lotes_dir / f"lote_{n:05d}.parquet").exists()
+    ]
+    logging.info(
+        f"Modelos {config['modelos']}; "
+        f"{len(elegibles)} municipios en {len(lotes)} lotes; {len(pendientes)} pendientes; "
+        f"cortes en {[str(panel.fechas[c - 1].date()) for c in cortes_lote]}"
+    )
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [
+            pool.submit(
+                _evaluar_y_guardar, ruta, panel.matriz[filas], panel.inicio[filas],
+                panel.codigos[filas], panel.fechas, cortes_lote, HORIZONTE, con_prophet
+            )
+            for ruta, filas in pendientes
+        ]
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            nombre, n_filas, segundos = futuro.result()
+            logging.info(f"[{i}/{len(futuros)}] {nombre}: {n_filas} pronósticos en {segundos:.1f}s")
+
+    guardados = [pd.read_parquet(r) for r in sorted(lotes_dir.glob("*.parquet"))]
+    # Sin municipios elegibles no hay lotes: las tablas quedan vacías pero con sus columnas
+    errores = pd.concat(guardados, ignore_index=True) if guardados else pd.DataFrame(columns=COLUMNAS_ERRORES)
+    valores = ['real', 'yhat', 'yhat_lower', 'yhat_upper']
+    errores[valores] = errores[valores].astype(np.float64)
+    nombres = pd.DataFrame({
+        'COD_MUNI': panel.codigos, 'DEPARTAMENTO': panel.departamentos, 'MUNICIPIO': panel.municipios
+    })
+    por_municipio = calcular_metricas(errores, ['modelo', 'COD_MUNI']).merge(nombres, on='COD_MUNI', how='left')
+    por_modelo = calcular_metricas(errores, ['modelo'])
+    por_horizonte = calcular_metricas(errores, ['modelo', 'h'])
+
+    por_municipio.to_parquet(directorio / "metricas_municipio.parquet", index=False)
+    por_modelo.to_parquet(directorio / "metricas_modelo.parquet", index=False)
+    por_horizonte.to_parquet(directorio / "metricas_horizonte.parquet", index=False)
+    logging.info(f"Backtest completo en {time.perf_counter() - t0:.1f}s -> {directorio}")
+    return por_modelo
+
+
+def leer_metricas(version):
+    """Tablas de métricas (por modelo, por municipio, por horizonte) o None si no hay backtest."""
+    directorio = directorio_version(version)
+    rutas = [directorio / f"metricas_{t}.parquet" for t in ("modelo", "municipio", "horizonte")]
+    if not all(r.exists() for r in rutas):
+        return None
+    return tuple(pd.read_parquet(r) for r in rutas)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Backtesting con origen móvil de los modelos de pronóstico")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--prophet", action="store_true", help="Incluye Prophet (entrena un modelo por municipio y corte)")
+    parser.add_argument("--reiniciar", action="store_true", help="Descarta los lotes guardados y empieza de cero")
+    args = parser.parse_args()
+
+    import datos # Capa de acceso a datos (snapshot o MySQL)
+    panel = PanelMensual(datos.registros_mensuales())
+    print(ejecutar_backtest(panel, datos.version_datos(), args.workers, args.prophet, args.reiniciar).to_string(index=False))
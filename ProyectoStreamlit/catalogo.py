@@ -0,0 +1,88 @@
+import numpy as np # Para traducir códigos a ids con búsquedas vectorizadas
+import pandas as pd # Para manipular datos
+
+# =========================================================================
+# 🏷️ CATÁLOGO DE IDS (departamentos y municipios presentes en los datos)
+# =========================================================================
+
+
+class Catalogo:
+    """Ids enteros densos de los departamentos y municipios de una versión de datos.
+
+    Los ids son los del índice DIVIPOLA (DL_ETL.divipola); los códigos que no
+    están en DIVIPOLA reciben ids a continuación, así que no se mezclan entre
+    sí. Filtros y agrupaciones trabajan sobre estos ids y los nombres solo se
+    agregan al mostrar (`etiquetar`): oficiales si el código está en DIVIPOLA
+    y, si no, la primera grafía de los registros.
+
+    `combos` trae las combinaciones distintas de COD_DEPTO, DEPARTAMENTO,
+    COD_MUNI y MUNICIPIO de los registros.
+    """
+
+    def __init__(self, combos, indice):
+        combos = combos.astype(object).where(combos.notna(), None)
+        self.deptos = self._tabla(
+            combos.drop_duplicates('COD_DEPTO'), 'COD_DEPTO', 'DEPARTAMENTO',
+            indice.ids_depto, indice.cod_depto, indice.nombres_depto
+        )
+        # Mismo formato que mostraba la barra lateral (UPPER(departamento))
+        self.deptos['DEPARTAMENTO'] = self.deptos['DEPARTAMENTO'].str.upper()
+        self.munis = self._tabla(
+            combos.drop_duplicates('COD_MUNI'), 'COD_MUNI', 'MUNICIPIO',
+            indice.ids_muni, indice.cod_muni, indice.nombres_muni
+        )
+        self.munis['ID_DEPTO'] = self.ids_depto(self.munis['COD_DEPTO'])
+        self.munis['DEPARTAMENTO'] = self.deptos['DEPARTAMENTO'].reindex(self.munis['ID_DEPTO']).to_numpy()
+        self.munis['ETIQUETA'] = self.munis['MUNICIPIO'] + ' (' + self.munis['DEPARTAMENTO'].fillna('') + ')'
+
+    @staticmethod
+    def _tabla(filas, col_codigo, col_nombre, ids_divipola, oficiales, nombres_divipola):
+        filas = filas[filas[col_codigo].notna()]
+        codigos = filas[col_codigo].astype(str).to_numpy(dtype=object)
+        ids = ids_divipola(codigos).astype(np.int32)
+        desconocidos = ids < 0
+        nombres = np.where(desconocidos, filas[col_nombre].to_numpy(dtype=object), nombres_divipola(ids))
+        ids[desconocidos] = len(oficiales) + np.arange(desconocidos.sum())
+        return pd.DataFrame(
+            {col_codigo: codigos, col_nombre: nombres, 'COD_DEPTO': filas['COD_DEPTO'].to_numpy(dtype=object)},
+            index=pd.Index(ids, name='ID'),
+        ).sort_index()
+
+    @staticmethod
+    def _ids(tabla, col_codigo, codigos):
+        """Ids de los códigos dados (-1 si no aparecen en los datos)."""
+        pos = pd.Index(tabla[col_codigo]).get_indexer(pd.Index(codigos, dtype=object).astype(str))
+        return np.where(pos >= 0, tabla.index.to_numpy()[pos], -1).astype(np.int32)
+
+    def ids_depto(self, codigos):
+        return self._ids(self.deptos, 'COD_DEPTO', codigos).astype(np.int16)
+
+    def ids_muni(self, codigos):
+        return self._ids(self.munis, 'COD_MUNI', codigos)
+
+    def agregar_ids(self, df):
+        """Agrega ID_DEPTO e ID_MUNI a partir de COD_DEPTO y COD_MUNI.
+
+        Con columnas categóricas (el snapshot) se traduce una vez por categoría.
+        """
+        df = df.copy()
+        for col_id, col_codigo, traducir in (('ID_DEPTO', 'COD_DEPTO', self.ids_depto),
+                                             ('ID_MUNI', 'COD_MUNI', self.ids_muni)):
+            codigos = df[col_codigo].astype('category')
+            ids = np.append(traducir(codigos.cat.categories.astype(str)), -1)
+            df[col_id] = ids[codigos.cat.codes.to_numpy()]
+        return df
+
+    def etiquetar(self, df):
+        """Agrega códigos y nombres para mostrar a las columnas ID_DEPTO / ID_MUNI de `df`."""
+        df = df.copy()
+        if 'ID_DEPTO' in df.columns:
+            deptos = self.deptos.reindex(df['ID_DEPTO'])
+            df['COD_DEPTO'] = deptos['COD_DEPTO'].to_numpy()
+            df['DEPARTAMENTO'] = deptos['DEPARTAMENTO'].to_numpy()
+        if 'ID_MUNI' in df.columns:
+            munis = self.munis.reindex(df['ID_MUNI'])
+            df['COD_MUNI'] = munis['COD_MUNI'].to_numpy()
+            df['MUNICIPIO'] = munis['MUNICIPIO'].to_numpy()
+            df['ETIQUETA'] = munis['ETIQUETA'].to_numpy()
+        return df
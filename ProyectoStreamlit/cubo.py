@@ -0,0 +1,32 @@
+# =========================================================================
+# 🧊 CUBO DE AGREGACIÓN (grano más fino que necesita el dashboard)
+# =========================================================================
+
+# Todas las vistas del dashboard (KPIs, mapa, tendencia, sexo, zona, ranking y
+# desglose) se pueden enrollar desde este grano. Departamentos y municipios van
+# como ids enteros (catalogo.Catalogo): los nombres no forman parte del grano,
+# porque un mismo código puede llegar con varias grafías y agrupar por nombre
+# partiría un municipio en varias filas; códigos y nombres se agregan al
+# mostrar con Catalogo.etiquetar.
+DIMENSIONES = ['ID_DEPTO', 'ID_MUNI', 'ANIO', 'SEXO', 'ZONA']
+
+
+def construir_cubo(df):
+    """Agrega los registros filtrados una sola vez al grano de DIMENSIONES.
+
+    Se conservan las combinaciones con valores nulos (dropna=False) para que el
+    total del cubo coincida con el de los registros; al enrollar por una sola
+    dimensión los nulos se descartan igual que en un groupby directo.
+    """
+    cubo = (
+        df.groupby(DIMENSIONES, observed=True, dropna=False, sort=False)['CANTIDAD']
+        .sum()
+        .reset_index()
+    )
+    cubo['CANTIDAD'] = cubo['CANTIDAD'].astype('int64')
+    return cubo
+
+
+def enrollar(cubo, claves):
+    """Suma el cubo por un subconjunto de dimensiones (roll-up)."""
+    return cubo.groupby(claves, observed=True)['CANTIDAD'].sum().reset_index()
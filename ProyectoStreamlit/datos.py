@@ -0,0 +1,294 @@
+import json # Para leer las capas GeoJSON
+import os # Para leer las variables de entorno
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd # Para manipular datos
+import streamlit as st # Para el caché de conexiones y consultas
+from dotenv import load_dotenv # Para reutilizar las credenciales del ETL
+from sqlalchemy import bindparam, create_engine, text # Para consultar el Data Lake en MySQL
+
+# =========================================================================
+# 💾 CAPA DE ACCESO A DATOS (Snapshot Parquet o MySQL / Data Lake del ETL)
+# =========================================================================
+
+BASE_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BASE_DIR.parent
+
+# Permite reutilizar los módulos de DL_ETL desde la app
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from DL_ETL import divipola # Índice de códigos DIVIPOLA compartido con el ETL
+from DL_ETL.snapshot import DEFAULT_SNAPSHOT_PATH, read_snapshot, snapshot_version
+from catalogo import Catalogo # Ids enteros de departamentos y municipios
+from filtros import IndiceFiltros # Motor de filtros indexado para el snapshot
+from cubo import construir_cubo # Cubo de agregación del dashboard
+from geometria import TOLERANCIA_DEFECTO, construir_capa, ruta_capa # Geometrías simplificadas del mapa
+
+# Mismas credenciales que usa DL_ETL
+load_dotenv(REPO_ROOT / "DL_ETL" / ".env")
+
+SNAPSHOT_PATH = Path(os.getenv("HOMICIDIOS_SNAPSHOT", DEFAULT_SNAPSHOT_PATH))
+
+# "snapshot": Parquet generado por el ETL (python -m DL_ETL.snapshot), cargado en memoria.
+# "mysql": consultas filtradas directamente sobre raw_homicidios.
+FUENTE = os.getenv("HOMICIDIOS_FUENTE") or ("snapshot" if SNAPSHOT_PATH.exists() else "mysql")
+
+# Tolerancia de simplificación de la capa del mapa (python geometria.py --tolerancias ...)
+GEO_TOLERANCIA = float(os.getenv("HOMICIDIOS_GEO_TOLERANCIA", TOLERANCIA_DEFECTO))
+
+# Columnas de raw_homicidios con los nombres que usan las páginas
+COLUMNAS_APP = """
+    fecha_hecho AS `FECHA HECHO`,
+    YEAR(fecha_hecho) AS ANIO,
+    cod_depto AS COD_DEPTO,
+    UPPER(departamento) AS DEPARTAMENTO,
+    cod_muni AS COD_MUNI,
+    municipio AS MUNICIPIO,
+    sexo AS SEXO,
+    zona AS ZONA,
+    cantidad AS CANTIDAD
+"""
+
+
+@st.cache_resource
+def get_engine():
+    """Engine con pool de conexiones, compartido por todas las sesiones."""
+    url = (
+        f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '3306')}/{os.getenv('DB_NAME')}"
+    )
+    return create_engine(url, pool_size=5, max_overflow=5, pool_pre_ping=True, pool_recycle=3600)
+
+
+@st.cache_data(ttl=60)
+def version_datos():
+    """Versión de los datos: marca de agua del ETL en etl_control."""
+    if FUENTE == "snapshot":
+        return f"{snapshot_version(SNAPSHOT_PATH)}|{SNAPSHOT_PATH.stat().st_mtime_ns}"
+    with get_engine().connect() as conn:
+        row = conn.execute(text(
+            "SELECT last_loaded_date, last_loaded_ts FROM etl_control WHERE proceso = 'homicidios_api'"
+        )).fetchone()
+    return f"{row[0]}|{row[1]}" if row else "sin-datos"
+
+
+def _filtros_sql(year_range=None, cod_deptos=(), municipios=(), por_anio=False):
+    """Arma la cláusula WHERE parametrizada a partir de los filtros de la barra lateral.
+
+    Departamentos y municipios llegan como códigos DANE (las opciones de la barra lateral).
+    Con por_anio=True el rango se aplica sobre la columna `anio` de las tablas agregadas.
+    """
+    condiciones, params, expanding = [], {}, []
+    if year_range and por_anio:
+        condiciones.append("anio BETWEEN :y0 AND :y1")
+        params["y0"], params["y1"] = year_range
+    elif year_range:
+        # Rango de fechas (y no YEAR(fecha_hecho)) para que MySQL pueda usar índices
+        condiciones.append("fecha_hecho >= :ini AND fecha_hecho < :fin")
+        params["ini"] = date(year_range[0], 1, 1)
+        params["fin"] = date(year_range[1] + 1, 1, 1)
+    if cod_deptos:
+        # Por código y no por nombre: usa los índices (cod_depto, fecha_hecho) y no
+        # depende de que la collation compare mayúsculas y minúsculas como iguales
+        condiciones.append("cod_depto IN :deptos")
+        params["deptos"] = list(cod_deptos)
+        expanding.append("deptos")
+    if municipios:
+        # Los municipios se filtran por código DIVIPOLA (nombres repetidos entre departamentos)
+        condiciones.append("cod_muni IN :munis")
+        params["munis"] = list(municipios)
+        expanding.append("munis")
+    where = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+    return where, params, expanding
+
+
+def _consultar(sql, params=None, expanding=()):
+    stmt = text(sql)
+    if expanding:
+        stmt = stmt.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+    with get_engine().connect() as conn:
+        return pd.read_sql(stmt, conn, params=params or {})
+
+
+@st.cache_resource(max_entries=1)
+def _indice(version):
+    """Snapshot en memoria con sus ids y su índice de filtros (uno por versión de datos)."""
+    return IndiceFiltros(_catalogo(version).agregar_ids(read_snapshot(SNAPSHOT_PATH)))
+
+
+@st.cache_resource(max_entries=1)
+def _indice_divipola(version):
+    """Índice DIVIPOLA: dimensiones de MySQL o, con el snapshot, los CSV del repositorio."""
+    if FUENTE == "snapshot":
+        return divipola.indice_local()
+    with get_engine().connect() as conn:
+        return divipola.indice_desde_db(conn)
+
+
+@st.cache_resource(max_entries=1)
+def _catalogo(version):
+    """Ids, códigos y nombres para mostrar de los departamentos y municipios con datos."""
+    columnas = ["COD_DEPTO", "DEPARTAMENTO", "COD_MUNI", "MUNICIPIO"]
+    if FUENTE == "snapshot":
+        combos = pd.read_parquet(SNAPSHOT_PATH, columns=columnas).drop_duplicates()
+    else:
+        combos = _consultar("""
+            SELECT DISTINCT cod_depto AS COD_DEPTO, departamento AS DEPARTAMENTO,
+                   cod_muni AS COD_MUNI, municipio AS MUNICIPIO
+            FROM agg_homicidios_anio
+        """)
+    return Catalogo(combos, _indice_divipola(version))
+
+
+@st.cache_data(max_entries=8)
+def _rango_anios(version):
+    if FUENTE == "snapshot":
+        indice = _indice(version)
+        return indice.min_anio, indice.max_anio
+    df = _consultar("SELECT MIN(YEAR(fecha_hecho)) AS min_anio, MAX(YEAR(fecha_hecho)) AS max_anio FROM raw_homicidios")
+    return int(df["min_anio"].iloc[0]), int(df["max_anio"].iloc[0])
+
+
+@st.cache_data(max_entries=64)
+def _municipios(year_range, departamentos, version):
+    if FUENTE == "snapshot":
+        catalogo = _catalogo(version)
+        ids = _indice(version).listar_municipios(year_range, catalogo.ids_depto(departamentos))
+        return list(catalogo.munis.loc[ids, "COD_MUNI"])
+    where, params, expanding = _filtros_sql(year_range, departamentos)
+    df = _consultar(f"SELECT DISTINCT cod_muni AS COD_MUNI FROM raw_homicidios {where}", params, expanding)
+    return list(df["COD_MUNI"].dropna())
+
+
+@st.cache_data(max_entries=32)
+def _homicidios(year_range, departamentos, municipios, version):
+    where, params, expanding = _filtros_sql(year_range, departamentos, municipios)
+    df = _consultar(f"SELECT {COLUMNAS_APP} FROM raw_homicidios {where}", params, expanding)
+    df["FECHA HECHO"] = pd.to_datetime(df["FECHA HECHO"])
+    return df
+
+
+@st.cache_data(max_entries=32)
+def _cubo(year_range, departamentos, municipios, version):
+    catalogo = _catalogo(version)
+    if FUENTE == "snapshot":
+        return construir_cubo(_indice(version).seleccionar(
+            year_range, catalogo.ids_depto(departamentos), catalogo.ids_muni(municipios)
+        ))
+    # En MySQL el cubo sale de la tabla agregada anual que mantiene el ETL, agrupada por código
+    where, params, expanding = _filtros_sql(year_range, departamentos, municipios, por_anio=True)
+    return construir_cubo(catalogo.agregar_ids(_consultar(f"""
+        SELECT cod_depto AS COD_DEPTO, cod_muni AS COD_MUNI, anio AS ANIO,
+               NULLIF(sexo, '') AS SEXO, NULLIF(zona, '') AS ZONA, SUM(total) AS CANTIDAD
+        FROM agg_homicidios_anio {where}
+        GROUP BY cod_depto, cod_muni, anio, sexo, zona
+    """, params, expanding)))
+
+
+@st.cache_resource(max_entries=2)
+def geojson(nivel="departamento"):
+    """Capa simplificada del mapa, con id = código DANE, compartida por todas las sesiones.
+
+    Si la versión compacta no existe se genera una sola vez desde la geometría
+    completa; devuelve None si tampoco hay geometría de entrada para el nivel.
+    """
+    ruta = ruta_capa(nivel, GEO_TOLERANCIA)
+    if not ruta.exists():
+        try:
+            construir_capa(nivel, GEO_TOLERANCIA)
+        except FileNotFoundError:
+            return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- Funciones públicas (el caché queda ligado a los filtros y a la versión) ---
+
+def clave_filtros(year_range=None, departamentos=(), municipios=()):
+    """Normaliza los filtros para usarlos como llave de caché (el orden no importa)."""
+    return (
+        tuple(year_range) if year_range else None,
+        tuple(sorted(departamentos)),
+        tuple(sorted(municipios)),
+    )
+
+def rango_anios():
+    """Primer y último año con datos en raw_homicidios."""
+    return _rango_anios(version_datos())
+
+
+def listar_departamentos():
+    """Códigos DANE de los departamentos con datos, ordenados por nombre."""
+    return list(_catalogo(version_datos()).deptos.sort_values("DEPARTAMENTO")["COD_DEPTO"])
+
+
+def nombre_departamento(cod_depto):
+    """Nombre para mostrar de un departamento."""
+    deptos = _catalogo(version_datos()).deptos
+    nombres = deptos.loc[deptos["COD_DEPTO"] == str(cod_depto), "DEPARTAMENTO"]
+    return nombres.iloc[0] if len(nombres) else str(cod_depto)
+
+
+def listar_municipios(year_range=None, departamentos=()):
+    """Códigos DIVIPOLA de los municipios con datos, ordenados por su etiqueta."""
+    codigos = _municipios(year_range and tuple(year_range), tuple(departamentos), version_datos())
+    return sorted(map(str, codigos), key=etiqueta_municipio)
+
+
+def etiqueta_municipio(cod_muni):
+    """Nombre para mostrar de un municipio ("Municipio (Departamento)")."""
+    catalogo = _catalogo(version_datos())
+    id_muni = catalogo.ids_muni([cod_muni])[0]
+    return catalogo.munis.at[id_muni, "ETIQUETA"] if id_muni >= 0 else str(cod_muni)
+
+
+def etiquetar(df):
+    """Agrega códigos y nombres a las columnas ID_DEPTO / ID_MUNI de un roll-up del cubo."""
+    return _catalogo(version_datos()).etiquetar(df)
+
+
+def cargar_homicidios(year_range=None, departamentos=(), municipios=()):
+    """Registros según los filtros de la barra lateral.
+
+    Con el snapshot se resuelven con el índice en memoria (sin caché por filtro,
+    para no copiar las filas); en MySQL se filtran en la consulta.
+    """
+    version = version_datos()
+    if FUENTE == "snapshot":
+        catalogo = _catalogo(version)
+        return _indice(version).seleccionar(
+            year_range, catalogo.ids_depto(departamentos), catalogo.ids_muni(municipios)
+        )
+    return _homicidios(*clave_filtros(year_range, departamentos, municipios), version)
+
+
+def cubo_homicidios(year_range=None, departamentos=(), municipios=()):
+    """Cubo departamento × municipio × año × sexo × zona para los filtros dados.
+
+    Se memoiza con expulsión LRU acotada, así que volver a un filtro anterior
+    o cambiar de pestaña no recalcula nada.
+    """
+    return _cubo(*clave_filtros(year_range, departamentos, municipios), version_datos())
+
+
+def registros_mensuales():
+    """Registros para construir el panel municipio × mes.
+
+    Con el snapshot se usan las filas en memoria; en MySQL se lee la tabla
+    agregada mensual que mantiene el ETL (mucho más pequeña que raw_homicidios).
+    """
+    version = version_datos()
+    if FUENTE == "snapshot":
+        return _indice(version).df
+    df = _consultar("""
+        SELECT cod_muni AS COD_MUNI, MAX(municipio) AS MUNICIPIO,
+               MAX(cod_depto) AS COD_DEPTO, MAX(UPPER(departamento)) AS DEPARTAMENTO,
+               periodo AS `FECHA HECHO`, SUM(total) AS CANTIDAD
+        FROM agg_homicidios_mes
+        GROUP BY cod_muni, periodo
+    """)
+    df["FECHA HECHO"] = pd.to_datetime(df["FECHA HECHO"])
+    return df
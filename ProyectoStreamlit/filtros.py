@@ -0,0 +1,95 @@
+import numpy as np # Para búsquedas binarias vectorizadas
+
+# =========================================================================
+# 🔎 MOTOR DE FILTROS INDEXADO (para el snapshot en memoria)
+# =========================================================================
+
+
+class IndiceFiltros:
+    """Índice de filtros por año, departamento y municipio.
+
+    Se construye una sola vez por versión de datos sobre los ids enteros de
+    departamento y municipio (ID_DEPTO, ID_MUNI; ver catalogo.Catalogo):
+    ordena las filas por (departamento, municipio, año) y guarda el rango
+    [inicio, fin) de cada par departamento/municipio. Así, cualquier combinación de filtros se resuelve
+    con búsquedas binarias sobre los grupos en vez de recorrer todas las filas,
+    y cuando la selección es contigua se devuelve una vista sin copiar.
+    Los filtros llegan como ids; -1 (código desconocido) no coincide con nada.
+    """
+
+    def __init__(self, df):
+        ids_depto = df['ID_DEPTO'].to_numpy(dtype=np.int64)
+        ids_muni = df['ID_MUNI'].to_numpy(dtype=np.int64)
+        anios = df['ANIO'].to_numpy(dtype=np.int64)
+
+        orden = np.lexsort((anios, ids_muni, ids_depto))
+        self.df = df.take(orden).reset_index(drop=True)
+        ids_depto, ids_muni, anios = ids_depto[orden], ids_muni[orden], anios[orden]
+
+        # Límites de cada grupo departamento/municipio dentro del orden (los ids parten en -1)
+        clave = (ids_depto + 1) * (int(ids_muni.max(initial=0)) + 2) + ids_muni + 1
+        inicios = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]]) if len(clave) else np.array([], dtype=np.int64)
+        self.grupo_depto = ids_depto[inicios]
+        self.grupo_muni = ids_muni[inicios]
+
+        # Clave compuesta grupo/año, ordenada, para resolver rangos de años por grupo
+        id_grupo = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, len(clave)]))
+        self._clave_anio = id_grupo * 10_000 + anios
+
+        self.min_anio = int(anios.min()) if len(anios) else None
+        self.max_anio = int(anios.max()) if len(anios) else None
+
+    def _grupos(self, departamentos=(), municipios=()):
+        mask = np.ones(len(self.grupo_depto), dtype=bool)
+        # Los ids desconocidos (-1) no deben coincidir con los grupos sin código
+        if len(departamentos):
+            ids = np.asarray(departamentos, dtype=np.int64)
+            mask &= np.isin(self.grupo_depto, ids[ids >= 0])
+        if len(municipios):
+            ids = np.asarray(municipios, dtype=np.int64)
+            mask &= np.isin(self.grupo_muni, ids[ids >= 0])
+        return np.flatnonzero(mask)
+
+    def _rangos(self, year_range=None, departamentos=(), municipios=()):
+        """Rangos [inicio, fin) de filas que cumplen los filtros, ya fusionados."""
+        grupos = self._grupos(departamentos, municipios)
+        y0, y1 = year_range if year_range else (0, 9_999)
+        inicios = np.searchsorted(self._clave_anio, grupos * 10_000 + y0, side='left')
+        fines = np.searchsorted(self._clave_anio, grupos * 10_000 + y1, side='right')
+        no_vacios = fines > inicios
+        inicios, fines = inicios[no_vacios], fines[no_vacios]
+        if len(inicios) > 1:
+            # Une rangos adyacentes (p. ej. todos los municipios de un departamento)
+            corte = np.r_[True, inicios[1:] != fines[:-1]]
+            inicios, fines = inicios[corte], fines[np.r_[corte[1:], True]]
+        return inicios, fines, grupos[no_vacios]
+
+    @staticmethod
+    def _expandir(inicios, fines):
+        largos = fines - inicios
+        return np.repeat(inicios - np.r_[0, np.cumsum(largos)[:-1]], largos) + np.arange(largos.sum())
+
+    def posiciones(self, year_range=None, departamentos=(), municipios=()):
+        """Posiciones (enteras) de las filas seleccionadas, sin tocar el DataFrame."""
+        inicios, fines, _ = self._rangos(year_range, departamentos, municipios)
+        return self._expandir(inicios, fines)
+
+    def seleccionar(self, year_range=None, departamentos=(), municipios=()):
+        """Filas que cumplen los filtros; si son contiguas se devuelve una vista."""
+        inicios, fines, _ = self._rangos(year_range, departamentos, municipios)
+        if len(inicios) == 1:
+            return self.df.iloc[inicios[0]:fines[0]]
+        if not len(inicios):
+            return self.df.iloc[0:0]
+        return self.df.take(self._expandir(inicios, fines))
+
+    def listar_departamentos(self):
+        """Ids de los departamentos con datos."""
+        ids = np.unique(self.grupo_depto)
+        return ids[ids >= 0]
+
+    def listar_municipios(self, year_range=None, departamentos=()):
+        """Ids de los municipios con datos para los filtros dados, leídos del índice."""
+        _, _, grupos = self._rangos(year_range, departamentos)
+        ids = np.unique(self.grupo_muni[grupos])
+        return ids[ids >= 0]
@@ -0,0 +1,145 @@
+"""Preprocesamiento de geometrías para los mapas del dashboard.
+
+Uso (desde ProyectoStreamlit/):
+
+    python geometria.py                                   # departamentos, tolerancia por defecto
+    python geometria.py --tolerancias 0.005 0.02          # varias resoluciones
+    python geometria.py --nivel municipio --entrada MGN_MPIO.geo.json
+
+Simplifica los polígonos con Douglas-Peucker (NumPy), redondea coordenadas,
+descarta propiedades que el mapa no usa y guarda cada entidad con su código
+DANE como `id`, de modo que plotly pueda enlazar por código
+(featureidkey='id') en vez de por nombre.
+"""
+import argparse
+import json
+import logging
+import math
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+GEO_DIR = BASE_DIR / "geo"
+
+TOLERANCIA_DEFECTO = 0.01 # grados (~1 km); suficiente para el mapa del país completo
+
+# Campos de código y nombre de cada capa (DANE / Marco Geoestadístico Nacional)
+NIVELES = {
+    'departamento': {'entrada': BASE_DIR / "colombia.geo.json", 'codigo': 'DPTO', 'nombre': 'NOMBRE_DPT', 'digitos': 2},
+    'municipio': {'entrada': None, 'codigo': 'MPIO_CCNCT', 'nombre': 'MPIO_CNMBR', 'digitos': 5},
+}
+
+
+def ruta_capa(nivel='departamento', tolerancia=TOLERANCIA_DEFECTO):
+    return GEO_DIR / f"{nivel}_{tolerancia:g}.geo.json"
+
+
+def douglas_peucker(puntos, tolerancia):
+    """Índices de los puntos que conserva Douglas-Peucker para una línea (n × 2).
+
+    Se usa una pila en vez de recursión y las distancias de cada tramo se
+    calculan de una vez con NumPy.
+    """
+    n = len(puntos)
+    conservar = np.zeros(n, dtype=bool)
+    conservar[[0, n - 1]] = True
+    pila = [(0, n - 1)]
+    while pila:
+        i, j = pila.pop()
+        if j <= i + 1:
+            continue
+        a, b = puntos[i], puntos[j]
+        medio = puntos[i + 1:j]
+        ab = b - a
+        largo = math.hypot(*ab)
+        if largo == 0:
+            # Anillo cerrado (inicio == fin): distancia al punto
+            dist = np.hypot(*(medio - a).T)
+        else:
+            dist = np.abs(ab[0] * (medio[:, 1] - a[1]) - ab[1] * (medio[:, 0] - a[0])) / largo
+        k = int(dist.argmax())
+        if dist[k] > tolerancia:
+            k += i + 1
+            conservar[k] = True
+            pila.append((i, k))
+            pila.append((k, j))
+    return np.flatnonzero(conservar)
+
+
+def _simplificar_anillo(anillo, tolerancia, decimales):
+    """Anillo simplificado y redondeado; None si colapsa (menos de 4 puntos)."""
+    puntos = np.asarray(anillo, dtype=np.float64)[:, :2]
+    puntos = np.round(puntos[douglas_peucker(puntos, tolerancia)], decimales)
+    # El redondeo puede dejar puntos repetidos seguidos
+    puntos = puntos[np.r_[True, (np.diff(puntos, axis=0) != 0).any(axis=1)]]
+    return puntos.tolist() if len(puntos) >= 4 else None
+
+
+def _simplificar_poligono(poligono, tolerancia, decimales):
+    exterior = _simplificar_anillo(poligono[0], tolerancia, decimales)
+    if exterior is None:
+        return None
+    huecos = [h for h in (_simplificar_anillo(a, tolerancia, decimales) for a in poligono[1:]) if h]
+    return [exterior, *huecos]
+
+
+def simplificar_geometria(geometria, tolerancia, decimales):
+    """Simplifica un Polygon o MultiPolygon; las partes que colapsan se descartan."""
+    poligonos = geometria['coordinates'] if geometria['type'] == 'MultiPolygon' else [geometria['coordinates']]
+    partes = [p for p in (_simplificar_poligono(p, tolerancia, decimales) for p in poligonos) if p]
+    if not partes:
+        # Entidad más pequeña que la tolerancia: se conserva su exterior original redondeado
+        partes = [[np.round(np.asarray(poligonos[0][0])[:, :2], decimales).tolist()]]
+    if len(partes) == 1:
+        return {'type': 'Polygon', 'coordinates': partes[0]}
+    return {'type': 'MultiPolygon', 'coordinates': partes}
+
+
+def simplificar_capa(geojson, nivel='departamento', tolerancia=TOLERANCIA_DEFECTO):
+    """FeatureCollection compacta con `id` = código DANE y solo código y nombre como propiedades."""
+    campos = NIVELES[nivel]
+    # Decimales suficientes para la tolerancia, sin guardar precisión que no se ve
+    decimales = max(0, math.ceil(-math.log10(tolerancia))) + 1
+    features = []
+    for feature in geojson['features']:
+        codigo = str(feature['properties'][campos['codigo']]).zfill(campos['digitos'])
+        features.append({
+            'type': 'Feature',
+            'id': codigo,
+            'properties': {'codigo': codigo, 'nombre': feature['properties'].get(campos['nombre'])},
+            'geometry': simplificar_geometria(feature['geometry'], tolerancia, decimales),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def construir_capa(nivel='departamento', tolerancia=TOLERANCIA_DEFECTO, entrada=None):
+    """Lee la geometría completa, la simplifica y guarda la versión compacta."""
+    entrada = Path(entrada or NIVELES[nivel]['entrada'] or "")
+    if not entrada.is_file():
+        raise FileNotFoundError(f"No se encontró la geometría de entrada para el nivel '{nivel}': {entrada}")
+    with open(entrada, 'r', encoding='utf-8') as f:
+        capa = simplificar_capa(json.load(f), nivel, tolerancia)
+
+    salida = ruta_capa(nivel, tolerancia)
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    tmp = salida.with_suffix(".tmp")
+    tmp.write_text(json.dumps(capa, separators=(',', ':'), ensure_ascii=False), encoding='utf-8')
+    tmp.replace(salida)
+    logging.info(
+        f"Capa '{nivel}' (tolerancia {tolerancia:g}): {entrada.stat().st_size / 1024:.0f} KB -> "
+        f"{salida.stat().st_size / 1024:.0f} KB en {salida}"
+    )
+    return salida
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Simplifica y compacta las geometrías de los mapas")
+    parser.add_argument("--nivel", default="departamento", choices=list(NIVELES))
+    parser.add_argument("--tolerancias", type=float, nargs="+", default=[TOLERANCIA_DEFECTO], help="Tolerancias de Douglas-Peucker en grados")
+    parser.add_argument("--entrada", help="GeoJSON de entrada (obligatorio para el nivel municipio)")
+    args = parser.parse_args()
+
+    for tolerancia in args.tolerancias:
+        construir_capa(args.nivel, tolerancia, args.entrada)
@@ -1,43 +1,5 @@
 import streamlit as st  # Para visualización de proyectos de ML
-import pandas as pd # Para manipular datos
-import json # Para crear el mapa
-import time # Para simular el tiempo de carga y mostrar un spinner
-
-# --- NOMBRES DE ARCHIVOS GLOBALES ---
-FILE_NAME = "HOMICIDIO_20251014.csv"
-GEOJSON_FILE = "colombia.geo.json"
-
-# =========================================================================
-# 💡 FUNCIONES DE CARGA Y LIMPIEZA
-# =========================================================================
-
-# Usamos st.cache_data para acelerar la carga si se refresca la página
-@st.cache_data
-def load_and_clean_data(file_path):
-    """Carga y limpia el dataset de homicidios."""
-    try:
-        df = pd.read_csv(file_path)
-        df['FECHA HECHO'] = pd.to_datetime(df['FECHA HECHO'], dayfirst=True, errors='coerce')
-        df['CANTIDAD'] = pd.to_numeric(df['CANTIDAD'], errors='coerce').fillna(0).astype(int)
-        df.dropna(subset=['FECHA HECHO', 'DEPARTAMENTO'], inplace=True)
-        df['ANIO'] = df['FECHA HECHO'].dt.year
-        df['DEPARTAMENTO'] = df['DEPARTAMENTO'].str.upper().str.strip()
-        df['MUNICIPIO'] = df['MUNICIPIO'].str.title().str.strip() 
-        return df
-    except FileNotFoundError:
-        st.error(f"Error: No se encontró el archivo {file_path}. Asegúrate de que esté en la raíz.")
-        return pd.DataFrame() 
-
-@st.cache_data
-def load_geojson_data(file_path):
-    """Carga el archivo GeoJSON."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            geojson = json.load(f)
-        return geojson
-    except FileNotFoundError:
-        st.error(f"Error: No se encontró el archivo GeoJSON en la ruta {file_path}.")
-        return None
+import datos # Capa de acceso al Data Lake (MySQL)
 
 # =========================================================================
 # 🌐 ESTRUCTURA DE LA PORTADA
@@ -58,23 +20,29 @@ Este proyecto tiene como objetivo principal aplicar técnicas de **Análisis de
 
 # --- LÓGICA DE CARGA Y ALMACENAMIENTO DE DATOS EN SESSION STATE ---
 
-# Condición: Solo cargamos si el DataFrame principal no existe en la sesión
-if 'df_homicidios' not in st.session_state:
+# Condición: Solo verificamos la conexión si no se ha hecho en esta sesión.
+# Los registros ya no se cargan aquí: cada página consulta MySQL con sus filtros.
+if 'datos_listos' not in st.session_state:
     st.subheader("🚀 Inicializando el motor de datos...")
     
-    with st.spinner('Cargando y limpiando datos... Esto puede tardar unos segundos...'):
-        # 1. Cargar datos
-        df_homicidios = load_and_clean_data(FILE_NAME)
-        geojson_data = load_geojson_data(GEOJSON_FILE)
+    with st.spinner('Conectando con la base de datos... Esto puede tardar unos segundos...'):
+        try:
+            # 1. Verificar conexión y obtener la versión de los datos del ETL
+            version = datos.version_datos()
+            min_anio, max_anio = datos.rango_anios()
+        except Exception as e:
+            st.error(f"Error crítico: No se pudo consultar la base de datos. Revisa el ETL y el archivo .env. ({e})")
+            st.stop()
+        # La capa simplificada del mapa se comparte entre sesiones (no va en session_state)
+        geojson_data = datos.geojson('departamento')
         
         # 2. Guardar en Session State
-        if not df_homicidios.empty and geojson_data is not None:
-            st.session_state['df_homicidios'] = df_homicidios
-            st.session_state['geojson_data'] = geojson_data
-            st.session_state['FILE_NAME'] = FILE_NAME # Guarda el nombre para la info.
-            st.success("¡Datos cargados exitosamente! Ya puedes navegar al Dashboard Principal.")
+        if geojson_data is not None:
+            st.session_state['datos_listos'] = True
+            st.session_state['datos_version'] = version
+            st.success(f"¡Datos disponibles ({min_anio} - {max_anio})! Ya puedes navegar al Dashboard Principal.")
         else:
-            st.error("Error crítico: No se pudieron cargar los datos o el GeoJSON. Revisa los nombres de los archivos.")
+            st.error("Error crítico: No se pudo cargar el GeoJSON. Revisa el nombre del archivo.")
             st.stop()
 else:
     st.success("¡Datos listos! Continúa la navegación.")
@@ -0,0 +1,177 @@
+"""Pronóstico jerárquico conciliado: municipio → departamento → nacional.
+
+Uso (desde ProyectoStreamlit/):
+
+    python jerarquia.py --motor "Suavizado exponencial (ETS)" --metodo mint
+
+Se pronostican todos los niveles en una sola corrida con un motor vectorizado
+y se concilian con la matriz de sumas S (dispersa) construida a partir de los
+códigos DIVIPOLA (cod_muni → cod_depto), de modo que los municipios sumen a su
+departamento y los departamentos al total nacional. La app lee el resultado.
+"""
+import argparse
+import hashlib
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import linalg, sparse
+from scipy.sparse.linalg import spsolve
+
+import motores # Motores de pronóstico vectorizados
+from panel import MIN_MESES, PanelMensual # Panel municipio × mes
+
+BASE_DIR = Path(__file__).resolve().parent
+JERARQUIA_DIR = BASE_DIR / "pronosticos_jerarquicos"
+
+MOTOR_DEFECTO = 'Suavizado exponencial (ETS)'
+METODOS = ('bottom-up', 'wls', 'mint')
+HORIZONTE = 24 # Igual al horizonte máximo de la página del modelo
+# MinT arma W densa (series × series): con ~1.150 series son ~10 MB y un
+# Cholesky de segundos; más allá de este tope conviene 'wls', que es dispersa
+MINT_MAX_SERIES = 5000
+
+
+def matriz_suma(cod_deptos):
+    """Matriz S (nacional + departamentos + municipios) × municipios en formato CSR.
+
+    Devuelve también los códigos de departamento en el orden de sus filas.
+    """
+    deptos, fila_depto = np.unique(cod_deptos, return_inverse=True)
+    n = len(cod_deptos)
+    columnas = np.arange(n)
+    S = sparse.vstack([
+        sparse.csr_matrix(np.ones((1, n))),
+        sparse.csr_matrix((np.ones(n), (fila_depto, columnas)), shape=(len(deptos), n)),
+        sparse.identity(n, format='csr'),
+    ]).tocsr()
+    return S, deptos
+
+
+def _covarianza_shrink(E):
+    """Covarianza de residuos con encogimiento hacia la diagonal (Schäfer-Strimmer)."""
+    T = E.shape[1]
+    E = E - E.mean(axis=1, keepdims=True)
+    desvio = np.sqrt((E ** 2).mean(axis=1))
+    desvio[desvio == 0] = 1.0
+    Z = E / desvio[:, None]
+    R = Z @ Z.T / T
+    # Varianza estimada de cada correlación; λ óptimo sobre los elementos fuera de la diagonal
+    var_R = ((Z ** 2) @ (Z ** 2).T / T - R ** 2) * T / (T - 1) ** 2
+    fuera = ~np.eye(len(R), dtype=bool)
+    # Con menos meses que series R es singular; un λ mínimo mantiene W definida positiva
+    lam = float(np.clip(var_R[fuera].sum() / max((R[fuera] ** 2).sum(), 1e-12), 1e-3, 1.0))
+    R_shrink = (1 - lam) * R
+    np.fill_diagonal(R_shrink, 1.0)
+    return R_shrink * np.outer(desvio, desvio), lam
+
+
+def conciliar(S, base, metodo='mint', residuos=None):
+    """Concilia los pronósticos base (todas las series × horizonte).
+
+    - bottom-up: solo se usan los pronósticos de los municipios.
+    - wls: mínimos cuadrados ponderados con pesos estructurales (S·1).
+    - mint: MinT con covarianza de residuos encogida (requiere `residuos`).
+      La covarianza encogida es densa, así que W y W⁻¹S ocupan
+      O(series²) en memoria y la factorización O(series³) en tiempo; por
+      encima de MINT_MAX_SERIES se rechaza y hay que usar 'wls'.
+
+    Los pronósticos de municipios conciliados se recortan en cero y los
+    niveles superiores se rearman como S · municipios, así que el resultado
+    es no negativo y sigue sumando exacto (recortar después de S rompería
+    la coherencia).
+    """
+    n_base = S.shape[1]
+    if metodo == 'bottom-up':
+        inferior = base[-n_base:]
+    elif metodo == 'wls':
+        w_inv = sparse.diags(1.0 / np.asarray(S.sum(axis=1)).ravel())
+        A = (S.T @ w_inv @ S).tocsc()
+        inferior = spsolve(A, S.T @ (w_inv @ base))
+    elif metodo == 'mint':
+        if S.shape[0] > MINT_MAX_SERIES:
+            raise ValueError(
+                f"MinT con {S.shape[0]} series supera MINT_MAX_SERIES={MINT_MAX_SERIES}: use 'wls'"
+            )
+        W, _ = _covarianza_shrink(residuos)
+        W_inv_S = linalg.solve(W, S.toarray(), assume_a='pos')
+        inferior = linalg.solve(S.T @ W_inv_S, W_inv_S.T @ base, assume_a='pos')
+    else:
+        raise ValueError(f"Método de conciliación desconocido: {metodo}")
+    inferior = np.maximum(np.asarray(inferior).reshape(n_base, -1), 0)
+    return S @ inferior
+
+
+def pronostico_jerarquico(panel, motor=MOTOR_DEFECTO, metodo='mint', horizonte=HORIZONTE):
+    """Pronostica y concilia todos los niveles en una sola corrida.
+
+    Se usan todos los municipios del panel: los meses sin casos son ceros
+    reales, así que las series cortas se extienden hacia atrás hasta tener el
+    mínimo de meses que necesitan los motores.
+    """
+    S, deptos = matriz_suma(panel.cod_deptos)
+    Y = S @ panel.matriz.astype(np.float64) # historia de todos los niveles
+    inicio_base = np.minimum(panel.inicio, panel.n_meses - MIN_MESES)
+    inicio = np.concatenate([
+        [inicio_base.min()],
+        [inicio_base[panel.cod_deptos == d].min() for d in deptos],
+        inicio_base,
+    ])
+
+    media, desvio, errores = motores.MOTORES[motor](Y, inicio, horizonte, residuos=True)
+    conciliada = conciliar(S, media, metodo, errores)
+
+    nombres_depto = pd.Series(panel.departamentos).groupby(panel.cod_deptos).first()
+    etiquetas = pd.DataFrame({
+        'nivel': ['Nacional'] + ['Departamento'] * len(deptos) + ['Municipio'] * len(panel.codigos),
+        'codigo': ['00', *deptos, *panel.codigos],
+        'COD_DEPTO': ['00', *deptos, *panel.cod_deptos],
+        'DEPARTAMENTO': ['COLOMBIA', *nombres_depto.reindex(deptos), *panel.departamentos],
+        'MUNICIPIO': [None] * (1 + len(deptos)) + list(panel.municipios),
+    })
+    fechas = pd.period_range(panel.fechas[-1].to_period('M') + 1, periods=horizonte, freq='M').end_time.normalize()
+    # El intervalo conserva el ancho del pronóstico base de cada serie, centrado en la media conciliada
+    resultado = etiquetas.loc[etiquetas.index.repeat(horizonte)].reset_index(drop=True)
+    resultado['ds'] = np.tile(fechas, len(etiquetas))
+    resultado['yhat_base'] = media.ravel()
+    resultado['yhat'] = conciliada.ravel()
+    resultado['yhat_lower'] = np.maximum(conciliada - motores.Z_80 * desvio, 0).ravel()
+    resultado['yhat_upper'] = np.maximum(conciliada + motores.Z_80 * desvio, 0).ravel()
+    return resultado
+
+
+def ruta_resultado(version, motor=MOTOR_DEFECTO, metodo='mint'):
+    clave = hashlib.sha1(f"{version}|{motor}|{metodo}".encode("utf-8")).hexdigest()[:12]
+    return JERARQUIA_DIR / f"{clave}.parquet"
+
+
+def guardar_resultado(resultado, version, motor=MOTOR_DEFECTO, metodo='mint'):
+    ruta = ruta_resultado(version, motor, metodo)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(".parquet.tmp")
+    resultado.to_parquet(tmp, index=False)
+    tmp.replace(ruta)
+    return ruta
+
+
+def cargar_resultado(version, motor=MOTOR_DEFECTO, metodo='mint'):
+    """Resultado precalculado para esta versión de datos (None si no existe)."""
+    ruta = ruta_resultado(version, motor, metodo)
+    return pd.read_parquet(ruta) if ruta.exists() else None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Pronóstico jerárquico conciliado de todos los niveles")
+    parser.add_argument("--motor", default=MOTOR_DEFECTO, choices=list(motores.MOTORES))
+    parser.add_argument("--metodo", default="mint", choices=METODOS)
+    args = parser.parse_args()
+
+    import datos # Capa de acceso a datos (snapshot o MySQL)
+    t0 = time.perf_counter()
+    panel = PanelMensual(datos.registros_mensuales())
+    resultado = pronostico_jerarquico(panel, args.motor, args.metodo)
+    ruta = guardar_resultado(resultado, datos.version_datos(), args.motor, args.metodo)
+    logging.info(f"Pronóstico jerárquico ({args.motor}, {args.metodo}) en {time.perf_counter() - t0:.1f}s -> {ruta}")
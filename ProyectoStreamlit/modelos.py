@@ -0,0 +1,116 @@
+"""Entrenamiento por lotes y almacén persistente de modelos Prophet.
+
+Uso (desde ProyectoStreamlit/):
+
+    python modelos.py --workers 4
+
+Entrena un modelo por cada municipio con datos suficientes y lo guarda en
+modelos_prophet/<versión de datos>/, de modo que la página del modelo solo
+tenga que cargarlo y predecir.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from panel import PanelMensual # Panel municipio × mes
+
+BASE_DIR = Path(__file__).resolve().parent
+MODELOS_DIR = BASE_DIR / "modelos_prophet"
+
+def entrenar_modelo(df_prophet):
+    """Entrena el modelo Prophet con la configuración de la página."""
+    from prophet import Prophet
+    model = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=False,
+        daily_seasonality=False
+    )
+    model.fit(df_prophet)
+    return model
+
+
+def directorio_version(version):
+    """Carpeta del almacén para una versión de datos (marca de agua del ETL)."""
+    return MODELOS_DIR / hashlib.sha1(str(version).encode("utf-8")).hexdigest()[:12]
+
+
+def ruta_modelo(version, cod_muni):
+    return directorio_version(version) / f"{cod_muni}.json"
+
+
+def guardar_modelo(model, version, cod_muni):
+    from prophet.serialize import model_to_json
+    ruta = ruta_modelo(version, cod_muni)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(".json.tmp")
+    tmp.write_text(model_to_json(model), encoding="utf-8")
+    tmp.replace(ruta)
+    return ruta
+
+
+def cargar_modelo(version, cod_muni):
+    """Carga un modelo preentrenado; devuelve None si no existe para esta versión."""
+    ruta = ruta_modelo(version, cod_muni)
+    if not ruta.exists():
+        return None
+    from prophet.serialize import model_from_json
+    return model_from_json(ruta.read_text(encoding="utf-8"))
+
+
+def _entrenar_y_guardar(version, cod_muni, df_prophet):
+    """Tarea de un proceso del pool: entrena y serializa un municipio."""
+    t0 = time.perf_counter()
+    guardar_modelo(entrenar_modelo(df_prophet), version, cod_muni)
+    return cod_muni, time.perf_counter() - t0
+
+
+def series_elegibles(panel):
+    """Series mensuales de los municipios que pasan el mínimo de 24 meses."""
+    return {cod: panel.serie_prophet(cod) for cod in panel.codigos_elegibles()}
+
+
+def entrenar_todos(panel, version, workers=None, reentrenar=False):
+    """Entrena en paralelo todos los municipios elegibles y los guarda en el almacén."""
+    series = series_elegibles(panel)
+    pendientes = {
+        cod: s for cod, s in series.items()
+        if reentrenar or not ruta_modelo(version, cod).exists()
+    }
+    logging.info(
+        f"{len(series)} municipios elegibles; {len(pendientes)} por entrenar "
+        f"(versión {version})"
+    )
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(_entrenar_y_guardar, version, cod, s) for cod, s in pendientes.items()]
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            cod_muni, segundos = futuro.result()
+            logging.info(f"[{i}/{len(futuros)}] Modelo {cod_muni} entrenado en {segundos:.1f}s")
+
+    manifest = {
+        "version": str(version),
+        "municipios": sorted(series),
+        "entrenado": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    directorio = directorio_version(version)
+    directorio.mkdir(parents=True, exist_ok=True)
+    (directorio / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logging.info(f"Entrenamiento completo en {time.perf_counter() - t0:.1f}s -> {directorio}")
+    return directorio
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Entrena los modelos Prophet de todos los municipios")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--reentrenar", action="store_true", help="Vuelve a entrenar aunque el modelo ya exista")
+    args = parser.parse_args()
+
+    import datos # Capa de acceso a datos (snapshot o MySQL)
+    panel = PanelMensual(datos.registros_mensuales())
+    entrenar_todos(panel, datos.version_datos(), args.workers, args.reentrenar)
@@ -0,0 +1,146 @@
+import numpy as np # Para ajustar todas las series a la vez
+import pandas as pd # Para manipular datos
+
+# =========================================================================
+# ⚡ MOTORES DE PRONÓSTICO VECTORIZADOS (TODOS LOS MUNICIPIOS A LA VEZ)
+# =========================================================================
+
+# Cada motor recibe la matriz del panel (municipios × meses) y el mes de inicio
+# de cada serie, y devuelve media e intervalos (municipios × horizonte) en una
+# sola pasada de NumPy, sin bucles por municipio.
+
+ESTACION = 12 # Estacionalidad mensual (12 meses)
+Z_80 = 1.2816 # Intervalo del 80%, igual que el que muestra Prophet
+VENTANA_MEDIA = 12 # Meses de la media móvil
+
+# Rejilla de parámetros del suavizado exponencial; se elige por serie el de menor error
+ALFAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5, 0.7])
+GAMMAS = np.array([0.0, 0.05, 0.1, 0.2])
+
+
+def _sigma(errores, validos):
+    """Desviación de los errores a un paso, solo sobre los meses válidos de cada serie."""
+    n = np.maximum(validos.sum(axis=1), 1)
+    return np.sqrt((np.where(validos, errores, 0.0) ** 2).sum(axis=1) / n)
+
+
+def _salida(media, desvio, errores, validos, residuos):
+    """Media y desvío; con residuos=True también los errores a un paso (cero fuera de la ventana válida)."""
+    if residuos:
+        return media, desvio, np.where(validos, errores, 0.0)
+    return media, desvio
+
+
+def ingenuo_estacional(Y, inicio, horizonte, residuos=False):
+    """Repite el valor del mismo mes del año anterior."""
+    T = Y.shape[1]
+    errores = np.zeros_like(Y)
+    errores[:, ESTACION:] = Y[:, ESTACION:] - Y[:, :-ESTACION]
+    validos = np.arange(T) >= (inicio[:, None] + ESTACION)
+    sigma = _sigma(errores, validos)
+
+    h = np.arange(1, horizonte + 1)
+    media = Y[:, T - ESTACION + (h - 1) % ESTACION]
+    escala = np.sqrt((h - 1) // ESTACION + 1)
+    return _salida(media, sigma[:, None] * escala, errores, validos, residuos)
+
+
+def media_movil(Y, inicio, horizonte, ventana=VENTANA_MEDIA, residuos=False):
+    """Promedio de los últimos `ventana` meses, constante en todo el horizonte."""
+    T = Y.shape[1]
+    acumulado = np.concatenate([np.zeros((Y.shape[0], 1)), np.cumsum(Y, axis=1)], axis=1)
+    medias = (acumulado[:, ventana:] - acumulado[:, :-ventana]) / ventana # media de [t-ventana, t)
+    errores = np.zeros_like(Y)
+    errores[:, ventana:] = Y[:, ventana:] - medias[:, :-1]
+    validos = np.arange(T) >= (inicio[:, None] + ventana)
+    sigma = _sigma(errores, validos)
+
+    media = np.repeat(medias[:, -1:], horizonte, axis=1)
+    escala = np.full(horizonte, np.sqrt(1 + 1 / ventana))
+    return _salida(media, sigma[:, None] * escala, errores, validos, residuos)
+
+
+def _ets(Y, inicio, alfas, gammas, estacional, residuos=False):
+    """Suavizado exponencial aditivo ETS(A,N,A) o ETS(A,N,N), vectorizado.
+
+    Las series se replican por cada combinación (alfa, gamma) de la rejilla y
+    se recorren los meses una sola vez; en cada paso solo se actualizan las
+    series que ya pasaron su año de inicialización.
+    """
+    n, T = Y.shape
+    alfa, gamma = (a.ravel() for a in np.meshgrid(alfas, gammas if estacional else [0.0], indexing='ij'))
+    P = len(alfa)
+    filas = np.arange(n)
+
+    # Estado inicial: nivel = media del primer año; estacionalidad = desvíos de ese año
+    primer_anio = Y[filas[:, None], inicio[:, None] + np.arange(ESTACION)]
+    nivel = np.repeat(primer_anio.mean(axis=1), P)
+    estac = np.zeros((n, ESTACION))
+    if estacional:
+        estac[filas[:, None], (inicio[:, None] + np.arange(ESTACION)) % ESTACION] = primer_anio - primer_anio.mean(axis=1, keepdims=True)
+    estac = np.repeat(estac, P, axis=0)
+
+    alfa, gamma = np.tile(alfa, n), np.tile(gamma, n)
+    desde = np.repeat(inicio + ESTACION, P)
+    sse = np.zeros(n * P)
+    cuenta = np.zeros(n * P)
+    errores = np.zeros((n * P, T)) if residuos else None
+    for t in range(int(desde.min()), T):
+        activo = t >= desde
+        m = t % ESTACION
+        error = np.where(activo, np.repeat(Y[:, t], P) - (nivel + estac[:, m]), 0.0)
+        sse += error ** 2
+        if residuos:
+            errores[:, t] = error
+        cuenta += activo
+        nivel += alfa * error
+        estac[:, m] += gamma * error
+
+    # Mejor combinación de la rejilla por serie
+    mejor = (sse / np.maximum(cuenta, 1)).reshape(n, P).argmin(axis=1)
+    sel = filas * P + mejor
+    sigma = np.sqrt(sse[sel] / np.maximum(cuenta[sel], 1))
+    return nivel[sel], estac[sel], alfa[sel], gamma[sel], sigma, (errores[sel] if residuos else None)
+
+
+def suavizado_exponencial(Y, inicio, horizonte, estacional=True, residuos=False):
+    """ETS aditivo con estacionalidad de 12 meses (o simple si estacional=False)."""
+    T = Y.shape[1]
+    nivel, estac, alfa, gamma, sigma, errores = _ets(Y, inicio, ALFAS, GAMMAS, estacional, residuos)
+    h = np.arange(1, horizonte + 1)
+    media = nivel[:, None] + estac[:, (T - 1 + h) % ESTACION]
+    # Varianza a h pasos de ETS(A,N,A): σ²[1 + α²(h−1) + γk(2α+γ)], k = ⌊(h−1)/m⌋
+    k = (h - 1) // ESTACION
+    varianza = 1 + alfa[:, None] ** 2 * (h - 1) + (gamma * (2 * alfa + gamma))[:, None] * k
+    desvio = sigma[:, None] * np.sqrt(varianza)
+    return (media, desvio, errores) if residuos else (media, desvio)
+
+
+MOTORES = {
+    'Ingenuo estacional': ingenuo_estacional,
+    'Media móvil (12 meses)': media_movil,
+    'Suavizado exponencial (ETS)': suavizado_exponencial,
+    'Suavizado exponencial simple': lambda Y, inicio, horizonte, residuos=False: suavizado_exponencial(Y, inicio, horizonte, False, residuos),
+}
+
+
+def pronosticar_panel(panel, motor, horizonte):
+    """Pronóstico de todos los municipios elegibles del panel con un motor vectorizado.
+
+    Devuelve un DataFrame largo con una fila por municipio y mes futuro.
+    """
+    filas = np.flatnonzero(panel.elegibles)
+    Y = panel.matriz[filas].astype(np.float64)
+    media, desvio = MOTORES[motor](Y, panel.inicio[filas], horizonte)
+
+    fechas = pd.period_range(panel.fechas[-1].to_period('M') + 1, periods=horizonte, freq='M').end_time.normalize()
+    n = len(filas)
+    return pd.DataFrame({
+        'COD_MUNI': np.repeat(panel.codigos[filas], horizonte),
+        'DEPARTAMENTO': np.repeat(panel.departamentos[filas], horizonte),
+        'MUNICIPIO': np.repeat(panel.municipios[filas], horizonte),
+        'ds': np.tile(fechas, n),
+        'yhat': np.maximum(media, 0).ravel(),
+        'yhat_lower': np.maximum(media - Z_80 * desvio, 0).ravel(),
+        'yhat_upper': np.maximum(media + Z_80 * desvio, 0).ravel(),
+    })
@@ -1,8 +1,9 @@
 import streamlit as st  # Para visualización de proyectos de ML
 import pandas as pd # Para manipular datos
 import plotly.express as px # Para graficar datos
-import json # Para crear el mapa
 import base64   # convierte datos binarios en una cadena de caracteres de texto ASCII para transmitirlos de forma segura a través de sistemas que solo admiten texto, como el correo electrónico o HTTP
+import datos # Capa de acceso al Data Lake (MySQL)
+from cubo import enrollar # Roll-ups del cubo de agregación
 
 # =========================================================================
 # 🚨 VERIFICACIÓN Y RECUPERACIÓN DE DATOS (CRÍTICO)
@@ -13,61 +14,56 @@ st.set_page_config(
     layout="wide"
 )
 
-if 'df_homicidios' not in st.session_state:
+if 'datos_listos' not in st.session_state:
     st.error("Error: Los datos no se han cargado. Por favor, vuelve a la página de Inicio para cargarlos.")
     st.stop()
 
-# Recuperar datos y GeoJSON de la sesión
-df_homicidios = st.session_state['df_homicidios']
-geojson = st.session_state['geojson_data']
-
 # --- Función y Variables auxiliares (DEFINIDAS DESPUÉS DE LA RECUPERACIÓN) ---
-@st.cache_data
-def convert_df_to_csv(df):
+# El guion bajo en _df le indica a Streamlit que no lo hashee: la llave del caché
+# es la tupla normalizada de filtros (más la versión de datos).
+@st.cache_data(max_entries=32)
+def convert_df_to_csv(_df, clave_filtros, version):
     """Convierte el DataFrame a un string CSV codificado para el botón de descarga."""
-    return df.to_csv(index=False).encode('utf-8')
+    return _df.to_csv(index=False).encode('utf-8')
 
 # =========================================================================
 # 💡 FILTROS (BARRA LATERAL)
 # =========================================================================
 
 st.sidebar.title("🔍 Opciones de Filtrado")
-min_year_total = int(df_homicidios['ANIO'].min())
-max_year_total = int(df_homicidios['ANIO'].max())
+min_year_total, max_year_total = datos.rango_anios()
 
 year_range = st.sidebar.slider('Selecciona Rango de Años', min_value=min_year_total, max_value=max_year_total, value=(min_year_total, max_year_total), step=1)
-lista_departamentos = sorted(df_homicidios['DEPARTAMENTO'].unique())
-
-selected_departamentos = st.sidebar.multiselect('1. Selecciona Departamento(s)', options=lista_departamentos, default=[])
+lista_departamentos = datos.listar_departamentos()
 
-# APLICACIÓN DE FILTROS INICIALES (AÑO Y DEPARTAMENTO)
-df_filtrado_base = df_homicidios[
-    (df_homicidios['ANIO'] >= year_range[0]) & (df_homicidios['ANIO'] <= year_range[1])
-]
-
-if selected_departamentos:
-    df_filtrado_base = df_filtrado_base[df_filtrado_base['DEPARTAMENTO'].isin(selected_departamentos)]
+# Las opciones son códigos DANE; el nombre solo se usa para mostrarlas
+selected_departamentos = st.sidebar.multiselect(
+    '1. Selecciona Departamento(s)', options=lista_departamentos, format_func=datos.nombre_departamento, default=[]
+)
 
 # Filtro de Municipios (DINÁMICO)
 st.sidebar.markdown("---")
 st.sidebar.subheader("Afinar por Municipio")
 
-lista_municipios = sorted(df_filtrado_base['MUNICIPIO'].unique())
+# Municipios disponibles para el año y los departamentos seleccionados
+lista_municipios = datos.listar_municipios(year_range, selected_departamentos)
 
 # El st.multiselect ya funciona como un buscador eficiente para listas grandes.
 # Lo mantenemos, pero con un default vacío para que el usuario filtre por nombre.
+# Las opciones son códigos DIVIPOLA: municipios homónimos de distintos departamentos no se mezclan
 selected_municipios = st.sidebar.multiselect(
     '2. Selecciona Municipio(s) (Busca por nombre)', 
     options=lista_municipios, 
+    format_func=datos.etiqueta_municipio,
     default=[], # Empezar vacío para que la selección de Departamento muestre el total
     key='multiselect_municipio' # Clave para evitar posibles conflictos de cache
 )
 
-# APLICACIÓN DEL FILTRO FINAL DE MUNICIPIO
-df_filtrado = df_filtrado_base.copy() 
-
-if selected_municipios:
-    df_filtrado = df_filtrado[df_filtrado['MUNICIPIO'].isin(selected_municipios)]
+# APLICACIÓN DE FILTROS: una sola agregación (cubo) por estado de filtros, memoizada.
+# Todos los KPIs, gráficos y tablas se enrollan desde este cubo pequeño, agrupado por
+# ids enteros de departamento y municipio; los nombres se agregan al final con datos.etiquetar.
+clave_filtros = datos.clave_filtros(year_range, selected_departamentos, selected_municipios)
+cubo = datos.cubo_homicidios(*clave_filtros)
 
 
 # =========================================================================
@@ -77,10 +73,10 @@ if selected_municipios:
 st.title("🚨 Análisis de Homicidios en Colombia")
 st.markdown(f"**Periodo de Análisis (Seleccionado en el Slider):** Desde **{year_range[0]}** hasta **{year_range[1]}**")
 
-# --- CÁLCULO DE MÉTRICAS CLAVE A PARTIR DE df_filtrado ---
-total_homicidios = df_filtrado['CANTIDAD'].sum()
-min_anio_f = int(df_filtrado['ANIO'].min())
-max_anio_f = int(df_filtrado['ANIO'].max())
+# --- CÁLCULO DE MÉTRICAS CLAVE A PARTIR DEL CUBO ---
+total_homicidios = int(cubo['CANTIDAD'].sum())
+min_anio_f = int(cubo['ANIO'].min())
+max_anio_f = int(cubo['ANIO'].max())
 
 col1, col2, col3 = st.columns(3)
 
@@ -91,7 +87,8 @@ with col2:
     st.metric(label="Rango de Años con Datos", value=f"{min_anio_f} - {max_anio_f}")
 
 # Calcular el departamento con más homicidios DENTRO DE LOS DATOS FILTRADOS
-top_depto_data = df_filtrado.groupby('DEPARTAMENTO')['CANTIDAD'].sum().nlargest(1)
+df_por_depto = datos.etiquetar(enrollar(cubo, ['ID_DEPTO']))
+top_depto_data = df_por_depto.set_index('DEPARTAMENTO')['CANTIDAD'].nlargest(1)
 if not top_depto_data.empty:
     top_depto = top_depto_data.index[0]
     top_depto_cant = top_depto_data.values[0]
@@ -112,29 +109,46 @@ st.divider()
 # 🌎 MAPA COROPLÉTICO 
 # =========================================================================
 
-if geojson is not None:
-    st.header("🌎 Mapa de Homicidios por Departamento")
-    df_mapa = df_filtrado.groupby('DEPARTAMENTO')['CANTIDAD'].sum().reset_index()
+# Capas simplificadas (python geometria.py), compartidas entre sesiones y enlazadas por código DANE
+capas_mapa = {'Departamento': datos.geojson('departamento')}
+if datos.geojson('municipio') is not None:
+    capas_mapa['Municipio'] = datos.geojson('municipio')
+nivel_mapa = st.radio("Nivel del mapa", options=list(capas_mapa), horizontal=True) if len(capas_mapa) > 1 else 'Departamento'
+
+# La figura se memoiza por filtros, versión y nivel: volver a un filtro no la reconstruye.
+@st.cache_data(max_entries=32)
+def build_map_figure(_df_mapa, clave_filtros, version, nivel):
+    """Construye el mapa coroplético enlazando por código DANE (featureidkey='id')."""
+    codigo, nombre = ('COD_DEPTO', 'DEPARTAMENTO') if nivel == 'Departamento' else ('COD_MUNI', 'MUNICIPIO')
+    fig = px.choropleth(
+        _df_mapa,
+        geojson=capas_mapa[nivel],
+        locations=codigo,
+        featureidkey='id',
+        color='HOMICIDIOS_TOTAL',
+        color_continuous_scale="Reds",
+        center={"lat": 4.5, "lon": -74.0},
+        title=f'Homicidios Acumulados por {nivel}',
+        hover_name=nombre
+    )
+    fig.update_geos(lataxis_range=[0, 14], lonaxis_range=[-80, -66], visible=False)
+    fig.update_layout(margin={"r":0,"t":50,"l":0,"b":0})
+    return fig
+
+if capas_mapa['Departamento'] is not None:
+    st.header(f"🌎 Mapa de Homicidios por {nivel_mapa}")
+    if nivel_mapa == 'Departamento':
+        df_mapa = datos.etiquetar(enrollar(cubo, ['ID_DEPTO']))
+        df_mapa['COD_DEPTO'] = df_mapa['COD_DEPTO'].astype(str).str.zfill(2)
+    else:
+        df_mapa = datos.etiquetar(enrollar(cubo, ['ID_MUNI']))
+        df_mapa['COD_MUNI'] = df_mapa['COD_MUNI'].astype(str).str.zfill(5)
     df_mapa.rename(columns={'CANTIDAD': 'HOMICIDIOS_TOTAL'}, inplace=True)
-    
+
     try:
-        fig_mapa = px.choropleth(
-            df_mapa,
-            geojson=geojson,
-            locations='DEPARTAMENTO', 
-            featureidkey='properties.NOMBRE_DPT', 
-            color='HOMICIDIOS_TOTAL', 
-            color_continuous_scale="Reds", 
-            center={"lat": 4.5, "lon": -74.0},
-            title='Homicidios Acumulados por Departamento',
-            hover_name='DEPARTAMENTO'
-        )
-        
-        fig_mapa.update_geos(lataxis_range=[0, 14], lonaxis_range=[-80, -66], visible=False)
-        fig_mapa.update_layout(margin={"r":0,"t":50,"l":0,"b":0}) 
-        
+        fig_mapa = build_map_figure(df_mapa, clave_filtros, datos.version_datos(), nivel_mapa)
         st.plotly_chart(fig_mapa, use_container_width=True)
-    
+
     except ValueError as e:
         st.error(f"Error al generar el mapa. Problema: {e}")
 
@@ -149,7 +163,7 @@ tab1, tab2 = st.tabs(["Tendencia y Distribución", "Ranking Top/Bottom 10"])
 with tab1:
     # Gráfico de Tendencia
     st.subheader("Tendencia de Homicidios (Datos Filtrados)")
-    df_tendencia = df_filtrado.groupby('ANIO')['CANTIDAD'].sum().reset_index()
+    df_tendencia = enrollar(cubo, ['ANIO'])
     fig_tendencia = px.line(df_tendencia, x='ANIO', y='CANTIDAD', title='Total de Homicidios por Año', labels={'ANIO': 'Año', 'CANTIDAD': 'Cantidad de Homicidios'}, markers=True)
     st.plotly_chart(fig_tendencia, use_container_width=True)
 
@@ -160,22 +174,23 @@ with tab1:
 
     with col4:
         st.subheader("Distribución por Sexo")
-        df_sexo = df_filtrado.groupby('SEXO')['CANTIDAD'].sum().reset_index()
+        df_sexo = enrollar(cubo, ['SEXO'])
         fig_sexo = px.pie(df_sexo, values='CANTIDAD', names='SEXO', title='Proporción por Sexo', hole=0.3)
         st.plotly_chart(fig_sexo, use_container_width=True)
 
     with col5:
         st.subheader("Distribución por Zona")
-        df_zona = df_filtrado.groupby('ZONA')['CANTIDAD'].sum().reset_index()
+        df_zona = enrollar(cubo, ['ZONA'])
         fig_zona = px.bar(df_zona, x='ZONA', y='CANTIDAD', title='Casos por Zona (Urbana vs. Rural)', color='ZONA')
         st.plotly_chart(fig_zona, use_container_width=True)
 
 with tab2:
     st.header("Ranking de Municipios Más y Menos Afectados")
     
-    # Agrupación por Municipio
-    df_ranking = df_filtrado.groupby('MUNICIPIO')['CANTIDAD'].sum().reset_index()
+    # Agrupación por id de Municipio (los homónimos de distintos departamentos quedan separados)
+    df_ranking = datos.etiquetar(enrollar(cubo, ['ID_MUNI']))
     df_ranking.rename(columns={'CANTIDAD': 'HOMICIDIOS_TOTAL'}, inplace=True)
+    df_ranking['MUNICIPIO'] = df_ranking['ETIQUETA']
 
     col6, col7 = st.columns(2)
 
@@ -222,7 +237,8 @@ st.divider()
 st.header("🔍 Desglose de Datos Filtrados por Detalle")
 
 # 1. Crear el DataFrame de desglose
-df_desglose = df_filtrado.groupby(['DEPARTAMENTO', 'MUNICIPIO', 'SEXO', 'ZONA'])['CANTIDAD'].sum().reset_index()
+df_desglose = datos.etiquetar(enrollar(cubo, ['ID_DEPTO', 'ID_MUNI', 'SEXO', 'ZONA']))
+df_desglose = df_desglose[['DEPARTAMENTO', 'MUNICIPIO', 'SEXO', 'ZONA', 'CANTIDAD']]
 df_desglose.rename(columns={'CANTIDAD': 'HOMICIDIOS_TOTAL'}, inplace=True)
 df_desglose.sort_values(by='HOMICIDIOS_TOTAL', ascending=False, inplace=True)
 
@@ -230,10 +246,10 @@ df_desglose.sort_values(by='HOMICIDIOS_TOTAL', ascending=False, inplace=True)
 st.dataframe(df_desglose, use_container_width=True)
 
 # 3. Preparar y Mostrar el Botón de Descarga
-csv_data = convert_df_to_csv(df_desglose)
+csv_data = convert_df_to_csv(df_desglose, clave_filtros, datos.version_datos())
 
-min_anio_f_file = int(df_filtrado['ANIO'].min())
-max_anio_f_file = int(df_filtrado['ANIO'].max())
+min_anio_f_file = min_anio_f
+max_anio_f_file = max_anio_f
 
 st.download_button(
     label="Descargar Desglose Filtrado (CSV)",
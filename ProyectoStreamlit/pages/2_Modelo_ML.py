@@ -1,9 +1,16 @@
+import os # Para leer el presupuesto de memoria de la caché
 import streamlit as st  # Para visualización de proyectos de ML
 import pandas as pd # Para manipular datos
 import plotly.express as px # Para graficar datos
-from prophet import Prophet # Para realizar pronósticos de series temporales
 from prophet.plot import plot_plotly # Para método de visualización dentro de la biblioteca de pronósticos Prophet
 import matplotlib.pyplot as plt # Importar matplotlib para plot_components
+import datos # Capa de acceso al Data Lake (MySQL)
+import modelos # Almacén de modelos Prophet preentrenados
+from panel import PanelMensual # Panel municipio × mes precalculado
+import backtest # Métricas precalculadas del backtesting
+import jerarquia # Pronóstico conciliado municipio → departamento → nacional
+import motores # Motores de pronóstico vectorizados (NumPy)
+from pronosticos import CachePronosticos, HORIZONTE_MAX, calcular_pronostico, recortar # Caché de pronósticos
 
 # =========================================================================
 # 🚨 VERIFICACIÓN Y RECUPERACIÓN DE DATOS
@@ -14,66 +21,57 @@ st.set_page_config(
     layout="wide"
 )
 
-if 'df_homicidios' not in st.session_state:
+if 'datos_listos' not in st.session_state:
     st.error("Error: Los datos no se han cargado. Vuelve a la página de Inicio.")
     st.stop()
 
-df_homicidios = st.session_state['df_homicidios']
-
 # =========================================================================
 # 💡 FILTROS DE ML (BARRA LATERAL)
 # =========================================================================
 
 st.sidebar.title("🛠️ Opciones del Modelo")
 
-lista_departamentos = sorted(df_homicidios['DEPARTAMENTO'].unique())
-selected_depto = st.sidebar.selectbox('1. Selecciona Departamento', options=lista_departamentos, index=0)
+lista_departamentos = datos.listar_departamentos()
+selected_depto = st.sidebar.selectbox(
+    '1. Selecciona Departamento', options=lista_departamentos, format_func=datos.nombre_departamento, index=0
+)
 
-# Filtrar municipios basado en el departamento seleccionado
-df_municipios = df_homicidios[df_homicidios['DEPARTAMENTO'] == selected_depto]
-lista_municipios = sorted(df_municipios['MUNICIPIO'].unique())
-selected_municipio = st.sidebar.selectbox('2. Selecciona Municipio para Predicción', options=lista_municipios)
+# Filtrar municipios basado en el departamento seleccionado; las opciones son códigos DIVIPOLA
+lista_municipios = datos.listar_municipios(departamentos=[selected_depto])
+cod_muni = st.sidebar.selectbox(
+    '2. Selecciona Municipio para Predicción', options=lista_municipios, format_func=datos.etiqueta_municipio
+)
+selected_municipio = datos.etiqueta_municipio(cod_muni)
 
 prediction_months = st.sidebar.slider(
     '3. Meses a predecir:',
     min_value=3, 
-    max_value=24, 
+    max_value=HORIZONTE_MAX, 
     value=12, 
     step=1
 )
 
-st.title(f"🔮 Modelo Predictivo: {selected_municipio}, {selected_depto}")
+# Prophet ajusta una serie a la vez; los motores vectorizados pronostican todos
+# los municipios en una sola pasada de NumPy.
+motor = st.sidebar.selectbox('4. Motor de pronóstico', options=['Prophet', *motores.MOTORES])
+
+st.title(f"🔮 Modelo Predictivo: {selected_municipio}")
 st.markdown("---")
 
 # =========================================================================
-# 1. PREPARACIÓN DE DATOS PARA PROPHET (FUNCIÓN AGREGADORA)
+# 1. PREPARACIÓN DE DATOS PARA PROPHET (PANEL PRECALCULADO)
 # =========================================================================
 
-@st.cache_data
-def prepare_prophet_data(df, municipio):
-    """Filtra y agrega los datos por mes para un municipio específico."""
-    
-    # 1. Filtrar por municipio
-    df_filtrado = df[df['MUNICIPIO'] == municipio].copy()
-
-    # 2. Agregar por mes
-    df_filtrado['FECHA HECHO'] = pd.to_datetime(df_filtrado['FECHA HECHO'])
-    df_series = df_filtrado.groupby(pd.Grouper(key='FECHA HECHO', freq='M'))['CANTIDAD'].sum().reset_index()
-    
-    # 3. Preparar formato Prophet
-    df_prophet = pd.DataFrame()
-    df_prophet['ds'] = df_series['FECHA HECHO']
-    df_prophet['y'] = df_series['CANTIDAD']
-    
-    # Asegurarse de que no haya meses vacíos (Prophet maneja esto mejor)
-    df_prophet = df_prophet.dropna()
-    
-    if df_prophet.empty or len(df_prophet) < 24: # Se necesitan datos suficientes para estacionalidad
-        return pd.DataFrame(), False
-    
-    return df_prophet, True
-
-df_prophet, is_data_valid = prepare_prophet_data(df_homicidios, selected_municipio)
+# El panel municipio × mes se construye una sola vez por versión de datos;
+# cada selección es solo una búsqueda de fila en la matriz.
+@st.cache_resource(max_entries=1)
+def load_panel(version):
+    """Panel mensual de todos los municipios (ceros explícitos en meses sin casos)."""
+    return PanelMensual(datos.registros_mensuales())
+
+panel = load_panel(datos.version_datos())
+is_data_valid = panel.es_elegible(cod_muni)
+df_prophet = panel.serie_prophet(cod_muni) if is_data_valid else None
 
 if not is_data_valid:
     st.warning(f"No hay suficientes datos históricos (mínimo 2 años) o el municipio '{selected_municipio}' tiene pocos registros para entrenar el modelo Prophet.")
@@ -85,6 +83,114 @@ st.caption(f"Datos históricos mensuales utilizados para entrenar el modelo en {
 st.dataframe(df_prophet.tail(), use_container_width=True)
 
 
+# =========================================================================
+# 2. PREDICCIÓN CON MOTORES VECTORIZADOS (TODOS LOS MUNICIPIOS)
+# =========================================================================
+
+@st.cache_data(max_entries=8)
+def pronostico_nacional(version, motor):
+    """Pronóstico al horizonte máximo de todos los municipios elegibles."""
+    return motores.pronosticar_panel(load_panel(version), motor, HORIZONTE_MAX)
+
+# Las métricas salen del backtest por lotes (python backtest.py); aquí solo se leen.
+@st.cache_data(max_entries=2)
+def load_backtest(version):
+    return backtest.leer_metricas(version)
+
+def mostrar_backtest(titulo):
+    """Tablas de precisión histórica (MAE/MAPE/cobertura) del backtest con origen móvil."""
+    st.header(titulo)
+    metricas = load_backtest(datos.version_datos())
+    if metricas is None:
+        st.info("No hay resultados de backtesting para esta versión de datos. Ejecuta `python backtest.py` para calcularlos.")
+        return
+    por_modelo, por_municipio, _ = metricas
+    columnas = ['modelo', 'MAE', 'MAPE', 'Cobertura', 'Pronosticos']
+    st.caption(f"Errores de pronósticos a {backtest.HORIZONTE} meses en {backtest.ORIGENES} orígenes móviles; cobertura del intervalo del 80%.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Todos los municipios")
+        st.dataframe(por_modelo[columnas].round(2), use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader(selected_municipio)
+        st.dataframe(por_municipio.loc[por_municipio['COD_MUNI'] == cod_muni, columnas].round(2), use_container_width=True, hide_index=True)
+
+# Vistas departamental y nacional: salen de una sola corrida conciliada por
+# versión de datos (python jerarquia.py); si no existe se calcula una vez aquí.
+@st.cache_data(max_entries=2)
+def load_jerarquia(version):
+    resultado = jerarquia.cargar_resultado(version)
+    if resultado is None:
+        resultado = jerarquia.pronostico_jerarquico(load_panel(version))
+        jerarquia.guardar_resultado(resultado, version)
+    return resultado
+
+def mostrar_jerarquia(titulo):
+    """Pronóstico conciliado: los municipios suman a su departamento y estos al total nacional."""
+    st.header(titulo)
+    df_jer = load_jerarquia(datos.version_datos())
+    df_jer = df_jer[df_jer['ds'] <= df_jer['ds'].min() + pd.offsets.MonthEnd(prediction_months - 1)]
+    st.caption(f"Motor {jerarquia.MOTOR_DEFECTO} conciliado con MinT (covarianza encogida) sobre la jerarquía DIVIPOLA.")
+
+    df_nacional = df_jer[df_jer['nivel'] == 'Nacional']
+    df_deptos = df_jer[df_jer['nivel'] == 'Departamento']
+    df_depto_sel = df_deptos[df_deptos['COD_DEPTO'] == selected_depto]
+
+    col1, col2 = st.columns(2)
+    col1.metric("Total Nacional Conciliado", f"{df_nacional['yhat'].sum():,.0f}")
+    col2.metric(f"Total Conciliado en {datos.nombre_departamento(selected_depto)}", f"{df_depto_sel['yhat'].sum():,.0f}")
+
+    fig_jer = px.line(
+        pd.concat([df_nacional, df_depto_sel]), x='ds', y='yhat', color='DEPARTAMENTO',
+        labels={'ds': 'Fecha', 'yhat': 'Homicidios Pronosticados', 'DEPARTAMENTO': 'Nivel'},
+        title='Pronóstico Mensual Conciliado: Nacional y Departamento'
+    )
+    st.plotly_chart(fig_jer, use_container_width=True)
+
+    df_tabla_deptos = (
+        df_deptos.groupby('DEPARTAMENTO')[['yhat', 'yhat_base']].sum()
+        .round(1).sort_values('yhat', ascending=False).reset_index()
+    )
+    df_tabla_deptos.columns = ['Departamento', 'Pronóstico Conciliado', 'Pronóstico Base']
+    st.dataframe(df_tabla_deptos, use_container_width=True, hide_index=True)
+
+if motor != 'Prophet':
+    st.header("2. Predicción a Futuro")
+    st.info(f"Motor **{motor}**: predicción de los próximos **{prediction_months}** meses para todos los municipios.")
+
+    df_nacional = pronostico_nacional(datos.version_datos(), motor)
+    df_nacional = df_nacional[df_nacional['ds'] <= df_nacional['ds'].min() + pd.offsets.MonthEnd(prediction_months - 1)]
+    df_muni = df_nacional[df_nacional['COD_MUNI'] == cod_muni]
+
+    st.header("3. Gráfico de Predicción")
+    fig_motor = px.line(df_prophet, x='ds', y='y', labels={'ds': 'Fecha', 'y': 'Homicidios Totales'})
+    fig_motor.add_scatter(x=df_muni['ds'], y=df_muni['yhat_upper'], mode='lines', line=dict(width=0), showlegend=False)
+    fig_motor.add_scatter(x=df_muni['ds'], y=df_muni['yhat_lower'], mode='lines', line=dict(width=0),
+                          fill='tonexty', name='Intervalo 80%')
+    fig_motor.add_scatter(x=df_muni['ds'], y=df_muni['yhat'], mode='lines', name='Predicción')
+    fig_motor.update_layout(title=f'Predicción de Homicidios Totales en {selected_municipio} ({motor})')
+    st.plotly_chart(fig_motor, use_container_width=True)
+
+    st.subheader("Desglose de la Predicción (Próximos Meses)")
+    df_detalle = df_muni[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
+    df_detalle.columns = ['Fecha', 'Predicción (Media)', 'Intervalo Bajo (80%)', 'Intervalo Alto (80%)']
+    df_detalle['Fecha'] = df_detalle['Fecha'].dt.strftime('%Y-%m')
+    st.dataframe(df_detalle.reset_index(drop=True), use_container_width=True)
+
+    st.header("4. Pronóstico Nacional por Municipio")
+    df_tabla = (
+        df_nacional.groupby(['DEPARTAMENTO', 'MUNICIPIO'], sort=False)['yhat'].sum()
+        .round(1).sort_values(ascending=False).reset_index()
+    )
+    df_tabla.columns = ['Departamento', 'Municipio', f'Homicidios Pronosticados ({prediction_months} meses)']
+    st.metric("Total Nacional Pronosticado", f"{df_tabla.iloc[:, 2].sum():,.0f}")
+    st.dataframe(df_tabla, use_container_width=True)
+
+    mostrar_backtest("5. Precisión Histórica (Backtesting)")
+    mostrar_jerarquia("6. Pronóstico Jerárquico Conciliado")
+    st.stop()
+
+
 # =========================================================================
 # 2. ENTRENAMIENTO DEL MODELO Y PREDICCIÓN (PROPHET)
 # =========================================================================
@@ -93,27 +199,36 @@ st.header("2. Predicción a Futuro")
 st.info(f"El modelo predecirá los homicidios para los próximos **{prediction_months}** meses en {selected_municipio}.")
 
 
-# Usar st.cache_resource para almacenar el modelo entrenado
-# La clave incluye el municipio para reentrenar solo si el municipio cambia
-@st.cache_resource
-def train_prophet_model(df, municipio):
-    """Entrena el modelo Prophet y realiza la predicción."""
-    # Inicializar y ajustar el modelo
-    model = Prophet(
-        yearly_seasonality=True, 
-        weekly_seasonality=False, 
-        daily_seasonality=False
-    )
-    model.fit(df)
-    return model
+# Los modelos se entrenan por lotes (python modelos.py) y se leen del almacén en disco,
+# ligado a la versión de datos. Solo si falta el modelo se entrena en línea.
+@st.cache_resource(max_entries=16)
+def load_prophet_model(version, cod_muni):
+    """Carga el modelo preentrenado del almacén (None si no existe)."""
+    return modelos.cargar_modelo(version, cod_muni)
+
+@st.cache_resource(max_entries=16)
+def train_prophet_model(_df, cod_muni, version):
+    """Entrena el modelo Prophet (solo cuando no hay modelo preentrenado)."""
+    return modelos.entrenar_modelo(_df)
 
-with st.spinner(f"Entrenando Modelo Prophet para {selected_municipio}..."):
-    # Pasamos el nombre del municipio como argumento para el cache
-    m = train_prophet_model(df_prophet, selected_municipio)
+m = load_prophet_model(datos.version_datos(), cod_muni)
+if m is None:
+    st.warning("No hay un modelo preentrenado para esta versión de datos. Ejecuta `python modelos.py` para entrenarlos por lotes.")
+    with st.spinner(f"Entrenando Modelo Prophet para {selected_municipio}..."):
+        # Pasamos el código del municipio como argumento para el cache
+        m = train_prophet_model(df_prophet, cod_muni, datos.version_datos())
 
-# Definir cuántos periodos futuros queremos predecir
-future = m.make_future_dataframe(periods=prediction_months, freq='M')
-forecast = m.predict(future)
+# El pronóstico se calcula una sola vez al horizonte máximo (24 meses) y se
+# recorta según el slider; la caché es LRU acotada por memoria y se vacía
+# cuando cambia la versión de datos del ETL.
+@st.cache_resource
+def forecast_cache():
+    return CachePronosticos(int(os.getenv("PRONOSTICOS_CACHE_MB", "256")) * 1024 ** 2)
+
+forecast_max = forecast_cache().obtener(
+    datos.version_datos(), cod_muni, lambda: calcular_pronostico(m, HORIZONTE_MAX)
+)
+forecast = recortar(forecast_max, len(m.history), prediction_months)
 
 # =========================================================================
 # 3. VISUALIZACIÓN DE RESULTADOS
@@ -147,4 +262,7 @@ st.header("4. Componentes del Modelo")
 # Generar el gráfico de componentes de Prophet
 # Nota: Usamos una figura de Matplotlib (fig2) para esto.
 fig_components = m.plot_components(forecast)
-st.pyplot(fig_components)
\ No newline at end of file
+st.pyplot(fig_components)
+
+mostrar_backtest("5. Precisión Histórica (Backtesting)")
+mostrar_jerarquia("6. Pronóstico Jerárquico Conciliado")
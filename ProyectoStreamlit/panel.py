@@ -0,0 +1,72 @@
+import numpy as np # Para la matriz densa municipio × mes
+import pandas as pd # Para manipular datos
+
+# =========================================================================
+# 🧮 PANEL MENSUAL MUNICIPIO × MES
+# =========================================================================
+
+MIN_MESES = 24 # Se necesitan datos suficientes para estacionalidad
+
+
+class PanelMensual:
+    """Matriz densa de homicidios por municipio (filas) y mes (columnas).
+
+    Se construye una sola vez por versión de datos a partir de registros con
+    COD_MUNI, MUNICIPIO, DEPARTAMENTO, FECHA HECHO y CANTIDAD, y opcionalmente
+    COD_DEPTO (sirven tanto las filas crudas como los agregados mensuales). Los
+    meses sin casos quedan como ceros explícitos y cada serie es una vista de
+    una fila de la matriz.
+    """
+
+    def __init__(self, df):
+        meses = df['FECHA HECHO'].dt.year.to_numpy() * 12 + df['FECHA HECHO'].dt.month.to_numpy() - 1
+        mes_ini, mes_fin = int(meses.min()), int(meses.max())
+        self.n_meses = mes_fin - mes_ini + 1
+
+        filas, codigos = pd.factorize(df['COD_MUNI'].astype(str), sort=True)
+        self.codigos = np.asarray(codigos)
+        self.posicion = {cod: i for i, cod in enumerate(self.codigos)}
+
+        conteos = np.bincount(
+            filas * self.n_meses + (meses - mes_ini),
+            weights=df['CANTIDAD'].to_numpy(dtype=np.float64),
+            minlength=len(self.codigos) * self.n_meses,
+        )
+        self.matriz = conteos.reshape(len(self.codigos), self.n_meses).astype(np.int32)
+
+        # Fechas de cierre de mes, igual que el Grouper(freq='M') anterior
+        self.fechas = pd.period_range(
+            pd.Period(year=mes_ini // 12, month=mes_ini % 12 + 1, freq='M'),
+            periods=self.n_meses, freq='M'
+        ).end_time.normalize()
+
+        primeros = df.assign(_fila=filas).drop_duplicates('_fila').set_index('_fila').sort_index()
+        self.municipios = primeros['MUNICIPIO'].astype(str).to_numpy()
+        self.departamentos = primeros['DEPARTAMENTO'].astype(str).to_numpy()
+        # Código DIVIPOLA del departamento: columna COD_DEPTO o los dos primeros dígitos del municipio
+        if 'COD_DEPTO' in primeros:
+            self.cod_deptos = primeros['COD_DEPTO'].astype(str).str.zfill(2).to_numpy()
+        else:
+            self.cod_deptos = pd.Series(self.codigos).str.zfill(5).str[:2].to_numpy()
+
+        # Elegibilidad vectorizada: meses desde el primer caso hasta el final del panel
+        con_datos = self.matriz > 0
+        self.inicio = np.where(con_datos.any(axis=1), con_datos.argmax(axis=1), self.n_meses)
+        self.elegibles = (self.n_meses - self.inicio) >= MIN_MESES
+
+    def es_elegible(self, cod_muni):
+        i = self.posicion.get(cod_muni)
+        return i is not None and bool(self.elegibles[i])
+
+    def serie(self, cod_muni):
+        """Vista (sin copia) de la serie mensual desde el primer mes con casos."""
+        i = self.posicion[cod_muni]
+        return self.matriz[i, self.inicio[i]:]
+
+    def serie_prophet(self, cod_muni):
+        """Serie en el formato ds/y que espera Prophet (incluye meses en cero)."""
+        i = self.posicion[cod_muni]
+        return pd.DataFrame({'ds': self.fechas[self.inicio[i]:], 'y': self.serie(cod_muni)})
+
+    def codigos_elegibles(self):
+        return self.codigos[self.elegibles]
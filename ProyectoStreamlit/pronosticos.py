@@ -0,0 +1,67 @@
+import threading # Para proteger la caché entre sesiones de Streamlit
+from collections import OrderedDict # Para el orden LRU
+
+# =========================================================================
+# 📦 CACHÉ DE PRONÓSTICOS (LRU ACOTADA POR MEMORIA)
+# =========================================================================
+
+HORIZONTE_MAX = 24 # Igual al máximo del slider "Meses a predecir"
+
+
+def calcular_pronostico(model, horizonte=HORIZONTE_MAX):
+    """Predice una sola vez al horizonte máximo (incluye las columnas de componentes)."""
+    future = model.make_future_dataframe(periods=horizonte, freq='M')
+    return model.predict(future)
+
+
+def recortar(forecast, n_historia, meses):
+    """Pronóstico hasta `meses` después del último dato observado (vista, sin copia)."""
+    return forecast.iloc[:n_historia + meses]
+
+
+class CachePronosticos:
+    """Pronósticos por (versión de datos, municipio) con expulsión LRU por memoria.
+
+    Cada entrada guarda el pronóstico calculado al horizonte máximo; los
+    horizontes más cortos se sirven recortándolo. Al cambiar la versión de
+    datos (marca de agua del ETL) se descartan todas las entradas anteriores.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _invalidar(self, version):
+        if version != self.version:
+            self._entradas.clear()
+            self.bytes = 0
+            self.version = version
+
+    def obtener(self, version, cod_muni, calcular):
+        """Devuelve el pronóstico guardado o lo calcula con `calcular()` y lo guarda."""
+        with self._lock:
+            self._invalidar(version)
+            entrada = self._entradas.get(cod_muni)
+            if entrada is not None:
+                self._entradas.move_to_end(cod_muni)
+                return entrada[0]
+
+        # Se calcula fuera del candado para no bloquear a las demás sesiones
+        forecast = calcular()
+        tamano = int(forecast.memory_usage(deep=True).sum())
+
+        with self._lock:
+            # Si otra sesión ya cambió de versión, este resultado no se guarda
+            if version == self.version and cod_muni not in self._entradas and tamano <= self.max_bytes:
+                self._entradas[cod_muni] = (forecast, tamano)
+                self.bytes += tamano
+                while self.bytes > self.max_bytes:
+                    _, (_, liberado) = self._entradas.popitem(last=False)
+                    self.bytes -= liberado
+        return forecast
+
+    def __len__(self):
+        return len(self._entradas)
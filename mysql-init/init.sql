@@ -23,21 +23,67 @@ GRANT SELECT ON homicidios_db.* TO 'analista2'@'%';
 FLUSH PRIVILEGES;
 
 -- CREATE DTABASE  (Data Lake)
+-- Particionada por año de fecha_hecho: toda llave única debe incluir fecha_hecho.
+-- Las bases creadas antes se actualizan en sitio con DL_ETL/migrations.py, que
+-- también agrega las particiones de los años siguientes.
 CREATE TABLE IF NOT EXISTS raw_homicidios (
-  id_hecho BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  id_hecho BIGINT NOT NULL AUTO_INCREMENT,
   fecha_hecho DATE NOT NULL,
   cod_depto VARCHAR(6) NOT NULL,
   departamento VARCHAR(200),
   cod_muni VARCHAR(8) NOT NULL,
   municipio VARCHAR(200),
-  zona VARCHAR(20),
-  sexo VARCHAR(20),
+  -- Parte de uq_raw_uniq: los faltantes se cargan como 'Sin Dato' (dos NULL nunca chocan)
+  zona VARCHAR(20) NOT NULL DEFAULT 'Sin Dato',
+  sexo VARCHAR(20) NOT NULL DEFAULT 'Sin Dato',
   cantidad INT NOT NULL,
   fuente VARCHAR(200),
   fecha_ingreso TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-  UNIQUE KEY uq_raw_uniq (fecha_hecho, cod_depto, cod_muni, zona, sexo, fuente)
+  PRIMARY KEY (id_hecho, fecha_hecho),
+  UNIQUE KEY uq_raw_uniq (fecha_hecho, cod_depto, cod_muni, zona, sexo, fuente),
+  -- Índices cubrientes para consultas por departamento o municipio en un rango de fechas
+  INDEX idx_raw_depto_fecha (cod_depto, fecha_hecho, cantidad),
+  INDEX idx_raw_muni_fecha (cod_muni, fecha_hecho, cantidad)
+) ENGINE=InnoDB
+PARTITION BY RANGE (YEAR(fecha_hecho)) (
+  PARTITION pantes VALUES LESS THAN (2010),
+  PARTITION p2010 VALUES LESS THAN (2011),
+  PARTITION p2011 VALUES LESS THAN (2012),
+  PARTITION p2012 VALUES LESS THAN (2013),
+  PARTITION p2013 VALUES LESS THAN (2014),
+  PARTITION p2014 VALUES LESS THAN (2015),
+  PARTITION p2015 VALUES LESS THAN (2016),
+  PARTITION p2016 VALUES LESS THAN (2017),
+  PARTITION p2017 VALUES LESS THAN (2018),
+  PARTITION p2018 VALUES LESS THAN (2019),
+  PARTITION p2019 VALUES LESS THAN (2020),
+  PARTITION p2020 VALUES LESS THAN (2021),
+  PARTITION p2021 VALUES LESS THAN (2022),
+  PARTITION p2022 VALUES LESS THAN (2023),
+  PARTITION p2023 VALUES LESS THAN (2024),
+  PARTITION p2024 VALUES LESS THAN (2025),
+  PARTITION p2025 VALUES LESS THAN (2026),
+  PARTITION p2026 VALUES LESS THAN (2027),
+  PARTITION p2027 VALUES LESS THAN (2028),
+  PARTITION pfuturo VALUES LESS THAN MAXVALUE
+);
+
+-- Migraciones de esquema (DL_ETL/migrations.py); esta base ya nace con todas aplicadas
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INT NOT NULL PRIMARY KEY,
+  nombre VARCHAR(100) NOT NULL,
+  aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  segundos DOUBLE NULL
 ) ENGINE=InnoDB;
 
+INSERT IGNORE INTO schema_migrations (version, nombre) VALUES
+  (1, 'indices_cubrientes_raw'),
+  (2, 'particion_anual_raw'),
+  (3, 'codigos_divipola_raw'),
+  (4, 'sin_dato_zona_sexo'),
+  (5, 'dimensiones_init_sql'),
+  (6, 'marca_updated_at_control');
+
 -- Tablas DIVIPOLA (estáticas)
 CREATE TABLE IF NOT EXISTS dim_departamentos (
   cod_depto VARCHAR(6) PRIMARY KEY,
@@ -63,5 +109,52 @@ CREATE TABLE IF NOT EXISTS etl_control (
   proceso VARCHAR(100) UNIQUE,
   last_loaded_date DATE,
   last_loaded_ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  -- Marca :updated_at de Socrata (texto ISO tal como la devuelve la API)
+  last_updated_at VARCHAR(32) NULL,
   notas TEXT
-) ENGINE=InnoDB;
\ No newline at end of file
+) ENGINE=InnoDB;
+
+-- Historial de corridas del ETL: una fila por etapa (DL_ETL/metrics.py)
+CREATE TABLE IF NOT EXISTS etl_runs (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  run_id CHAR(32) NOT NULL,
+  etapa VARCHAR(100) NOT NULL,
+  estado VARCHAR(20) NOT NULL,
+  inicio DATETIME(3) NOT NULL,
+  fin DATETIME(3) NOT NULL,
+  segundos DOUBLE NOT NULL,
+  filas_entrada BIGINT NULL,
+  filas_salida BIGINT NULL,
+  filas_por_seg DOUBLE NULL,
+  bytes_descargados BIGINT NULL,
+  rss_pico_mb DOUBLE NULL,
+  detalle TEXT NULL,
+  error TEXT NULL,
+  INDEX idx_etl_runs_run (run_id),
+  INDEX idx_etl_runs_inicio (inicio)
+) ENGINE=InnoDB;
+
+-- Agregados para el dashboard y el modelo (los mantiene el ETL de forma incremental)
+CREATE TABLE IF NOT EXISTS agg_homicidios_mes (
+  periodo DATE NOT NULL,
+  cod_depto VARCHAR(6) NOT NULL,
+  cod_muni VARCHAR(8) NOT NULL,
+  sexo VARCHAR(20) NOT NULL DEFAULT '',
+  zona VARCHAR(20) NOT NULL DEFAULT '',
+  departamento VARCHAR(200),
+  municipio VARCHAR(200),
+  total INT NOT NULL,
+  PRIMARY KEY (periodo, cod_depto, cod_muni, sexo, zona)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS agg_homicidios_anio (
+  anio SMALLINT NOT NULL,
+  cod_depto VARCHAR(6) NOT NULL,
+  cod_muni VARCHAR(8) NOT NULL,
+  sexo VARCHAR(20) NOT NULL DEFAULT '',
+  zona VARCHAR(20) NOT NULL DEFAULT '',
+  departamento VARCHAR(200),
+  municipio VARCHAR(200),
+  total INT NOT NULL,
+  PRIMARY KEY (anio, cod_depto, cod_muni, sexo, zona)
+) ENGINE=InnoDB;
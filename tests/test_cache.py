@@ -0,0 +1,32 @@
+"""Modo offline de la caché de extracciones (DL_ETL.cache)."""
+import pandas as pd
+import pytest
+
+from DL_ETL.cache import cached_extract
+
+
+def sin_red():
+    raise AssertionError("el modo offline no debe consultar la red")
+
+
+def test_offline_reutiliza_la_ultima_extraccion_aunque_avance_la_marca(tmp_path):
+    df = pd.DataFrame({"fecha_hecho": ["2024-01-31"], "cantidad": ["1"]})
+    cached_extract(lambda: df, "ha6j-pa2r", query="q1", watermark=["2024-01-01"], cache_dir=tmp_path)
+
+    offline = cached_extract(sin_red, "ha6j-pa2r", query="q2", watermark=["2024-01-31"],
+                             offline=True, cache_dir=tmp_path)
+
+    pd.testing.assert_frame_equal(offline, df)
+
+
+def test_una_extraccion_vacia_se_puede_repetir_offline(tmp_path):
+    cached_extract(lambda: pd.DataFrame(), "ha6j-pa2r", query="q1", cache_dir=tmp_path)
+
+    offline = cached_extract(sin_red, "ha6j-pa2r", query="q1", offline=True, cache_dir=tmp_path)
+
+    assert offline.empty
+
+
+def test_offline_sin_ninguna_extraccion_falla(tmp_path):
+    with pytest.raises(RuntimeError, match="ha6j-pa2r"):
+        cached_extract(sin_red, "ha6j-pa2r", offline=True, cache_dir=tmp_path)
@@ -0,0 +1,48 @@
+"""Cubo y filtros del dashboard sobre ids enteros de departamento y municipio."""
+import pandas as pd
+
+from catalogo import Catalogo
+from cubo import construir_cubo, enrollar
+from DL_ETL.divipola import indice_local
+from filtros import IndiceFiltros
+
+
+def registros():
+    df = pd.DataFrame({
+        "ANIO": [2020, 2020, 2021, 2021, 2020],
+        "COD_DEPTO": ["05", "05", "05", "08", "99"],
+        "DEPARTAMENTO": ["ANTIOQUIA", "Antioquia", "ANTIOQUIA", "ATLÁNTICO", "SIN DATO"],
+        # Medellín con dos grafías, Barranquilla y un código fuera de DIVIPOLA
+        "COD_MUNI": ["05001", "05001", "05001", "08001", "99999"],
+        "MUNICIPIO": ["MEDELLÍN", "Medellin", "MEDELLÍN", "BARRANQUILLA", "DESCONOCIDO"],
+        "SEXO": ["Hombre", "Mujer", "Hombre", "Hombre", "Hombre"],
+        "ZONA": ["Urbana"] * 5,
+        "CANTIDAD": [1, 2, 3, 4, 5],
+    })
+    return df.astype({c: "category" for c in ["COD_DEPTO", "DEPARTAMENTO", "COD_MUNI", "MUNICIPIO", "SEXO", "ZONA"]})
+
+
+def preparar():
+    df = registros()
+    catalogo = Catalogo(df[["COD_DEPTO", "DEPARTAMENTO", "COD_MUNI", "MUNICIPIO"]].drop_duplicates(), indice_local())
+    return catalogo, IndiceFiltros(catalogo.agregar_ids(df))
+
+
+def test_cada_municipio_es_una_sola_fila_aunque_cambie_la_grafia():
+    catalogo, indice = preparar()
+    por_muni = catalogo.etiquetar(enrollar(construir_cubo(indice.seleccionar()), ["ID_MUNI"]))
+
+    assert sorted(zip(por_muni["COD_MUNI"], por_muni["CANTIDAD"])) == [("05001", 6), ("08001", 4), ("99999", 5)]
+    # Los códigos desconocidos tienen id propio y conservan el nombre de los registros
+    assert por_muni.set_index("COD_MUNI").at["99999", "MUNICIPIO"] == "DESCONOCIDO"
+
+
+def test_filtros_por_id():
+    catalogo, indice = preparar()
+
+    antioquia = indice.seleccionar(departamentos=catalogo.ids_depto(["05"]))
+    assert antioquia["CANTIDAD"].sum() == 6
+    assert indice.seleccionar((2021, 2021), municipios=catalogo.ids_muni(["05001"]))["CANTIDAD"].sum() == 3
+    # Un código que no está en los datos no selecciona nada (no equivale a "sin filtro")
+    assert indice.seleccionar(departamentos=catalogo.ids_depto(["11"])).empty
+    assert list(catalogo.munis.loc[indice.listar_municipios(departamentos=catalogo.ids_depto(["08"])), "COD_MUNI"]) == ["08001"]
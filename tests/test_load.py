@@ -0,0 +1,42 @@
+"""Carga de filas con zona/sexo faltantes en raw_homicidios (uq_raw_uniq)."""
+import os
+
+import pandas as pd
+import pytest
+
+from DL_ETL.divipola import indice_local
+from DL_ETL.load import RAW_COLS, _row_chunks
+from DL_ETL.transform import SIN_DATO, transform
+
+KEY_COLS = ["fecha_hecho", "cod_depto", "cod_muni", "zona", "sexo"]
+
+
+def fila_sin_sexo():
+    return pd.DataFrame({
+        "fecha_hecho": ["2020-01-31T00:00:00.000"], "cod_depto": ["05"], "departamento": ["ANTIOQUIA"],
+        "cod_muni": ["05001000"], "municipio": ["MEDELLÍN"], "zona": [None], "sexo": [None], "cantidad": ["1"],
+    })
+
+
+@pytest.mark.parametrize("backend", ["pandas", "polars"])
+def test_faltantes_de_la_llave_no_viajan_como_null(backend):
+    filas = [r for _, chunk in _row_chunks(transform(fila_sin_sexo(), indice_local(), backend), 100) for r in chunk]
+    llave = dict(zip(RAW_COLS, filas[0]))
+    assert llave["zona"] == SIN_DATO and llave["sexo"] == SIN_DATO
+    assert all(llave[c] is not None for c in KEY_COLS)
+
+
+@pytest.mark.skipif(not os.getenv("BENCH_DB_URL"), reason="requiere un servidor MySQL en BENCH_DB_URL")
+def test_cargar_dos_veces_una_fila_sin_sexo_deja_una_sola():
+    pytest.importorskip("mysql.connector")
+    from sqlalchemy import text
+
+    from DL_ETL.benchmarks.disposable_db import base_desechable
+    from DL_ETL.load import upsert_raw
+
+    with base_desechable() as (engine, _):
+        with engine.connect() as conn:
+            for _ in range(2):
+                upsert_raw(conn, transform(fila_sin_sexo(), indice_local()))
+            filas = conn.execute(text("SELECT sexo, cantidad FROM raw_homicidios")).fetchall()
+    assert [tuple(f) for f in filas] == [(SIN_DATO, 1)]
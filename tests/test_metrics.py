@@ -0,0 +1,56 @@
+"""Bytes descargados por etapa cuando varias etapas descargan a la vez, y por página (DL_ETL.metrics)."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from DL_ETL.benchmarks.socrata_stub import _crear_handler
+from DL_ETL.extract import count_downloads, iter_api_pages
+from DL_ETL.metrics import RunMetrics
+
+
+@pytest.fixture
+def servidores():
+    """Dos recursos Socrata locales de distinto tamaño."""
+    activos = []
+    for filas in (50, 2000):
+        df = pd.DataFrame({":id": range(filas), "valor": ["x" * 20] * filas})
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _crear_handler(df))
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        activos.append(servidor)
+    yield [f"http://127.0.0.1:{s.server_address[1]}/resource/prueba.json" for s in activos]
+    for servidor in activos:
+        servidor.shutdown()
+
+
+def test_etapas_concurrentes_cuentan_solo_sus_descargas(servidores):
+    metrics = RunMetrics()
+    barrera = threading.Barrier(2)
+
+    def etapa(nombre, url):
+        with metrics.stage(nombre) as record:
+            barrera.wait()
+            paginas = list(iter_api_pages(url, limit=100, max_workers=3))
+            barrera.wait()
+            record["filas_salida"] = sum(len(p) for _, p in paginas)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(etapa, ["chica", "grande"], servidores))
+
+    bytes_por_etapa = {s["etapa"]: s["bytes_descargados"] for s in metrics.stages}
+    assert 0 < bytes_por_etapa["chica"] * 10 < bytes_por_etapa["grande"]
+
+
+def test_cada_pagina_reporta_filas_bytes_y_segundos(servidores):
+    paginas = []
+    with count_downloads() as contador:
+        registros = list(iter_api_pages(
+            servidores[1], limit=300, max_workers=3, on_page=lambda *p: paginas.append(p)
+        ))
+
+    assert [filas for filas, _, _ in paginas] == [len(p) for _, p in registros]
+    assert all(segundos >= 0 for _, _, segundos in paginas)
+    # Todo lo descargado salvo la consulta del conteo
+    assert 0 < sum(b for _, b, _ in paginas) < contador["bytes"]
@@ -0,0 +1,47 @@
+"""Reanudación del modo streaming a partir del avance guardado en etl_control."""
+import json
+
+import pandas as pd
+
+from DL_ETL import stream
+from DL_ETL.stream import StreamSummary, load_stream
+
+
+def bloque(fechas, updated_at):
+    return pd.DataFrame({"fecha_hecho": pd.to_datetime(fechas), ":updated_at": updated_at})
+
+
+def test_resumen_sobrevive_el_viaje_por_json():
+    resumen = StreamSummary(chunk_rows=2)
+    resumen.add(0, bloque(["2020-01-05", "2020-03-01"], ["2024-01-01T00:00:00.000", None]))
+    resumen.add(2, bloque(["2021-07-10"], ["2024-02-01T00:00:00.000"]))
+
+    restaurado = StreamSummary.from_detail(json.loads(json.dumps(resumen.as_detail())))
+
+    assert restaurado.as_detail() == resumen.as_detail()
+    assert restaurado.meses == resumen.meses
+    assert restaurado.next_offset == 4
+
+
+def test_load_stream_continua_el_resumen_restaurado(monkeypatch):
+    monkeypatch.setattr(stream, "upsert_raw", lambda conn, df, **kwargs: len(df))
+    avances = []
+
+    def cortar_tras_el_primero(resumen):
+        avances.append(resumen.as_detail())
+        if len(avances) == 1:
+            raise KeyboardInterrupt
+
+    chunks = [(0, bloque(["2020-01-05", "2020-01-06"], None)), (2, bloque(["2020-02-01"], None))]
+    try:
+        load_stream(None, iter(chunks), resumen=StreamSummary(chunk_rows=2), on_commit=cortar_tras_el_primero)
+    except KeyboardInterrupt:
+        pass
+
+    restaurado = StreamSummary.from_detail(avances[-1])
+    assert restaurado.next_offset == 2
+    pendientes = [(offset, df) for offset, df in chunks if offset >= restaurado.next_offset]
+    final = load_stream(None, iter(pendientes), resumen=restaurado, on_commit=avances.append)
+
+    assert (final.bloques, final.filas, final.ultimo_offset) == (2, 3, 2)
+    assert final.meses == {pd.Timestamp("2020-01-01").date(), pd.Timestamp("2020-02-01").date()}
@@ -0,0 +1,38 @@
+"""Paridad entre los backends pandas y polars de DL_ETL.transform.
+
+Mismos casos borde que DL_ETL/benchmarks/parity_transform.py: entrada vacía,
+códigos nulos, tildes y mayúsculas, códigos de municipio de 8 dígitos y
+columnas con otros nombres.
+"""
+import warnings
+
+import pandas as pd
+import pytest
+
+from DL_ETL.benchmarks.parity_transform import casos_borde, diferencias
+from DL_ETL.divipola import indice_local
+from DL_ETL.transform import transform, val
+
+CASOS = casos_borde()
+
+
+@pytest.mark.parametrize("nombre", list(CASOS))
+def test_polars_igual_a_pandas(nombre):
+    df = CASOS[nombre]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        esperado = val(df.copy(), indice_local())
+        obtenido = transform(df, indice_local(), backend="polars").to_pandas()
+
+    assert diferencias(esperado, obtenido) == []
+    assert esperado.dtypes.astype(str).to_dict() == obtenido.dtypes.astype(str).to_dict()
+    for col in esperado.columns:
+        assert esperado[col].isna().tolist() == obtenido[col].isna().tolist(), col
+        if isinstance(esperado[col].dtype, pd.CategoricalDtype):
+            assert list(esperado[col].cat.categories) == list(obtenido[col].cat.categories), col
+
+
+def test_codigos_de_8_digitos_se_llevan_a_5():
+    obtenido = transform(CASOS["valores_borde"], indice_local(), backend="polars").to_pandas()
+    assert obtenido["cod_muni"].iloc[0] == "05001"
+    assert obtenido["cod_depto"].iloc[0] == "05"